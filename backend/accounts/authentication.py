@@ -0,0 +1,40 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .claims import CLAIM_FIELDS, claims_are_fresh, get_cached_claims
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds ``request.user`` from the token's claims.
+
+    Tokens from ``accounts.tokens.ClaimsRefreshToken`` carry the user's role
+    and flags, so authenticating a request needs no database query. The user
+    is a real ``User`` instance with only those fields loaded; anything else
+    is fetched on first access. Tokens issued before the user last changed,
+    or without claims, fall back to a cache-backed lookup.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if claims_are_fresh(validated_token, user_id):
+            claims = {field: validated_token[field] for field in CLAIM_FIELDS}
+        else:
+            claims = get_cached_claims(self.user_model, user_id)
+            if claims is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not claims['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # from_db takes the values in the model's field order, whatever
+        # order field_names lists them in
+        loaded = {'id': user_id, **{field: claims[field] for field in CLAIM_FIELDS}}
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in loaded]
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, [loaded[name] for name in field_names])
@@ -0,0 +1,137 @@
+"""
+Avatar renditions.
+
+Uploads are stored as-is, then a background job decodes each one once and
+writes square WebP and JPEG renditions at ``RENDITION_SIZES``. Rendition
+names carry a hash of the original's contents, so they never change and
+can be served with far-future cache headers; ``User.avatar_hash`` is set
+once they exist. Until then ``avatar_url`` falls back to the original.
+
+The job needs the storage the upload was saved to. With ``MEDIA_SHARED``
+it is queued for a task worker; otherwise media is on this machine's disk
+and it runs on a pool of ``AVATAR_WORKERS`` threads in the web process.
+"""
+import hashlib
+import io
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_DIR = 'avatars/r'
+RENDITION_SIZES = (96, 320)
+SMALL_SIZE = RENDITION_SIZES[0]
+RENDITION_NAME = re.compile(r'[0-9a-f]{20}-(?:%s)\.(?:webp|jpg)' % '|'.join(map(str, RENDITION_SIZES)))
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_name(digest, size=SMALL_SIZE, ext='webp'):
+    return f'{RENDITION_DIR}/{digest}-{size}.{ext}'
+
+
+def avatar_url(avatar, digest):
+    """Storage URL of the small rendition, or of the original while it's pending."""
+    if not avatar:
+        return None
+    return default_storage.url(rendition_name(digest) if digest else avatar)
+
+
+def render(image, size, fmt, options):
+    thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    if fmt == 'JPEG' and thumb.mode == 'RGBA':
+        background = Image.new('RGB', thumb.size, 'white')
+        background.paste(thumb, mask=thumb.getchannel('A'))
+        thumb = background
+    buffer = io.BytesIO()
+    thumb.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(user_id, name):
+    """Write every rendition of the stored avatar ``name`` and record its hash."""
+    from .models import User
+
+    with default_storage.open(name, 'rb') as fh:
+        data = fh.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+
+    image = Image.open(io.BytesIO(data))
+    # JPEG sources can decode straight at a reduced scale
+    image.draft('RGB', (RENDITION_SIZES[-1] * 2, RENDITION_SIZES[-1] * 2))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    for size in RENDITION_SIZES:
+        for ext, fmt, options in FORMATS:
+            path = rendition_name(digest, size, ext)
+            # Same content, same name: a re-upload reuses what's there
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(render(image, size, fmt, options)))
+
+    # Skip the update if another upload replaced this one meanwhile
+    User.objects.filter(pk=user_id, avatar=name).update(avatar_hash=digest)
+    return digest
+
+
+def process_avatar(user_id, name):
+    # A failure leaves avatar_url on the original rather than failing anything else
+    try:
+        return generate_renditions(user_id, name)
+    except Exception:
+        logger.exception('Avatar renditions failed for user %s (%s)', user_id, name)
+        return None
+
+
+def process_avatar_in_worker(user_id, name):
+    try:
+        return process_avatar(user_id, name)
+    finally:
+        # Pool threads outlive requests, so nothing else closes their connections
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatar-renditions'
+            )
+    return _executor
+
+
+def schedule_renditions(user_id, name):
+    """
+    Generate renditions for ``name`` once the current transaction commits.
+
+    Queued as a task when media is shared; otherwise run on this process's
+    pool, or inline in the commit callback when ``AVATAR_WORKERS`` is 0.
+    """
+    if settings.MEDIA_SHARED:
+        from .tasks import create_avatar_renditions
+
+        create_avatar_renditions.enqueue(
+            idempotency_key=f'avatar:{user_id}:{name}', user_id=user_id, name=name
+        )
+        return
+
+    def submit():
+        if settings.AVATAR_WORKERS:
+            get_executor().submit(process_avatar_in_worker, user_id, name)
+        else:
+            process_avatar(user_id, name)
+    transaction.on_commit(submit)
@@ -0,0 +1,51 @@
+import math
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+BLACKLIST_KEY = 'accounts:token-blacklist:{jti}'
+
+
+def get_blacklist_cache():
+    return caches[getattr(settings, 'TOKEN_BLACKLIST_CACHE_ALIAS', 'token_blacklist')]
+
+
+def remaining_lifetime(token):
+    return max(0, math.ceil(token['exp'] - time.time()))
+
+
+def is_blacklisted(token):
+    return get_blacklist_cache().has_key(BLACKLIST_KEY.format(jti=token[api_settings.JTI_CLAIM]))
+
+
+def blacklist_token(token):
+    """
+    Blacklist ``token`` until it would have expired anyway.
+
+    Returns False if the jti was already blacklisted. ``add()`` is atomic,
+    so of two concurrent refreshes with the same token only one wins.
+    """
+    timeout = remaining_lifetime(token)
+    if not timeout:
+        return False
+    key = BLACKLIST_KEY.format(jti=token[api_settings.JTI_CLAIM])
+    return get_blacklist_cache().add(key, 1, timeout=timeout)
+
+
+class CacheBlacklistMixin:
+    """Token blacklist kept in a cache alias instead of the token_blacklist tables."""
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        if is_blacklisted(self):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        if not blacklist_token(self):
+            raise TokenError(_('Token is blacklisted'))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries are visible only to the process that wrote them
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, Tags.security, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Token claims and the refresh blacklist are only enforced across workers
+    when their caches are shared, e.g. Redis.
+    """
+    warnings = []
+    blacklist_alias = getattr(settings, 'TOKEN_BLACKLIST_CACHE_ALIAS', 'token_blacklist')
+    for alias, purpose in (('default', 'role and deactivation changes'), (blacklist_alias, 'rotated refresh tokens')):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHES:
+            warnings.append(Warning(
+                f"The '{alias}' cache ({backend}) is local to each process, so other workers "
+                f"won't see {purpose}.",
+                hint='Point it at a shared cache such as Redis (CACHE_BACKEND / TOKEN_BLACKLIST_CACHE_BACKEND).',
+                id='accounts.W001',
+            ))
+    return warnings
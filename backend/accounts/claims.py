@@ -0,0 +1,69 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# Copied into every JWT so read paths can authorise without loading the user
+CLAIM_FIELDS = ('role', 'is_superuser', 'is_staff', 'is_active')
+CLAIMS_AT = 'claims_at'
+
+CLAIMS_KEY = 'accounts:claims:{user_id}'
+CHANGED_KEY = 'accounts:claims-changed:{user_id}'
+
+
+def get_user_claims(user):
+    return {field: getattr(user, field) for field in CLAIM_FIELDS}
+
+
+def add_claims(token, user):
+    return stamp_claims(token, get_user_claims(user))
+
+
+def stamp_claims(token, claims):
+    token.payload.update(claims)
+    token[CLAIMS_AT] = time.time()
+    return token
+
+
+def get_access_lifetime():
+    return int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+
+
+def get_refresh_lifetime():
+    return int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+
+
+def mark_claims_changed(user_id, claims=None):
+    """
+    Record that a user's claims changed, so tokens issued earlier are stale.
+
+    The marker outlives every token, access or refresh, issued before it.
+    ``claims`` warms the lookup cache that stale tokens fall back to. Both
+    live in the default cache, which must be shared by every worker (see
+    ``accounts.checks``): a worker that can't see the marker trusts the
+    claims in the token.
+    """
+    cache.set(CHANGED_KEY.format(user_id=user_id), time.time(), timeout=get_refresh_lifetime())
+    if claims is None:
+        cache.delete(CLAIMS_KEY.format(user_id=user_id))
+    else:
+        cache.set(CLAIMS_KEY.format(user_id=user_id), claims, timeout=get_access_lifetime())
+
+
+def claims_are_fresh(token, user_id):
+    if CLAIMS_AT not in token or any(field not in token for field in CLAIM_FIELDS):
+        return False
+    changed_at = cache.get(CHANGED_KEY.format(user_id=user_id))
+    return changed_at is None or token[CLAIMS_AT] > changed_at
+
+
+def get_cached_claims(user_model, user_id):
+    """Current claims for ``user_id`` from the cache, loading them on a miss."""
+    key = CLAIMS_KEY.format(user_id=user_id)
+    claims = cache.get(key)
+    if claims is None:
+        user = user_model.objects.filter(pk=user_id).only(*CLAIM_FIELDS).first()
+        if user is None:
+            return None
+        claims = get_user_claims(user)
+        cache.set(key, claims, timeout=get_access_lifetime())
+    return claims
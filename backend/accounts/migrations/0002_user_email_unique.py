@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def deduplicate_emails(apps, schema_editor):
+    """
+    Give every user but the first with an email, and every user without one,
+    a placeholder address so the email can become unique. Logins could not
+    tell these accounts apart by email anyway; staff can set real addresses.
+    """
+    User = apps.get_model('accounts', 'User')
+    seen = set()
+    renamed = []
+    for user in User.objects.order_by('pk').only('pk', 'email').iterator():
+        if user.email and user.email not in seen:
+            seen.add(user.email)
+            continue
+        user.email = f'user-{user.pk}@duplicate.invalid' if user.email else f'user-{user.pk}@no-email.invalid'
+        renamed.append(user)
+    User.objects.bulk_update(renamed, ['email'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='email address'),
+        ),
+    ]
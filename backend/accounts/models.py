@@ -8,9 +8,13 @@ class User(AbstractUser):
         ('admin', 'Admin'),
     ]
     
+    # Unique so logins can look the user up by email in one indexed query
+    email = models.EmailField('email address', unique=True)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='user')
     phone = models.CharField(max_length=20, blank=True, null=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Content hash naming the avatar's renditions; blank until they're generated
+    avatar_hash = models.CharField(max_length=20, blank=True, default='', editable=False)
     gender = models.CharField(
         max_length=10, 
         choices=[('male', 'Male'), ('female', 'Female')], 
@@ -23,6 +27,18 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name}" if self.first_name else self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets accounts.signals spot a newly uploaded avatar
+        instance._loaded_avatar = instance.__dict__.get('avatar')
+        # Lets bookings.signals spot a change to what the staff schedule shows
+        instance._loaded_contact = instance.schedule_contact()
+        return instance
+
+    def schedule_contact(self):
+        return tuple(self.__dict__.get(name) for name in ('first_name', 'last_name', 'username', 'phone'))
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
\ No newline at end of file
@@ -1,7 +1,18 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .avatars import avatar_url
+from .claims import get_cached_claims, stamp_claims
 from .models import User
+from .tasks import send_welcome_email
+from .tokens import ClaimsRefreshToken
+from .throttling import clear_login_failures, ensure_login_allowed, record_login_failure
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -18,7 +29,9 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+            send_welcome_email.enqueue(idempotency_key=f'welcome:{user.pk}', user_id=user.pk)
         return user
 
 class UserLoginSerializer(serializers.Serializer):
@@ -30,16 +43,16 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
 
         if email and password:
-            try:
-                user = User.objects.get(email=email)
-                user = authenticate(username=user.username, password=password)
-                if not user:
-                    raise serializers.ValidationError('Invalid credentials')
-                if not user.is_active:
-                    raise serializers.ValidationError('User account is disabled')
-                attrs['user'] = user
-            except User.DoesNotExist:
+            request = self.context.get('request')
+            ensure_login_allowed(email, request)
+            user = authenticate(request, email=email, password=password)
+            if not user:
+                record_login_failure(email, request)
                 raise serializers.ValidationError('Invalid credentials')
+            if not user.is_active:
+                raise serializers.ValidationError('User account is disabled')
+            clear_login_failures(email)
+            attrs['user'] = user
         else:
             raise serializers.ValidationError('Must include email and password')
 
@@ -61,6 +74,48 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return obj.role
 
     def get_avatar_url(self, obj):
-        if obj.avatar:
-            return self.context['request'].build_absolute_uri(obj.avatar.url)
-        return None
\ No newline at end of file
+        url = avatar_url(obj.avatar.name, obj.avatar_hash)
+        return self.context['request'].build_absolute_uri(url) if url else None
+
+    def validate_avatar(self, value):
+        # ImageField has already decoded the header; check size before storing it
+        if value is None:
+            return value
+        if value.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f'Upload an image of at most {settings.AVATAR_MAX_UPLOAD_SIZE // (1024 * 1024)} MB.'
+            )
+        width, height = value.image.size
+        if width * height > settings.AVATAR_MAX_PIXELS:
+            raise serializers.ValidationError('Upload an image with fewer pixels.')
+        return value
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with the cache-backed blacklist, so a rotated token can't be replayed.
+
+    The new tokens carry the user's current claims rather than copies of the
+    old ones: they come from the claims cache (one primary-key query on a
+    miss), and inactive or deleted users can't refresh at all.
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        claims = get_cached_claims(User, refresh[api_settings.USER_ID_CLAIM])
+        if claims is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not claims['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            refresh.blacklist()
+        stamp_claims(refresh, claims)
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
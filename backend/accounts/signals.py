@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .avatars import schedule_renditions
+from .claims import get_user_claims, mark_claims_changed
+from .models import User
+
+
+def avatar_changed(user):
+    loaded = getattr(user, '_loaded_avatar', None)
+    return (user.avatar.name or '') != (getattr(loaded, 'name', loaded) or '')
+
+
+@receiver(pre_save, sender=User)
+def reset_avatar_renditions(sender, instance, **kwargs):
+    # The old renditions no longer match; serve the original until new ones exist
+    if avatar_changed(instance):
+        instance.avatar_hash = ''
+
+
+@receiver(post_save, sender=User)
+def generate_avatar_renditions(sender, instance, **kwargs):
+    if avatar_changed(instance):
+        instance._loaded_avatar = instance.avatar.name
+        if instance.avatar:
+            schedule_renditions(instance.pk, instance.avatar.name)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_claims(sender, instance, **kwargs):
+    """Invalidate token claims issued before the user's role or flags changed."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'role', 'is_superuser', 'is_staff', 'is_active'} & set(update_fields):
+        return
+    mark_claims_changed(instance.pk, get_user_claims(instance))
+
+
+@receiver(post_delete, sender=User)
+def drop_user_claims(sender, instance, **kwargs):
+    mark_claims_changed(instance.pk)
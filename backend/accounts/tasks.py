@@ -0,0 +1,24 @@
+from django.core.mail import send_mail
+from tasks.queue import task
+from .avatars import generate_renditions
+from .models import User
+
+
+@task(max_attempts=3)
+def create_avatar_renditions(user_id, name):
+    # Until this succeeds avatar_url keeps pointing at the original
+    generate_renditions(user_id, name)
+
+
+@task
+def send_welcome_email(user_id):
+    user = User.objects.filter(pk=user_id).only('username', 'email', 'first_name').first()
+    if user is None or not user.email:
+        return
+    send_mail(
+        'Welcome to the Barber Shop',
+        f'Hi {user.first_name or user.username},\n\n'
+        'Your account is ready. You can now book appointments online.\n',
+        None,
+        [user.email],
+    )
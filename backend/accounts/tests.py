@@ -0,0 +1,411 @@
+import hashlib
+import io
+import tempfile
+import time
+from datetime import date, time as dt_time
+from decimal import Decimal
+from unittest import mock
+from PIL import Image
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from bookings.reservations import reserve_booking
+from services.models import Service
+from tasks.models import Task
+from .authentication import ClaimsJWTAuthentication
+from .avatars import RENDITION_SIZES, rendition_name
+from .blacklist import get_blacklist_cache
+from .checks import check_shared_caches
+from .tokens import ClaimsRefreshToken
+
+User = get_user_model()
+
+
+class LoginTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def login(self, password='testpass123', email='test@example.com'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password})
+
+    def test_login_looks_user_up_once(self):
+        """Test a login fetches the user with a single query"""
+        with self.assertNumQueries(1):
+            response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['email'], 'test@example.com')
+        self.assertIn('access', response.data)
+
+    def test_invalid_credentials(self):
+        """Test wrong passwords and unknown emails get the same error"""
+        self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.login(email='nobody@example.com').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_email_is_unique(self):
+        """Test registering a taken email is rejected"""
+        response = self.client.post('/api/auth/register/', {
+            'username': 'other',
+            'email': 'test@example.com',
+            'password': 'An0ther-pass!',
+            'password_confirm': 'An0ther-pass!',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_hash_upgraded_on_login(self):
+        """Test changing the hasher cost re-encodes the password on next login"""
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            response = self.login()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(LOGIN_FAILURE_LIMIT=3)
+    def test_failed_attempts_throttled(self):
+        """Test repeated failures are refused with a 429 before checking the password"""
+        for _ in range(3):
+            self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.assertNumQueries(0):
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_success_resets_failures(self):
+        """Test a successful login clears the failure count for that email"""
+        for _ in range(4):
+            self.login(password='wrong')
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        for _ in range(4):
+            self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(LOGIN_FAILURE_IP_LIMIT=3, LOGIN_NUM_PROXIES=None)
+    def test_ip_limit_off_without_trusted_proxies(self):
+        """Test clients behind one proxy address don't share a failure count by default"""
+        for n in range(5):
+            self.login(password='wrong', email=f'user{n}@example.com')
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_FAILURE_IP_LIMIT=3, LOGIN_NUM_PROXIES=1)
+    def test_ip_limit_keyed_on_trusted_forwarded_hop(self):
+        """Test failures count against the address the proxy saw, not a forged one"""
+        for n in range(3):
+            self.client.post(
+                '/api/auth/login/', {'email': f'user{n}@example.com', 'password': 'wrong'},
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{n}, 203.0.113.7',
+            )
+        self.assertEqual(
+            self.client.post(
+                '/api/auth/login/', {'email': 'test@example.com', 'password': 'testpass123'},
+                HTTP_X_FORWARDED_FOR='203.0.113.7',
+            ).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertEqual(
+            self.client.post(
+                '/api/auth/login/', {'email': 'test@example.com', 'password': 'testpass123'},
+                HTTP_X_FORWARDED_FOR='198.51.100.2',
+            ).status_code,
+            status.HTTP_200_OK,
+        )
+
+
+class ClaimsAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        response = self.client.post('/api/auth/login/', {'email': 'test@example.com', 'password': 'testpass123'})
+        self.access = response.data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_token_carries_claims(self):
+        """Test login issues tokens with the role and flags as claims"""
+        token = AccessToken(self.access)
+        self.assertEqual(token['role'], 'user')
+        self.assertFalse(token['is_superuser'])
+        self.assertTrue(token['is_active'])
+
+    def test_authentication_skips_user_query(self):
+        """Test authenticated read paths run no query to load the user"""
+        with self.assertNumQueries(1):  # the bookings page itself
+            response = self.client.get('/api/bookings/?pagination=cursor&count=false')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_is_built_with_each_claim_in_its_field(self):
+        """Test the request user gets each claim in the matching field and can't pass as an admin"""
+        user = ClaimsJWTAuthentication().get_user(AccessToken(self.access))
+        self.assertEqual(
+            (user.pk, user.role, user.is_superuser, user.is_staff, user.is_active),
+            (self.user.pk, 'user', False, False, True),
+        )
+        self.assertEqual(self.client.get('/api/bookings/export/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_role_change_makes_claims_stale(self):
+        """Test a role change applies to tokens issued before it"""
+        self.user.role = 'staff'
+        self.user.save()
+
+        response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-15')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user rejects their existing tokens"""
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_marker_outlives_refresh_tokens(self):
+        """Test the claims-changed marker is kept as long as a refresh token issued before it lives"""
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.user.role = 'staff'
+            self.user.save()
+
+        timeouts = {call.args[0]: call.kwargs['timeout'] for call in cache_set.call_args_list}
+        self.assertEqual(
+            timeouts[f'accounts:claims-changed:{self.user.pk}'],
+            settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds(),
+        )
+
+    def test_deploy_check_requires_shared_caches(self):
+        """Test the deploy check flags per-process caches and accepts Redis"""
+        redis = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1'}
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+        with override_settings(CACHES={'default': local, 'token_blacklist': redis}):
+            self.assertEqual([warning.id for warning in check_shared_caches(None)], ['accounts.W001'])
+        with override_settings(CACHES={'default': redis, 'token_blacklist': redis}):
+            self.assertEqual(check_shared_caches(None), [])
+
+    def test_token_without_claims_uses_cached_lookup(self):
+        """Test tokens without claims fall back to a cached user lookup"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+        cache.clear()
+
+        with self.assertNumQueries(2):  # user lookup + bookings page
+            self.client.get('/api/bookings/?pagination=cursor&count=false')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bookings/?pagination=cursor&count=false')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_profile_loads_full_user(self):
+        """Test the profile endpoint returns every field, not just the claims"""
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['email'], 'test@example.com')
+        self.assertEqual(response.data['username'], 'testuser')
+
+
+class RefreshBlacklistTestCase(TestCase):
+    def setUp(self):
+        get_blacklist_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.refresh = str(ClaimsRefreshToken.for_user(self.user))
+
+    def refresh_token(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': token})
+
+    def test_refresh_reads_claims_from_cache(self):
+        """Test a refresh looks the user's claims up once, then rotates without touching the database"""
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.refresh_token(self.refresh)
+        with self.assertNumQueries(0):
+            rotated = self.refresh_token(response.data['refresh'])
+
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+        self.assertIn('access', rotated.data)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+
+    def test_refresh_restamps_current_claims(self):
+        """Test tokens from a refresh carry the role the user has now, not the one they logged in with"""
+        self.user.role = 'admin'
+        self.user.save()
+        admin_refresh = str(ClaimsRefreshToken.for_user(self.user))
+        self.user.role = 'user'
+        self.user.save()
+        # The change marker can be gone (expired, another worker's cache)
+        cache.clear()
+
+        response = self.refresh_token(admin_refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'user')
+        self.assertEqual(ClaimsRefreshToken(response.data['refresh'])['role'], 'user')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/bookings/export/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_inactive_user_cannot_refresh(self):
+        """Test a deactivated user's refresh token is rejected"""
+        self.user.is_active = False
+        self.user.save()
+        cache.clear()
+
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotated_token_cannot_be_reused(self):
+        """Test the old refresh token is rejected once it has been rotated"""
+        rotated = self.refresh_token(self.refresh).data['refresh']
+
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh_token(rotated).status_code, status.HTTP_200_OK)
+
+    def test_blacklist_entry_expires_with_token(self):
+        """Test the blacklist entry lives only as long as the token would"""
+        token = ClaimsRefreshToken(self.refresh)
+        blacklist_cache = get_blacklist_cache()
+
+        with mock.patch.object(blacklist_cache, 'add', wraps=blacklist_cache.add) as add:
+            token.blacklist()
+        self.assertAlmostEqual(add.call_args.kwargs['timeout'], token['exp'] - time.time(), delta=2)
+
+
+@override_settings(AVATAR_WORKERS=0, MEDIA_SHARED=False)
+class AvatarRenditionTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, content, name='photo.png'):
+        return self.client.patch(
+            '/api/auth/profile/', {'avatar': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+
+    def image(self, size=(1200, 800), fmt='PNG', mode='RGB'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'red').save(buffer, fmt)
+        return buffer.getvalue()
+
+    def test_upload_returns_before_renditions(self):
+        """Test the upload responds with the original and generates renditions after commit"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.upload(self.image())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['avatar_url'], response.data['avatar'])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_renditions_stay_in_web_process_without_shared_media(self):
+        """Test renditions are made where the upload was stored unless media is shared"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.image())
+        self.assertFalse(Task.objects.exists())
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar_hash)
+
+        with override_settings(MEDIA_SHARED=True), self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.image(size=(600, 600)))
+        self.user.refresh_from_db()
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'accounts.tasks.create_avatar_renditions')
+        self.assertEqual(task.kwargs, {'user_id': self.user.pk, 'name': self.user.avatar.name})
+        self.assertEqual(self.user.avatar_hash, '')
+
+    def test_renditions_are_fixed_size_and_content_named(self):
+        """Test each size is written as WebP and JPEG under the content hash"""
+        content = self.image()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(content)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_hash, hashlib.sha256(content).hexdigest()[:20])
+        for size in RENDITION_SIZES:
+            for ext, fmt in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(rendition_name(self.user.avatar_hash, size, ext)) as fh:
+                    rendition = Image.open(fh)
+                    self.assertEqual((rendition.format, rendition.size), (fmt, (size, size)))
+
+    def test_serializers_emit_small_rendition(self):
+        """Test profile and booking responses link the small WebP rendition"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.image(mode='RGBA'))
+        self.user.refresh_from_db()
+        service = Service.objects.create(
+            name='Test Service', description='Test', price=Decimal('50.00'), duration_minutes=30
+        )
+        reserve_booking(service=service, appointment_date=date(2024, 1, 1), appointment_time=dt_time(9), user=self.user)
+
+        expected = f'http://testserver/media/{rendition_name(self.user.avatar_hash)}'
+        self.assertEqual(self.client.get('/api/auth/profile/').data['avatar_url'], expected)
+        for query in ('', '?projection=flat'):
+            booking = self.client.get(f'/api/bookings/{query}').json()['results'][0]
+            self.assertEqual(booking['user']['avatar_url'], expected)
+
+    def test_rendition_served_with_far_future_caching(self):
+        """Test renditions are served as immutable for a year"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.image())
+        url = self.client.get('/api/auth/profile/').data['avatar_url']
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get('/media/avatars/r/../../secret.webp').status_code, 404)
+
+    def test_new_upload_replaces_renditions(self):
+        """Test a new avatar clears the old hash until its own renditions exist"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(self.image())
+        with self.captureOnCommitCallbacks():
+            response = self.upload(self.image(fmt='JPEG'), name='photo.jpg')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_hash, '')
+        self.assertEqual(response.data['avatar_url'], response.data['avatar'])
+
+    @override_settings(AVATAR_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_rejected(self):
+        """Test uploads over the size limit are refused before anything is stored"""
+        response = self.upload(self.image(size=(2000, 2000), fmt='BMP'), name='big.bmp')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('avatar', response.data)
+
+    @override_settings(AVATAR_MAX_PIXELS=100 * 100)
+    def test_huge_dimensions_rejected(self):
+        """Test images with too many pixels are refused without being decoded"""
+        response = self.upload(self.image(size=(200, 200)))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_image_rejected(self):
+        """Test files that aren't images are refused"""
+        response = self.upload(b'not an image', name='photo.png')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,77 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+
+# Failed logins are counted per email and per client IP in the cache, so a
+# credential-stuffing burst is refused before any password gets hashed. The
+# IP count is only kept once LOGIN_NUM_PROXIES says where the client address
+# is: behind a proxy REMOTE_ADDR is the proxy, shared by every client.
+FAILURE_KEY = 'accounts:login-failures:{scope}:{ident}'
+
+
+def get_limits():
+    return {
+        'email': getattr(settings, 'LOGIN_FAILURE_LIMIT', 5),
+        'ip': getattr(settings, 'LOGIN_FAILURE_IP_LIMIT', 50),
+    }
+
+
+def get_client_ip(request):
+    """
+    The client address, as seen by the first of ``LOGIN_NUM_PROXIES`` trusted proxies.
+
+    Like DRF's ``NUM_PROXIES``: 0 means clients connect directly, N takes
+    the Nth address from the right of X-Forwarded-For, since everything
+    further left was written by the client and can be forged. Unset
+    (``None``) means the address isn't known and None is returned.
+    """
+    num_proxies = getattr(settings, 'LOGIN_NUM_PROXIES', None)
+    if num_proxies is None:
+        return None
+    remote_addr = request.META.get('REMOTE_ADDR') or None
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies == 0 or not forwarded_for:
+        return remote_addr
+    addrs = [addr.strip() for addr in forwarded_for.split(',')]
+    return addrs[-min(num_proxies, len(addrs))] or None
+
+
+def get_idents(email, request):
+    idents = {'email': hashlib.sha256(email.lower().encode('utf-8')).hexdigest()}
+    client_ip = get_client_ip(request) if request is not None else None
+    if client_ip:
+        idents['ip'] = client_ip
+    return idents
+
+
+def get_keys(email, request):
+    return {
+        scope: FAILURE_KEY.format(scope=scope, ident=ident)
+        for scope, ident in get_idents(email, request).items()
+    }
+
+
+def ensure_login_allowed(email, request=None):
+    """Raise Throttled (429) if the email or client has too many recent failures."""
+    keys = get_keys(email, request)
+    counts = cache.get_many(keys.values())
+    limits = get_limits()
+    for scope, key in keys.items():
+        if counts.get(key, 0) >= limits[scope]:
+            raise Throttled(wait=getattr(settings, 'LOGIN_FAILURE_WINDOW', 300))
+
+
+def record_login_failure(email, request=None):
+    window = getattr(settings, 'LOGIN_FAILURE_WINDOW', 300)
+    for key in get_keys(email, request).values():
+        # add() starts the window; incr() keeps its original expiry
+        if not cache.add(key, 1, timeout=window):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=window)
+
+
+def clear_login_failures(email):
+    cache.delete(get_keys(email, None)['email'])
@@ -0,0 +1,11 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+from .blacklist import CacheBlacklistMixin
+from .claims import add_claims
+
+
+class ClaimsRefreshToken(CacheBlacklistMixin, RefreshToken):
+    """Refresh token carrying the user's role and flags; access tokens inherit them."""
+
+    @classmethod
+    def for_user(cls, user):
+        return add_claims(super().for_user(user), user)
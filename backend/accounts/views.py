@@ -1,18 +1,24 @@
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from barber_shop.profiling import query_budget
 from django.contrib.auth import authenticate
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_safe
+from .avatars import RENDITION_DIR, RENDITION_NAME
 from .models import User
+from .tokens import ClaimsRefreshToken
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer
 
+@query_budget(6)
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         return Response({
             'user': UserProfileSerializer(user, context={'request': request}).data,
             'refresh': str(refresh),
@@ -20,13 +26,14 @@ def register(request):
         }, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@query_budget(2)
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def login(request):
-    serializer = UserLoginSerializer(data=request.data)
+    serializer = UserLoginSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         return Response({
             'user': UserProfileSerializer(user, context={'request': request}).data,
             'refresh': str(refresh),
@@ -37,6 +44,22 @@ def login(request):
 class ProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 3
 
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        # request.user only carries the token claims; load the full profile
+        return User.objects.get(pk=self.request.user.pk)
+
+
+@require_safe
+def avatar_rendition(request, name):
+    """Serve an avatar rendition; its name changes with its content, so caches may keep it for good."""
+    if not RENDITION_NAME.fullmatch(name):
+        raise Http404
+    try:
+        fh = default_storage.open(f'{RENDITION_DIR}/{name}', 'rb')
+    except FileNotFoundError:
+        raise Http404
+    response = FileResponse(fh, content_type='image/webp' if name.endswith('.webp') else 'image/jpeg')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
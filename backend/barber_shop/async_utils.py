@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import weakref
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+# Per event loop, so callers only ever await tasks on their own loop
+_inflight = weakref.WeakKeyDictionary()
+
+
+async def coalesce(key, func):
+    """
+    Await ``func()``, sharing one call between concurrent callers with the same key.
+
+    The first caller starts the task and later callers await it until it
+    finishes, so a burst of identical reads costs one database round trip.
+    Callers share the result and must not mutate it. The task is shielded,
+    so one client disconnecting doesn't cancel it for the others.
+    """
+    loop = asyncio.get_running_loop()
+    inflight = _inflight.setdefault(loop, {})
+    task = inflight.get(key)
+    if task is None:
+        task = loop.create_task(func())
+        inflight[key] = task
+
+        def forget(done):
+            if inflight.get(key) is done:
+                del inflight[key]
+
+        task.add_done_callback(forget)
+    return await asyncio.shield(task)
+
+
+def require_safe_async(view):
+    """``require_safe`` for async views; Django 4.2's decorator only wraps sync ones."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def request_key(request):
+    """Coalescing key for a read: path plus the query string in a stable order."""
+    return (request.path, tuple(sorted((name, tuple(values)) for name, values in request.GET.lists())))
+
+
+def paginated_response(request, data):
+    """Page ``data`` with the default DRF paginator, matching the sync list views."""
+    paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+    try:
+        page = paginator.paginate_queryset(data, Request(request))
+    except NotFound as exc:
+        return JsonResponse({'detail': exc.detail}, status=404)
+    if page is None:
+        return JsonResponse(data, safe=False)
+    return JsonResponse(paginator.get_paginated_response(page).data)
@@ -0,0 +1,30 @@
+"""orjson-backed JSON request parsing, falling back to DRF's parser without orjson."""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """
+    ``JSONParser`` that decodes with orjson.
+
+    orjson only reads UTF-8 and rejects NaN/Infinity like the strict stdlib
+    parser, so other request encodings, or ``STRICT_JSON = False``, go
+    through ``JSONParser`` as before.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read() if stream is not None else b'')
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
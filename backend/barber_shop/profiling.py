@@ -0,0 +1,246 @@
+"""
+Per-request SQL profiling and query budgets.
+
+``QueryProfilingMiddleware`` counts the queries a request runs, their total
+time, repeated query shapes (the usual sign of an N+1) and the time spent in
+serializers. It reports them in a ``Server-Timing`` header and one JSON log
+line per request. Views declare a budget with a ``query_budget`` attribute
+or the ``@query_budget(n)`` decorator; going over it logs a warning, or
+raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_ACTION`` is ``'raise'``
+(as it is under the test runner).
+"""
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('barber_shop.profiling')
+
+_current = contextvars.ContextVar('query_profile', default=None)
+_listeners = []
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most queries a function view may run; apply above ``@api_view``."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    """Query shape with literals and IN-list lengths stripped, and its short hash."""
+    shape = _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()[:12], shape
+
+
+class QueryProfile:
+    def __init__(self, path):
+        self.path = path
+        self.view = None
+        self.budget = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.shapes = Counter()
+        self.samples = {}
+        self.started = time.perf_counter()
+        self.total_time = None
+
+    def record_query(self, sql, duration):
+        key, shape = fingerprint(sql)
+        self.queries += 1
+        self.sql_time += duration
+        self.shapes[key] += 1
+        self.samples.setdefault(key, shape)
+
+    @property
+    def duplicates(self):
+        return {key: count for key, count in self.shapes.items() if count > 1}
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def server_timing(self):
+        duplicated = sum(self.duplicates.values())
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries, {duplicated} duplicated"',
+            f'serialize;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'path': self.path,
+            'view': self.view,
+            'queries': self.queries,
+            'budget': self.budget,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'serializer_ms': round(self.serializer_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+            'duplicates': [
+                {'fingerprint': key, 'count': count, 'sql': self.samples[key][:300]}
+                for key, count in self.duplicates.items()
+            ],
+        }
+
+
+def record_queries(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, time.perf_counter() - started)
+
+
+def add_query_recorder(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        # First in the list: connection.execute_wrapper() blocks pop the last
+        # entry on exit, which would drop a recorder installed inside them.
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+def time_serializer_data(data):
+    """Wrap ``BaseSerializer.data`` so the outermost serializer's time is recorded."""
+    @functools.wraps(data.fget)
+    def timed(serializer):
+        profile = _current.get()
+        if profile is None or getattr(profile, '_serializing', False):
+            return data.fget(serializer)
+        profile._serializing = True
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            profile.serializer_time += time.perf_counter() - started
+            profile._serializing = False
+    timed.profiled = True
+    return property(timed)
+
+
+def install():
+    """Hook the query recorder into every connection and time serializers."""
+    from rest_framework.serializers import BaseSerializer
+
+    connection_created.connect(add_query_recorder, dispatch_uid='barber_shop.profiling')
+    for connection in connections.all(initialized_only=True):
+        add_query_recorder(connection)
+    if not getattr(BaseSerializer.data.fget, 'profiled', False):
+        BaseSerializer.data = time_serializer_data(BaseSerializer.data)
+
+
+def get_view_budget(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view_func, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+def get_view_name(view_func):
+    # @api_view names its generated class after the decorated function
+    view = getattr(view_func, 'view_class', view_func)
+    return f'{view.__module__}.{view.__name__}'
+
+
+@contextmanager
+def capture_profiles():
+    """Collect the profile of every request finished inside the block (test helper)."""
+    profiles = []
+    _listeners.append(profiles.append)
+    try:
+        yield profiles
+    finally:
+        _listeners.remove(profiles.append)
+
+
+class QueryProfilingMiddleware:
+    """
+    Profile each request's SQL; enabled by ``QUERY_PROFILING``.
+
+    Runs natively under WSGI and ASGI alike, so async views aren't pushed
+    through a thread to pass it. Async ORM calls run their queries in a
+    thread that inherits the request's context, so they are counted too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = self.start(request)
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(profile, response)
+
+    async def __acall__(self, request):
+        profile = self.start(request)
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(profile, response)
+
+    def start(self, request):
+        profile = QueryProfile(request.path)
+        request.query_profile = profile
+        return profile
+
+    def finish(self, profile, response):
+        profile.finish()
+
+        response['Server-Timing'] = profile.server_timing()
+        record = profile.as_dict()
+        for listener in list(_listeners):
+            listener(profile)
+
+        if profile.over_budget:
+            message = f'{profile.view} ran {profile.queries} queries, budget is {profile.budget}'
+            if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+                raise QueryBudgetExceeded(f'{message}: {json.dumps(record)}')
+            logger.warning(json.dumps(record), extra={'profile': record})
+        else:
+            logger.info(json.dumps(record), extra={'profile': record})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, 'query_profile', None)
+        if profile is not None:
+            profile.view = get_view_name(view_func)
+            profile.budget = get_view_budget(view_func)
@@ -0,0 +1,62 @@
+"""
+orjson-backed JSON rendering with the output of DRF's ``JSONRenderer``.
+
+orjson encodes the dicts and lists serializers produce several times faster
+than the stdlib. Values it would format differently from DRF (datetimes,
+dates, times, Decimals, lazy strings, ...) are handed to DRF's own
+``JSONEncoder.default``, and U+2028/U+2029 are escaped the same way, so
+responses don't change. Anything orjson can't encode at all (integers past
+64 bits, for instance) is rendered by the stdlib renderer instead, as is
+indented output and any non-default ``UNICODE_JSON``/``COMPACT_JSON``
+setting. So is output holding a float the two write differently: orjson
+gives ``1e16`` and ``-0.00002`` where the stdlib gives ``1e+16`` and
+``-2e-05``, so any float written with an exponent or below 1e-4 sends the
+response to the stdlib. One deliberate difference: NaN and infinities render
+as null, where ``JSONRenderer`` raises ValueError. Without orjson installed
+this is plain ``JSONRenderer``.
+"""
+import re
+
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+else:  # pragma: no cover
+    OPTIONS = 0
+
+_default = JSONEncoder().default
+
+# A number in orjson's output whose float repr differs from the stdlib's.
+# A string that happens to look like one only costs a slower render.
+_float_mismatch = re.compile(rb'(?:^|[:,\[])-?(?:[0-9]+(?:\.[0-9]+)?e|0\.0000)')
+
+
+def float_mismatch(encoded):
+    """True if orjson wrote a float in ``encoded`` that the stdlib would format differently."""
+    return _float_mismatch.search(encoded) is not None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that encodes with orjson when it can do so identically."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Indented output (?indent= / the browsable API) stays with the stdlib
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if float_mismatch(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
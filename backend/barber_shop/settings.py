@@ -30,9 +30,11 @@ INSTALLED_APPS = [
     'bookings',
     'services',
     'cart',
+    'tasks',
 ]
 
 MIDDLEWARE = [
+    'barber_shop.profiling.QueryProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -46,6 +48,30 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'barber_shop.urls'
 
+# Per-request query counts, SQL/serializer time and duplicate queries, sent
+# as Server-Timing headers and logged by 'barber_shop.profiling'. Views over
+# their query_budget log a warning ('log') or raise ('raise', used in tests).
+# Off unless asked for: DEBUG defaults to on, and production shouldn't pay
+# for profiling because DEBUG was left unset. The test runner turns it on.
+QUERY_PROFILING = config('QUERY_PROFILING', default=False, cast=bool)
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')
+TEST_RUNNER = 'barber_shop.test_runner.QueryBudgetTestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'barber_shop.profiling': {
+            'handlers': ['console'],
+            'level': config('QUERY_PROFILING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -75,6 +101,71 @@ DATABASES = {
     )
 }
 
+# Run SQLite test databases from a file so threaded tests get real database
+# locking rather than in-memory shared-cache table locks.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')}
+    DATABASES['default']['OPTIONS'] = {'timeout': 30}
+
+# Cache
+# Local memory by default; point CACHE_BACKEND at
+# django.core.cache.backends.redis.RedisCache and CACHE_LOCATION at a
+# redis:// URL to share the cache between workers. Production needs a shared
+# cache: it holds the markers that revoke role changes and deactivations
+# for tokens already issued (`manage.py check --deploy` warns otherwise).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='barber-shop'),
+    },
+    # Rotated refresh-token jtis, each kept until its token expires. The
+    # local-memory default is per process and evicts least recently used
+    # entries when full; use Redis when running more than one worker.
+    'token_blacklist': {
+        'BACKEND': config('TOKEN_BLACKLIST_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('TOKEN_BLACKLIST_CACHE_LOCATION', default='token-blacklist'),
+    },
+}
+if CACHES['token_blacklist']['BACKEND'].endswith('LocMemCache'):
+    CACHES['token_blacklist']['OPTIONS'] = {
+        'MAX_ENTRIES': config('TOKEN_BLACKLIST_MAX_ENTRIES', default=100000, cast=int),
+    }
+
+SERVICE_CATALOG_CACHE_TIMEOUT = config('SERVICE_CATALOG_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Days ahead that generate_availability and the schedule admin action fill
+AVAILABILITY_HORIZON_DAYS = config('AVAILABILITY_HORIZON_DAYS', default=30, cast=int)
+
+# 'materialized' serves ServiceAvailability rows; 'virtual' computes open
+# slots from the schedules, bookings and AvailabilityException rows
+AVAILABILITY_MODE = config('AVAILABILITY_MODE', default='materialized')
+
+# Authentication
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Raising PASSWORD_HASH_ITERATIONS re-hashes each password on its next login
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=600000, cast=int)
+
+# Failed logins allowed per email / per client IP within the window (seconds)
+LOGIN_FAILURE_LIMIT = config('LOGIN_FAILURE_LIMIT', default=5, cast=int)
+LOGIN_FAILURE_IP_LIMIT = config('LOGIN_FAILURE_IP_LIMIT', default=50, cast=int)
+LOGIN_FAILURE_WINDOW = config('LOGIN_FAILURE_WINDOW', default=300, cast=int)
+# Proxies in front of the app that append to X-Forwarded-For (Render: 1;
+# 0 when clients connect directly). Left unset there is no trusted client
+# address, and the per-IP limit is off.
+LOGIN_NUM_PROXIES = config('LOGIN_NUM_PROXIES', default='', cast=lambda v: int(v) if v != '' else None)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +199,32 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Set MEDIA_SHARED once every process reads and writes the same media
+# storage (S3 or a volume mounted by web and worker alike). Until then the
+# web process that stored an upload generates its renditions, on a pool of
+# AVATAR_WORKERS threads (inline after commit when it is 0); with it they
+# are queued for a task worker.
+MEDIA_SHARED = config('MEDIA_SHARED', default=False, cast=bool)
+
+# Avatar uploads (accounts.avatars)
+AVATAR_WORKERS = config('AVATAR_WORKERS', default=2, cast=int)
+AVATAR_MAX_UPLOAD_SIZE = config('AVATAR_MAX_UPLOAD_SIZE', default=5 * 1024 * 1024, cast=int)
+AVATAR_MAX_PIXELS = config('AVATAR_MAX_PIXELS', default=25_000_000, cast=int)
+
+# Background tasks (tasks.queue) are run by `python manage.py run_tasks`.
+# TASKS_EAGER runs them in the web process after commit instead, with no
+# worker. A task still running after TASKS_LEASE_SECONDS is assumed lost
+# with its worker and handed to another.
+TASKS_EAGER = config('TASKS_EAGER', default=False, cast=bool)
+TASKS_LEASE_SECONDS = config('TASKS_LEASE_SECONDS', default=600, cast=int)
+
+# Payment provider webhooks (cart.payments): events are signed with
+# PAYMENT_WEBHOOK_SECRET and rejected once PAYMENT_WEBHOOK_TOLERANCE seconds
+# old. Without a secret every webhook is rejected.
+PAYMENT_WEBHOOK_SECRET = config('PAYMENT_WEBHOOK_SECRET', default='')
+PAYMENT_WEBHOOK_TOLERANCE = config('PAYMENT_WEBHOOK_TOLERANCE', default=300, cast=int)
+PAYMENT_SETTLEMENT_BATCH_SIZE = config('PAYMENT_SETTLEMENT_BATCH_SIZE', default=500, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -117,7 +234,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -127,6 +244,15 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'barber_shop.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'barber_shop.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -139,6 +265,7 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.ClaimsTokenRefreshSerializer',
 }
 
 # CORS settings
@@ -153,5 +280,13 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
-# Email configuration (for development)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+# Email configuration: printed to the console unless an SMTP backend is
+# configured. Mail is sent from task workers, never during a request.
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Barber Shop <noreply@localhost>')
\ No newline at end of file
@@ -0,0 +1,14 @@
+import logging
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """Run tests with query profiling on, so a view over its budget fails the test."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_PROFILING = True
+        settings.QUERY_BUDGET_ACTION = 'raise'
+        # Keep the per-request log lines out of the test output
+        logging.getLogger('barber_shop.profiling').setLevel(logging.WARNING)
@@ -0,0 +1,278 @@
+import io
+import re
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from django.utils.translation import gettext_lazy
+from benchmarks.factories import seed
+from cart.models import AvailabilityException, AvailabilitySchedule, CreditTopUp
+from cart.views import CartDetailView
+from cart.wallet import complete_topup
+from services.cache import get_cache
+from services.models import Service
+from .parsers import ORJSONParser
+from .profiling import QueryBudgetExceeded, QueryProfilingMiddleware, capture_profiles, fingerprint, install
+from .renderers import ORJSONRenderer, float_mismatch
+
+User = get_user_model()
+
+
+class QueryProfilingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        """Test responses report SQL and serializer time in Server-Timing"""
+        response = self.client.get('/api/cart/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_profile_counts_queries(self):
+        """Test the recorded profile matches the queries the view ran"""
+        self.client.get('/api/cart/')
+
+        with capture_profiles() as profiles, self.assertNumQueries(2):
+            self.client.get('/api/cart/')
+        self.assertEqual(profiles[0].queries, 2)
+        self.assertEqual(profiles[0].view, 'cart.views.CartDetailView')
+        self.assertEqual(profiles[0].budget, CartDetailView.query_budget)
+        self.assertGreater(profiles[0].serializer_time, 0)
+
+    def test_duplicate_queries_fingerprinted(self):
+        """Test queries differing only in literals share a fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT * FROM "cart_cart" WHERE "user_id" = 1'),
+            fingerprint('SELECT * FROM "cart_cart" WHERE "user_id" = 22'),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_over_budget_fails_under_tests(self):
+        """Test a view running more queries than its budget raises in tests"""
+        with mock.patch.object(CartDetailView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/cart/')
+
+    @override_settings(QUERY_BUDGET_ACTION='log')
+    def test_over_budget_logged_in_production(self):
+        """Test going over budget only logs a warning outside tests"""
+        with mock.patch.object(CartDetailView, 'query_budget', 1):
+            with self.assertLogs('barber_shop.profiling', level='WARNING') as logs:
+                response = self.client.get('/api/cart/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('"budget": 1', logs.output[0])
+
+    def test_middleware_runs_natively_for_async_handlers(self):
+        """Test the middleware is a coroutine in an async stack and a plain callable in a sync one"""
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryProfilingMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(QueryProfilingMiddleware(lambda request: HttpResponse())))
+
+    async def test_async_view_profiled(self):
+        """Test async views report their queries like sync ones"""
+        get_cache().clear()
+        # The test database connection was opened before the async handler
+        # loaded the middleware on another thread, so connection_created
+        # never reached it; a server's connections all open afterwards.
+        await sync_to_async(install)()
+        with capture_profiles() as profiles:
+            response = await self.async_client.get('/api/services/async/')
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertEqual(profiles[0].view, 'services.views.service_list')
+        self.assertGreaterEqual(profiles[0].queries, 1)
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_values_match_stdlib_output(self):
+        """Test Decimals, dates, times and lazy strings render exactly as JSONRenderer does"""
+        self.assertRendersLikeDRF({
+            'price': Decimal('49.50'),
+            'date': date(2025, 1, 6),
+            'time': time(9, 30, 15, 123456),
+            'utc': datetime(2025, 1, 6, 9, 0, tzinfo=dt_timezone.utc),
+            'offset': datetime(2025, 1, 6, 9, 0, 0, 987654, tzinfo=dt_timezone(timedelta(hours=2))),
+            'naive': datetime(2025, 1, 6, 9, 0),
+            'duration': timedelta(minutes=90),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Pending'),
+            'tags': {'vip'},
+            'nested': [{1: 'int key', 'name': 'Zoë'}, (1.5, None, True)],
+            'separator': 'line break ',
+        })
+
+    def test_unencodable_values_fall_back_to_stdlib(self):
+        """Test values orjson can't encode are still rendered by the stdlib"""
+        self.assertRendersLikeDRF({'big': 2 ** 70})
+        with self.assertRaises(TypeError):
+            ORJSONRenderer().render({'value': object()})
+
+    def test_non_finite_floats_render_as_null(self):
+        """Test NaN and infinities render as null, where JSONRenderer raises"""
+        data = {'nan': float('nan'), 'inf': float('-inf')}
+        self.assertEqual(ORJSONRenderer().render(data), b'{"nan":null,"inf":null}')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+
+    def test_indent_uses_stdlib(self):
+        """Test indented output matches JSONRenderer"""
+        data = {'a': [1, 2]}
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_parser_matches_stdlib(self):
+        """Test the parser reads bodies like JSONParser and rejects the same input"""
+        body = '{"service_id": 3, "price": 12.5, "notes": "Zoë", "slots": [null, true]}'.encode()
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body))
+        )
+        for invalid in (b'{"a": NaN}', b'{"a": 1,}', b'\xff'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(invalid))
+
+
+class ORJSONResponseTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+
+    def test_api_responses_match_stdlib_bytes(self):
+        """Test serializer payloads render to the same bytes as JSONRenderer"""
+        self.client.post('/api/cart/add/', {'service_id': self.service.id, 'quantity': 2}, format='json')
+        cart = self.client.get('/api/cart/')
+
+        self.assertEqual(cart.status_code, status.HTTP_200_OK)
+        self.assertEqual(cart.content, JSONRenderer().render(cart.data))
+        self.assertEqual(cart.data['items'][0]['quantity'], 2)
+
+    def test_exponent_floats_match_stdlib_bytes(self):
+        """Test floats orjson would write with a different exponent or none render as the stdlib does"""
+        for value in (Decimal('1E+16'), 1e16, Decimal('0.0000001'), 1e-7, -2e-5, 1.5e300, [1e16, 'ok']):
+            data = {'value': value, 'label': 'a,1e5', 'hash': '3e0f'}
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(1e16), JSONRenderer().render(1e16))
+        self.assertFalse(float_mismatch(ORJSONRenderer().render({'price': 50.0, 'hash': '3e0f'})))
+
+
+def sequential_scans(sql, params):
+    """Plan ``sql`` and return the steps that read a whole table without an index."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Small test tables make seq scans cheapest; forbid them so a
+            # Seq Scan in the plan means no index could answer the query.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return [row[0] for row in cursor.fetchall() if 'Seq Scan' in row[0]]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[3] for row in cursor.fetchall() if SQLITE_TABLE_SCAN.match(row[3])]
+
+
+SQLITE_TABLE_SCAN = re.compile(r'SCAN (TABLE )?\w+( AS \w+)?$')
+
+
+class QueryPlanTestCase(TestCase):
+    """Every SELECT the API's read endpoints run is answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seeded = seed(scale=0.01)
+        cls.day = seeded['booking_days'][0]
+        cls.service_id = seeded['service_ids'][0]
+        cls.staff = User.objects.get(pk=seeded['staff_ids'][0])
+        cls.customer = User.objects.get(pk=seeded['user_ids'][0])
+        cls.booking_id = cls.customer.bookings.values_list('id', flat=True).first()
+        complete_topup(CreditTopUp.objects.create(user=cls.customer, amount=Decimal('20.00')))
+        AvailabilitySchedule.objects.create(
+            service_id=cls.service_id, weekday=cls.day.weekday(),
+            opens_at=time(9, 0), closes_at=time(17, 0), capacity=2
+        )
+        AvailabilityException.objects.create(
+            date=cls.day, kind='closed', starts_at=time(12, 0), ends_at=time(13, 0)
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+
+    def capture_selects(self, method, path, data=None, user=None):
+        self.client.force_authenticate(user=user)
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = getattr(self.client, method)(path, data, format='json')
+        self.assertLess(response.status_code, 400, path)
+        return queries
+
+    def test_read_endpoints_use_indexes(self):
+        """Test EXPLAIN shows no sequential scan in any endpoint's queries"""
+        day, service = self.day, self.service_id
+        requests = [
+            ('get', '/api/services/', None, None),
+            ('get', f'/api/service-availability/?service_id={service}&date={day}', None, None),
+            ('get', f'/api/service-availability/?date={day}&is_home_service=true', None, None),
+            ('get', f'/api/service-availability/?service_id={service}&mode=virtual&date={day}', None, None),
+            ('get', '/api/equipment/', None, None),
+            ('post', '/api/auth/login/', {'email': self.customer.email, 'password': 'benchpass123'}, None),
+            ('get', '/api/auth/profile/', None, self.customer),
+            ('get', '/api/bookings/', None, self.customer),
+            ('get', '/api/bookings/?pagination=cursor', None, self.customer),
+            ('get', '/api/bookings/?projection=flat', None, self.customer),
+            ('get', '/api/bookings/', None, self.staff),
+            ('get', '/api/bookings/?pagination=cursor&projection=flat', None, self.staff),
+            ('get', f'/api/bookings/{self.booking_id}/', None, self.customer),
+            ('get', f'/api/bookings/schedule/?date_from={day}&date_to={day + timedelta(days=6)}', None, self.staff),
+            ('get', '/api/cart/', None, self.customer),
+            ('get', '/api/credit-topups/', None, self.customer),
+            ('get', '/api/credit/', None, self.customer),
+            ('get', '/api/credit/ledger/', None, self.customer),
+        ]
+        for method, path, data, user in requests:
+            for sql, params in self.capture_selects(method, path, data, user):
+                with self.subTest(path=path, sql=sql[:200]):
+                    self.assertEqual(sequential_scans(sql, params), [])
@@ -2,9 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from accounts.avatars import RENDITION_DIR
+from accounts.views import avatar_rendition
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Ahead of the DEBUG media route so renditions always get cache headers
+    path(f"{settings.MEDIA_URL.strip('/')}/{RENDITION_DIR}/<str:name>", avatar_rendition, name='avatar-rendition'),
     path('api/auth/', include('accounts.urls')),
     path('api/bookings/', include('bookings.urls')),
     path('api/services/', include('services.urls')),
@@ -0,0 +1,276 @@
+"""Load test for the whole API: seeded volumes, concurrent clients, JSON results.
+
+    python -m benchmarks.api [--scale 1.0] [--concurrency 16] [--duration 5]
+                             [--endpoints catalog bookings ...]
+                             [--output results.json] [--compare baseline.json]
+
+Seeds a throwaway database through benchmarks.factories (run with
+DATABASE_URL pointing at Postgres or SQLite), then calls each endpoint
+through the full Django stack from ``--concurrency`` threads for
+``--duration`` seconds. Reports throughput and p50/p95/p99 latency per
+endpoint. ``--output`` writes the results as JSON along with the commit and
+database they came from. ``--compare`` checks them against an earlier file
+and exits 1 if any endpoint's p95 or throughput got worse by more than
+``--threshold``.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .utils import percentile, setup_django
+
+
+class Context:
+    """Seeded ids plus pre-issued tokens shared by the scenarios."""
+
+    def __init__(self, seeded, token_users=200):
+        from accounts.models import User
+        from accounts.tokens import ClaimsRefreshToken
+
+        self.seeded = seeded
+        self.service_ids = seeded['service_ids']
+        self.days = seeded['booking_days']
+        users = User.objects.filter(pk__in=seeded['user_ids'][:token_users])
+        self.user_tokens = [str(ClaimsRefreshToken.for_user(user).access_token) for user in users]
+        staff = User.objects.filter(pk__in=seeded['staff_ids'][:10])
+        self.staff_tokens = [str(ClaimsRefreshToken.for_user(user).access_token) for user in staff]
+        self.refresh_user = users[0]
+
+    def auth(self, rng, staff=False):
+        token = rng.choice(self.staff_tokens if staff else self.user_tokens)
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+
+def scenario_catalog(ctx, rng):
+    return 'get', '/api/services/', None, {}
+
+
+def scenario_availability(ctx, rng):
+    day = ctx.seeded['booking_days'][0] + timedelta(days=rng.randrange(7))
+    path = f'/api/service-availability/?service_id={rng.choice(ctx.service_ids)}&date={day}'
+    return 'get', path, None, {}
+
+
+def scenario_equipment(ctx, rng):
+    return 'get', '/api/equipment/', None, {}
+
+
+def scenario_bookings(ctx, rng):
+    return 'get', '/api/bookings/', None, ctx.auth(rng)
+
+
+def scenario_bookings_cursor(ctx, rng):
+    return 'get', '/api/bookings/?pagination=cursor&count=false', None, ctx.auth(rng)
+
+
+def scenario_bookings_staff(ctx, rng):
+    return 'get', '/api/bookings/?pagination=cursor&count=false', None, ctx.auth(rng, staff=True)
+
+
+def scenario_bookings_flat(ctx, rng):
+    path = '/api/bookings/?pagination=cursor&count=false&page_size=100&projection=flat'
+    return 'get', path, None, ctx.auth(rng, staff=True)
+
+
+def scenario_schedule(ctx, rng):
+    start = rng.choice(ctx.days)
+    path = f'/api/bookings/schedule/?date_from={start}&date_to={start + timedelta(days=6)}'
+    return 'get', path, None, ctx.auth(rng, staff=True)
+
+
+def scenario_cart(ctx, rng):
+    return 'get', '/api/cart/', None, ctx.auth(rng)
+
+
+def scenario_cart_add(ctx, rng):
+    data = {'service_id': rng.choice(ctx.service_ids), 'quantity': 1}
+    return 'post', '/api/cart/add/', data, ctx.auth(rng)
+
+
+def scenario_profile(ctx, rng):
+    return 'get', '/api/auth/profile/', None, ctx.auth(rng)
+
+
+def scenario_token_refresh(ctx, rng):
+    from accounts.tokens import ClaimsRefreshToken
+
+    # Rotation blacklists each token, so every call needs a fresh one
+    refresh = str(ClaimsRefreshToken.for_user(ctx.refresh_user))
+    return 'post', '/api/auth/token/refresh/', {'refresh': refresh}, {}
+
+
+SCENARIOS = {
+    'catalog': scenario_catalog,
+    'availability': scenario_availability,
+    'equipment': scenario_equipment,
+    'bookings': scenario_bookings,
+    'bookings_cursor': scenario_bookings_cursor,
+    'bookings_staff': scenario_bookings_staff,
+    'bookings_flat': scenario_bookings_flat,
+    'schedule': scenario_schedule,
+    'cart': scenario_cart,
+    'cart_add': scenario_cart_add,
+    'profile': scenario_profile,
+    'token_refresh': scenario_token_refresh,
+}
+
+
+def run_scenario(ctx, scenario, concurrency, duration, warmup=5, seed=0):
+    from django.db import connection
+    from django.test import Client
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency)
+    method, path, _, _ = scenario(ctx, random.Random(seed))
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client()
+        local_latencies, local_errors = [], []
+        try:
+            try:
+                for _ in range(warmup):
+                    method, path, data, headers = scenario(ctx, rng)
+                    getattr(client, method)(path, data, **headers)
+            except Exception:
+                start.abort()
+                raise
+            start.wait()
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                method, path, data, headers = scenario(ctx, rng)
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data, **headers)
+                local_latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    local_errors.append(response.status_code)
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors.extend(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'endpoint': f"{method.upper()} {path.split('?')[0]}",
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        'max_ms': ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+def ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the change against ``baseline``; return the endpoints that regressed."""
+    regressed = []
+    print(f"\nAgainst {baseline['meta'].get('commit')} (threshold {threshold:.0%})", file=sys.stderr)
+    for name, current in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None or not before['requests']:
+            continue
+        p95_change = current['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        rps_change = current['rps'] / before['rps'] - 1 if before['rps'] else 0.0
+        worse = p95_change > threshold or rps_change < -threshold
+        if worse:
+            regressed.append(name)
+        print(f"  {name:<16} p95 {p95_change:+7.1%}  rps {rps_change:+7.1%}"
+              f"{'  REGRESSED' if worse else ''}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the seeded volumes')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per endpoint')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=0, help='random seed for request parameters')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    setup_django()
+
+    import django
+    from django.db import connection
+    from .factories import seed
+
+    seeding_started = time.perf_counter()
+    seeded = seed(args.scale)
+    seed_seconds = time.perf_counter() - seeding_started
+    ctx = Context(seeded)
+    print(f"Seeded {seeded['volumes']} in {seed_seconds:.1f}s on {connection.vendor}", file=sys.stderr)
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'scale': args.scale,
+            'volumes': seeded['volumes'],
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'seed': args.seed,
+        },
+        'endpoints': {},
+    }
+    print(f"{'endpoint':<16} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}", file=sys.stderr)
+    for name in args.endpoints:
+        result = run_scenario(ctx, SCENARIOS[name], args.concurrency, args.duration, seed=args.seed)
+        results['endpoints'][name] = result
+        print(f"{name:<16} {result['rps']:>8.1f} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms"
+              f" {result['p99_ms']:>7.1f}ms {result['errors']:>7}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressed = compare(results, json.load(fh), args.threshold)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
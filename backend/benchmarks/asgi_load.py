@@ -0,0 +1,131 @@
+"""Sync DRF views against their async versions, driven through the ASGI app.
+
+    python -m benchmarks.asgi_load [--concurrency 200] [--duration 3] [--db-latency 5]
+
+Requests go straight into ``barber_shop.asgi.application`` from one event
+loop with ``--concurrency`` clients in flight, so the numbers cover Django's
+ASGI handler and the views rather than a network stack. ``--db-latency``
+adds a sleep (ms) to every query to stand in for a remote database.
+"""
+import argparse
+import asyncio
+import time
+
+from .utils import percentile, setup_django
+
+ENDPOINTS = [
+    ('catalog', '/api/services/', '/api/services/async/', ''),
+    ('availability', '/api/service-availability/', '/api/service-availability/async/', 'date=2025-01-02'),
+    ('equipment', '/api/equipment/', '/api/equipment/async/', ''),
+]
+
+
+async def get(app, path, query):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    body_sent = False
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the response is sent
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    assert status == 200, f'{path}?{query} returned {status}'
+
+
+async def load(app, path, query, concurrency, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await get(app, path, query)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'rate': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+    }
+
+
+def seed():
+    from datetime import date, time as clock, timedelta
+    from decimal import Decimal
+    from cart.models import Equipment, ServiceAvailability
+    from services.models import Service
+
+    services = Service.objects.bulk_create(
+        Service(name=f'Service {i}', description='Benchmark service',
+                price=Decimal('30.00'), duration_minutes=30)
+        for i in range(20)
+    )
+    ServiceAvailability.objects.bulk_create(
+        ServiceAvailability(service=service, date=date(2025, 1, 1) + timedelta(days=day),
+                            start_time=clock(9 + slot), end_time=clock(10 + slot),
+                            capacity=2, remaining_slots=2)
+        for service in services for day in range(30) for slot in range(8)
+    )
+    for i in range(10):
+        Equipment.objects.create(name=f'Equipment {i}').services.set(services[:5])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--db-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup_django()
+    seed()
+
+    from django.db.backends import utils as db_utils
+    from barber_shop.asgi import application
+
+    if args.db_latency:
+        execute = db_utils.CursorWrapper.execute
+
+        def slow_execute(self, *params, **kwargs):
+            time.sleep(args.db_latency / 1000)
+            return execute(self, *params, **kwargs)
+
+        db_utils.CursorWrapper.execute = slow_execute
+
+    print(f'ASGI, {args.concurrency} concurrent clients, +{args.db_latency:g}ms per query')
+    for name, sync_path, async_path, query in ENDPOINTS:
+        for label, path in (('sync', sync_path), ('async', async_path)):
+            result = asyncio.run(load(application, path, query, args.concurrency, args.duration))
+            print(f"  {name + ' ' + label:<20} {result['rate']:>9.1f} req/s"
+                  f"  p50 {result['p50']:>7.1f}ms  p95 {result['p95']:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Open-window lookups with tens of thousands of windows per service.
+
+    python -m benchmarks.availability [--windows 30000] [--duration 2]
+"""
+import argparse
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--windows', type=int, default=30000)
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from datetime import date, time, timedelta
+    from decimal import Decimal
+    from rest_framework.test import APIRequestFactory
+    from cart.models import ServiceAvailability
+    from cart.views import ServiceAvailabilityListView
+    from services.models import Service
+
+    service = Service.objects.create(
+        name='Classic Haircut',
+        description='Benchmark service',
+        price=Decimal('30.00'),
+        duration_minutes=30,
+    )
+
+    slots_per_day = 16
+    start = date(2025, 1, 1)
+    windows = []
+    for i in range(args.windows):
+        day, slot = divmod(i, slots_per_day)
+        capacity = 2
+        booked = capacity if i % 3 == 0 else i % capacity
+        windows.append(ServiceAvailability(
+            service=service,
+            date=start + timedelta(days=day),
+            start_time=time(9 + slot // 2, 30 * (slot % 2)),
+            end_time=time(9 + slot // 2, 30 * (slot % 2) + 29),
+            capacity=capacity,
+            booked_count=booked,
+            remaining_slots=capacity - booked,
+        ))
+    ServiceAvailability.objects.bulk_create(windows, batch_size=2000)
+
+    factory = APIRequestFactory()
+    view = ServiceAvailabilityListView.as_view()
+    last_day = start + timedelta(days=args.windows // slots_per_day - 7)
+    week = f'service_id={service.id}&date_from={last_day}&date_to={last_day + timedelta(days=6)}'
+
+    def run(query):
+        return lambda: view(factory.get(f'/api/service-availability/?{query}')).render()
+
+    report(f'Service availability ({args.windows} windows, one service)', {
+        'one day': measure(run(f'service_id={service.id}&date={last_day}'), args.duration),
+        'one week': measure(run(week), args.duration),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Pages/sec of the staff booking list through BookingSerializer vs the flat projection.
+
+    python -m benchmarks.booking_list [--bookings 5000] [--page-size 500] [--duration 2]
+
+The first table renders one large page (query, serialization and JSON
+encoding, as an admin export would); the second goes through the whole
+view with ``?pagination=cursor`` at its largest page size.
+"""
+import argparse
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from accounts.models import User
+    from barber_shop.renderers import ORJSONRenderer, orjson
+    from bookings.models import Booking
+    from bookings.pagination import BookingCursorPagination
+    from bookings.projections import booking_rows, booking_values
+    from bookings.serializers import BookingSerializer
+    from bookings.views import BookingListView
+    from .factories import seed_bookings, seed_services, seed_users
+
+    user_ids = seed_users(500, 10)
+    service_ids = seed_services(50)
+    seed_bookings(args.bookings, user_ids[10:], user_ids[:10], service_ids)
+
+    factory = APIRequestFactory()
+    request = factory.get('/api/bookings/')
+    queryset = Booking.objects.select_related('user', 'service').order_by('starts_at', 'id')
+    page = slice(0, args.page_size)
+
+    def serializer():
+        data = BookingSerializer(queryset[page], many=True, context={'request': request}).data
+        JSONRenderer().render(data)
+
+    def flat(renderer):
+        def call():
+            renderer.render(booking_rows(booking_values(queryset)[page], request))
+        return call
+
+    encoder = 'orjson' if orjson else 'stdlib json, orjson not installed'
+    report(f'One page of {args.page_size} bookings', {
+        'BookingSerializer': measure(serializer, args.duration, warmup=2),
+        'flat, stdlib json': measure(flat(JSONRenderer()), args.duration, warmup=2),
+        f'flat, {encoder}': measure(flat(ORJSONRenderer()), args.duration, warmup=2),
+    })
+
+    staff_user = User.objects.get(pk=Booking.objects.values_list('staff_id', flat=True).first())
+    view = BookingListView.as_view()
+    page_size = BookingCursorPagination.max_page_size
+
+    def run(query):
+        def call():
+            request = factory.get(f'/api/bookings/?pagination=cursor&count=false&page_size={page_size}{query}')
+            force_authenticate(request, user=staff_user)
+            view(request).render()
+        return call
+
+    print()
+    report(f'GET /api/bookings/ as staff, {page_size} per page', {
+        'BookingSerializer': measure(run(''), args.duration, warmup=2),
+        'projection=flat': measure(run('&projection=flat'), args.duration, warmup=2),
+    })
+
+
+if __name__ == '__main__':
+    main()
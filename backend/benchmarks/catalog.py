@@ -0,0 +1,65 @@
+"""Requests/sec of the public service catalog with and without the cache.
+
+    python -m benchmarks.catalog [--services 50] [--duration 2]
+"""
+import argparse
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from decimal import Decimal
+    from rest_framework import generics, permissions
+    from rest_framework.test import APIRequestFactory
+    from services.cache import get_cache
+    from services.models import Service
+    from services.serializers import ServiceSerializer
+    from services.views import ServiceListView
+
+    class UncachedServiceListView(generics.ListAPIView):
+        """The catalog view as it was before caching."""
+        serializer_class = ServiceSerializer
+        permission_classes = [permissions.AllowAny]
+
+        def get_queryset(self):
+            return Service.objects.filter(is_active=True).order_by('name')
+
+    Service.objects.bulk_create([
+        Service(
+            name=f'Service {i:04d}',
+            description='Benchmark service ' * 10,
+            price=Decimal('25.00') + i,
+            duration_minutes=15 + i % 90,
+        )
+        for i in range(args.services)
+    ])
+    get_cache().clear()
+
+    factory = APIRequestFactory()
+    uncached = UncachedServiceListView.as_view()
+    cached = ServiceListView.as_view()
+    etag = cached(factory.get('/api/services/'))['ETag']
+
+    def run(view, **headers):
+        def call():
+            response = view(factory.get('/api/services/', **headers))
+            if hasattr(response, 'render'):
+                response.render()
+        return call
+
+    report(f'Service catalog ({args.services} active services)', {
+        'uncached': measure(run(uncached), args.duration),
+        'cached': measure(run(cached), args.duration),
+        'cached, revalidated 304': measure(run(cached, HTTP_IF_NONE_MATCH=etag), args.duration),
+    })
+
+
+if __name__ == '__main__':
+    main()
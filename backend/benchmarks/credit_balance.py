@@ -0,0 +1,79 @@
+"""Balance reads/sec: summing a user's history vs the materialized CreditBalance row.
+
+    python -m benchmarks.credit_balance [--entries 20000] [--threads 8] [--duration 2]
+
+One user gets ``--entries`` completed top-ups and as many ledger entries.
+The first table reads their balance both ways; the second spends from one
+balance on ``--threads`` threads and checks no update was lost.
+"""
+import argparse
+import threading
+import time
+from decimal import Decimal
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--spends', type=int, default=200, help='Spends per thread')
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+    from django.db.models import Sum
+    from cart.models import CreditBalance, CreditLedgerEntry, CreditTopUp
+    from cart.wallet import get_balance, reconcile_balances, spend_credit
+    from .factories import BATCH_SIZE, seed_users
+
+    user_id = seed_users(1, 0)[0]
+    CreditTopUp.objects.bulk_create(
+        (CreditTopUp(user_id=user_id, amount=Decimal('10.00'), status='completed') for _ in range(args.entries)),
+        batch_size=BATCH_SIZE,
+    )
+    CreditLedgerEntry.objects.bulk_create(
+        (CreditLedgerEntry(user_id=user_id, kind=CreditLedgerEntry.TOP_UP, amount=Decimal('10.00'))
+         for _ in range(args.entries)),
+        batch_size=BATCH_SIZE,
+    )
+    CreditBalance.objects.create(user_id=user_id, balance=Decimal('10.00') * args.entries)
+
+    def summed():
+        return CreditTopUp.objects.filter(user_id=user_id, status='completed').aggregate(total=Sum('amount'))['total']
+
+    assert summed() == get_balance(user_id)
+    report(f'Balance of a user with {args.entries} top-ups', {
+        'SUM(credit_topups)': measure(summed, args.duration),
+        'CreditBalance row': measure(lambda: get_balance(user_id), args.duration),
+    })
+
+    before = get_balance(user_id)
+
+    def spend():
+        try:
+            for _ in range(args.spends):
+                spend_credit(user_id, Decimal('1.00'))
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=spend) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    spent = before - get_balance(user_id)
+    print()
+    print(f'{args.threads} threads x {args.spends} spends on one balance: '
+          f'{args.threads * args.spends / elapsed:,.0f} spends/s, {spent} debited, '
+          f'{len(list(reconcile_balances()))} balances off the ledger')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Booking export: a response built in memory vs the streaming export endpoint.
+
+    python -m benchmarks.export [--bookings 200000]
+
+Both produce the same CSV of ``--bookings`` rows. The baseline reads every
+row with ``list()`` and writes the file into one ``HttpResponse``, as an
+export built on the list endpoint or the admin would; the second consumes
+``/api/bookings/export/``. Each reports rows/s and how far resident memory
+rose above where it started (read from /proc, so Linux only). The streaming
+run goes first, so it isn't measured on top of the baseline's leftovers.
+"""
+import argparse
+import csv
+import gc
+import os
+import time
+
+from .utils import setup_django
+
+
+def resident_memory():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure_export(export):
+    gc.collect()
+    baseline = peak = resident_memory()
+    started = time.perf_counter()
+    for n, _ in enumerate(export()):
+        if n % 20 == 0:
+            peak = max(peak, resident_memory())
+    elapsed = time.perf_counter() - started
+    return elapsed, max(peak, resident_memory()) - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bookings', type=int, default=200000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.http import HttpResponse
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from bookings.views import BookingExportView
+    from barber_shop.exports import csv_cell
+    from .factories import seed_bookings, seed_services, seed_users
+
+    user_ids = seed_users(550, 50)
+    seed_bookings(args.bookings, user_ids[50:], user_ids[:50], seed_services(100))
+    admin = User.objects.get(pk=user_ids[0])
+    admin.role = 'admin'
+    admin.save(update_fields=['role'])
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    view = BookingExportView
+
+    def streamed():
+        response = client.get('/api/bookings/export/')
+        assert response.status_code == 200
+        yield from response.streaming_content
+        response.close()
+
+    def in_memory():
+        rows = list(view.queryset.values_list(*(lookup for _, lookup in view.columns)))
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        writer = csv.writer(response)
+        writer.writerow([header for header, _ in view.columns])
+        writer.writerows([csv_cell(value) for value in row] for row in rows)
+        yield response.content
+
+    results = {'streaming export': measure_export(streamed), 'in-memory response': measure_export(in_memory)}
+
+    print(f'CSV export of {args.bookings} bookings')
+    for label, (elapsed, grown) in results.items():
+        print(f'  {label:<20} {args.bookings / elapsed:>10.0f} rows/s  {grown / 2 ** 20:>8.1f} MB resident')
+
+
+if __name__ == '__main__':
+    main()
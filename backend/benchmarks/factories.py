@@ -0,0 +1,173 @@
+"""Bulk factories that seed realistic data volumes for the load benchmarks.
+
+Rows are built in memory and written with bulk_create in batches, so
+``seed()`` at full scale (5k users, 1k services, 50k windows, 200k
+bookings) takes seconds rather than the hours per-row saves would.
+Everything is deterministic for a given scale.
+"""
+import math
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+BATCH_SIZE = 5000
+SLOTS_PER_DAY = 18  # 30-minute slots from 09:00
+SLOT_MINUTES = 30
+START_DATE = date(2025, 1, 6)
+
+VOLUMES = {
+    'users': 5000,
+    'staff': 50,
+    'services': 1000,
+    'windows': 50000,
+    'bookings': 200000,
+    'equipment': 100,
+}
+
+
+def scaled_volumes(scale):
+    return {name: max(1, int(count * scale)) for name, count in VOLUMES.items()}
+
+
+def slot_start(index):
+    minutes = index * SLOT_MINUTES
+    return time(9 + minutes // 60, minutes % 60)
+
+
+def seed_users(count, staff):
+    from django.contrib.auth.hashers import make_password
+    from accounts.models import User
+
+    # One hash for everyone; hashing per user would dominate the seed time
+    password = make_password('benchpass123')
+    User.objects.bulk_create(
+        (User(username=f'user{i}', email=f'user{i}@example.com', password=password,
+              first_name='Bench', last_name=str(i), role='staff' if i < staff else 'user')
+         for i in range(count)),
+        batch_size=BATCH_SIZE,
+    )
+    return list(User.objects.order_by('id').values_list('id', flat=True))
+
+
+def seed_services(count):
+    from services.models import Service
+
+    Service.objects.bulk_create(
+        (Service(name=f'Service {i:04d}', description='Benchmark service',
+                 price=Decimal(20 + i % 60), duration_minutes=SLOT_MINUTES)
+         for i in range(count)),
+        batch_size=BATCH_SIZE,
+    )
+    return list(Service.objects.order_by('id').values_list('id', flat=True))
+
+
+def seed_windows(count, service_ids):
+    from cart.models import ServiceAvailability
+
+    def build():
+        for i in range(count):
+            day, slot = divmod(i // len(service_ids), 8)
+            capacity = 2
+            booked = i % 3
+            yield ServiceAvailability(
+                service_id=service_ids[i % len(service_ids)],
+                date=START_DATE + timedelta(days=day),
+                start_time=slot_start(slot * 2),
+                end_time=slot_start(slot * 2 + 2),
+                capacity=capacity,
+                booked_count=min(booked, capacity),
+                # bulk_create skips save(), which normally keeps this in sync
+                remaining_slots=max(capacity - booked, 0),
+                is_home_service=i % 5 == 0,
+            )
+
+    ServiceAvailability.objects.bulk_create(build(), batch_size=BATCH_SIZE)
+
+
+def seed_bookings(count, user_ids, staff_ids, service_ids):
+    """
+    Bookings on a dense staff x day x slot grid.
+
+    Each staff member holds at most one booking per slot, so the rows
+    satisfy the PostgreSQL overlap constraint.
+    """
+    from django.utils import timezone
+    from bookings.models import Booking
+
+    statuses = ['confirmed', 'confirmed', 'pending', 'completed', 'cancelled']
+
+    def build():
+        for i in range(count):
+            cell, staff = divmod(i, len(staff_ids))
+            day, slot = divmod(cell, SLOTS_PER_DAY)
+            appointment_date = START_DATE + timedelta(days=day)
+            appointment_time = slot_start(slot)
+            starts_at = timezone.make_aware(datetime.combine(appointment_date, appointment_time))
+            yield Booking(
+                user_id=user_ids[(i * 7919) % len(user_ids)],
+                service_id=service_ids[i % len(service_ids)],
+                staff_id=staff_ids[staff],
+                appointment_date=appointment_date,
+                appointment_time=appointment_time,
+                starts_at=starts_at,
+                ends_at=starts_at + timedelta(minutes=SLOT_MINUTES),
+                status=statuses[i % len(statuses)],
+                is_vip=i % 20 == 0,
+            )
+
+    Booking.objects.bulk_create(build(), batch_size=BATCH_SIZE)
+    days = math.ceil(count / (len(staff_ids) * SLOTS_PER_DAY))
+    return [START_DATE + timedelta(days=day) for day in range(days)]
+
+
+def seed_carts(user_ids, service_ids):
+    from cart.models import Cart, CartItem
+
+    Cart.objects.bulk_create((Cart(user_id=user_id) for user_id in user_ids), batch_size=BATCH_SIZE)
+    carts = Cart.objects.filter(user_id__in=user_ids).values_list('id', flat=True)
+    CartItem.objects.bulk_create(
+        (CartItem(cart_id=cart_id, service_id=service_ids[(cart_id + n) % len(service_ids)],
+                  quantity=1 + n)
+         for cart_id in carts for n in range(3)),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def seed_equipment(count, service_ids):
+    from cart.models import Equipment
+
+    Equipment.objects.bulk_create(
+        Equipment(name=f'Equipment {i:03d}', surcharge=Decimal('5.00')) for i in range(count)
+    )
+    through = Equipment.services.through
+    through.objects.bulk_create(
+        (through(equipment_id=equipment_id, service_id=service_ids[(equipment_id + n) % len(service_ids)])
+         for equipment_id in Equipment.objects.values_list('id', flat=True) for n in range(3)),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def seed(scale=1.0):
+    """Seed every table the API reads and return the ids the scenarios need."""
+    from bookings.schedule import rebuild_days
+
+    volumes = scaled_volumes(scale)
+    user_ids = seed_users(volumes['users'], min(volumes['staff'], volumes['users']))
+    staff_ids = user_ids[:volumes['staff']]
+    customer_ids = user_ids[volumes['staff']:] or user_ids
+    service_ids = seed_services(volumes['services'])
+    seed_windows(volumes['windows'], service_ids)
+    booking_days = seed_bookings(volumes['bookings'], customer_ids, staff_ids, service_ids)
+    # bulk_create skips the signals that maintain the schedule read model
+    rebuild_days(booking_days)
+    seed_carts(customer_ids[:max(1, len(customer_ids) // 2)], service_ids)
+    seed_equipment(volumes['equipment'], service_ids)
+
+    return {
+        'volumes': volumes,
+        'user_ids': customer_ids,
+        'staff_ids': staff_ids,
+        'service_ids': service_ids,
+        'booking_days': booking_days,
+    }
@@ -0,0 +1,52 @@
+"""Materializing a year of availability windows from recurring schedules.
+
+    python -m benchmarks.generate_availability [--services 10] [--days 365]
+
+Every service is open 09:00-17:00 Monday to Saturday in 30-minute slots,
+in-store and at home. A second run over the same range shows the cost of
+a no-op regeneration.
+"""
+import argparse
+import time
+
+from .utils import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', type=int, default=10)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from datetime import date, timedelta
+    from decimal import Decimal
+    from cart.availability import generate_windows
+    from cart.models import AvailabilitySchedule
+    from services.models import Service
+
+    services = Service.objects.bulk_create(
+        Service(name=f'Service {i}', description='Benchmark service',
+                price=Decimal('30.00'), duration_minutes=30)
+        for i in range(args.services)
+    )
+    AvailabilitySchedule.objects.bulk_create(
+        AvailabilitySchedule(service=service, weekday=weekday, opens_at='09:00',
+                             closes_at='17:00', capacity=2, is_home_service=home)
+        for service in services for weekday in range(6) for home in (False, True)
+    )
+
+    date_from = date(2025, 1, 1)
+    date_to = date_from + timedelta(days=args.days - 1)
+    print(f'{args.services} services, {args.days} days')
+    for label in ('first run', 'regenerate'):
+        started = time.perf_counter()
+        created = generate_windows(date_from, date_to)
+        elapsed = time.perf_counter() - started
+        print(f'  {label:<12} {created:>8} windows created in {elapsed:6.2f}s'
+              f'  ({created / elapsed:,.0f}/s)')
+
+
+if __name__ == '__main__':
+    main()
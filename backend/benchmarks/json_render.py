@@ -0,0 +1,81 @@
+"""Renders/sec of API payloads with DRF's JSONRenderer vs the orjson renderer.
+
+    python -m benchmarks.json_render [--rows 500] [--duration 2]
+
+Serializer output is built once per payload, so only JSON encoding is
+timed: a page of ``--rows`` bookings, a cart of 20 items, ``--rows``
+availability windows, and parsing a bulk-add request body.
+"""
+import argparse
+import io
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+    from barber_shop.parsers import ORJSONParser
+    from barber_shop.renderers import ORJSONRenderer, orjson
+    from bookings.models import Booking
+    from bookings.serializers import BookingSerializer
+    from cart.models import CartItem, ServiceAvailability
+    from cart.serializers import CartSerializer, ServiceAvailabilitySerializer
+    from cart.views import get_cart_with_totals
+    from accounts.models import User
+    from .factories import seed_bookings, seed_carts, seed_services, seed_users, seed_windows
+
+    if orjson is None:
+        print('orjson is not installed; both renderers use the stdlib.')
+
+    user_ids = seed_users(200, 10)
+    service_ids = seed_services(50)
+    seed_windows(args.rows, service_ids)
+    seed_bookings(args.rows, user_ids[10:], user_ids[:10], service_ids)
+    seed_carts(user_ids[10:11], service_ids)
+    cart_user = User.objects.get(pk=user_ids[10])
+    cart = get_cart_with_totals(cart_user)
+    CartItem.objects.bulk_create(
+        CartItem(cart=cart, service_id=service_id, quantity=2) for service_id in service_ids[10:27]
+    )
+
+    context = {'request': APIRequestFactory().get('/')}
+    payloads = {
+        'BookingSerializer': BookingSerializer(
+            Booking.objects.select_related('user', 'service')[:args.rows], many=True, context=context
+        ).data,
+        'CartSerializer': CartSerializer(get_cart_with_totals(cart_user), context=context).data,
+        'ServiceAvailabilitySerializer': ServiceAvailabilitySerializer(
+            ServiceAvailability.objects.select_related('service')[:args.rows], many=True, context=context
+        ).data,
+    }
+
+    stdlib, fast = JSONRenderer(), ORJSONRenderer()
+    for label, data in payloads.items():
+        assert fast.render(data) == stdlib.render(data), label
+        report(f'{label} ({len(stdlib.render(data)) // 1024} KiB)', {
+            'JSONRenderer': measure(lambda: stdlib.render(data), args.duration),
+            'ORJSONRenderer': measure(lambda: fast.render(data), args.duration),
+        })
+        print()
+
+    body = stdlib.render({'items': [
+        {'service_id': service_id, 'quantity': 1, 'use_new_equipment': False, 'equipment_surcharge': '5.00'}
+        for service_id in service_ids
+    ]})
+    report(f'Parse a bulk-add body ({len(body) // 1024} KiB)', {
+        'JSONParser': measure(lambda: JSONParser().parse(io.BytesIO(body)), args.duration),
+        'ORJSONParser': measure(lambda: ORJSONParser().parse(io.BytesIO(body)), args.duration),
+    })
+
+
+if __name__ == '__main__':
+    main()
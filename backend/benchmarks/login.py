@@ -0,0 +1,60 @@
+"""Login throughput: the old lookup-then-authenticate path against EmailBackend.
+
+    python -m benchmarks.login [--iterations 600000] [--duration 2]
+
+Also measures failed logins from one client, where throttled attempts are
+refused without hashing.
+"""
+import argparse
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=None,
+                        help='PBKDF2 iterations (defaults to PASSWORD_HASH_ITERATIONS)')
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth import authenticate
+    from django.core.cache import cache
+    from rest_framework.test import APIRequestFactory
+    from accounts.models import User
+    from accounts.views import login
+
+    if args.iterations:
+        settings.PASSWORD_HASH_ITERATIONS = args.iterations
+    User.objects.create_user(username='bench', email='bench@example.com', password='benchpass123')
+    factory = APIRequestFactory()
+
+    def old_path():
+        user = User.objects.get(email='bench@example.com')
+        authenticate(username=user.username, password='benchpass123')
+
+    def new_path():
+        authenticate(email='bench@example.com', password='benchpass123')
+
+    def login_view(password, reset_failures=False):
+        def call():
+            if reset_failures:
+                cache.clear()
+            login(factory.post('/api/auth/login/', {'email': 'bench@example.com', 'password': password})).render()
+        return call
+
+    report(f'Login ({settings.PASSWORD_HASH_ITERATIONS} PBKDF2 iterations)', {
+        'lookup + authenticate': measure(old_path, args.duration, warmup=2),
+        'EmailBackend': measure(new_path, args.duration, warmup=2),
+        'login endpoint': measure(login_view('benchpass123'), args.duration, warmup=2),
+    })
+    report('Failed logins from one client', {
+        'every attempt hashed': measure(login_view('wrong', reset_failures=True), args.duration, warmup=2),
+        'throttled': measure(login_view('wrong'), args.duration, warmup=2),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Refresh throughput as the token blacklist grows.
+
+    python -m benchmarks.refresh [--sizes 0 10000 90000] [--duration 2]
+
+Each call rotates a fresh refresh token, so every call also adds an entry.
+"""
+import argparse
+import uuid
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 10000, 90000])
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.views import TokenRefreshView
+    from accounts.blacklist import BLACKLIST_KEY, get_blacklist_cache
+    from accounts.models import User
+    from accounts.tokens import ClaimsRefreshToken
+
+    user = User.objects.create_user(username='bench', email='bench@example.com', password='benchpass123')
+    factory = APIRequestFactory()
+    view = TokenRefreshView.as_view()
+    blacklist = get_blacklist_cache()
+
+    def refresh():
+        token = str(ClaimsRefreshToken.for_user(user))
+        response = view(factory.post('/api/auth/token/refresh/', {'refresh': token}))
+        assert response.status_code == 200, response.data
+
+    results = {}
+    for size in args.sizes:
+        blacklist.clear()
+        blacklist.set_many(
+            {BLACKLIST_KEY.format(jti=uuid.uuid4().hex): 1 for _ in range(size)},
+            timeout=3600,
+        )
+        results[f'{size} blacklisted'] = measure(refresh, args.duration, warmup=20)
+    report('Token refresh with rotation and blacklisting', results)
+
+
+if __name__ == '__main__':
+    main()
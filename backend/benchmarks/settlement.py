@@ -0,0 +1,78 @@
+"""Top-up settlement throughput: webhook ingestion, then per-event vs batched settlement.
+
+    python -m benchmarks.settlement [--topups 5000] [--batch 500]
+
+``--topups`` pending top-ups are spread over 500 users and paid through
+the fake provider. The webhook stores events in deliveries of ``--batch``,
+and then they are settled. The baseline completes each top-up on its own
+with ``cart.wallet.complete_topup``; ``settle_events`` applies
+``--batch`` events per transaction.
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from .utils import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--topups', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from rest_framework.test import APIClient
+    from cart.models import CreditTopUp, PaymentEvent
+    from cart.payments import FakePaymentProvider, new_payment_intent_id
+    from cart.settlement import settle_events
+    from cart.wallet import complete_topup, reconcile_balances
+    from .factories import BATCH_SIZE, seed_users
+
+    settings.PAYMENT_WEBHOOK_SECRET = 'bench-secret'
+    provider = FakePaymentProvider()
+    client = APIClient()
+    user_ids = seed_users(500, 0)
+
+    def seed_topups():
+        CreditTopUp.objects.bulk_create(
+            (CreditTopUp(user_id=user_ids[i % len(user_ids)], amount=Decimal('10.00'),
+                         payment_intent_id=new_payment_intent_id())
+             for i in range(args.topups)),
+            batch_size=BATCH_SIZE,
+        )
+        return list(CreditTopUp.objects.filter(status='pending'))
+
+    def timed(func):
+        started = time.perf_counter()
+        func()
+        return args.topups / (time.perf_counter() - started)
+
+    rates = {}
+    topups = seed_topups()
+    rates['complete_topup'] = timed(lambda: [complete_topup(topup) for topup in topups])
+
+    topups = seed_topups()
+    events = [provider.event(topup) for topup in topups]
+
+    def ingest():
+        for start in range(0, len(events), args.batch):
+            response = provider.deliver(client, events[start:start + args.batch])
+            assert response.status_code == 200, response.content
+
+    rates['webhook ingestion'] = timed(ingest)
+    rates[f'settle_events({args.batch})'] = timed(lambda: settle_events(args.batch))
+
+    assert not CreditTopUp.objects.filter(status='pending').exists()
+    assert not PaymentEvent.objects.filter(processed_at__isnull=True).exists()
+    assert not list(reconcile_balances())
+
+    print(f'{args.topups} top-ups over {len(user_ids)} users')
+    for label, rate in rates.items():
+        print(f'  {label:<24} {rate:>10.1f} top-ups/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Shared helpers for the scripts in this package.
+
+Each benchmark runs against a throwaway test database, so it can be pointed
+at SQLite or Postgres through DATABASE_URL without touching real data::
+
+    DATABASE_URL=sqlite:///bench.sqlite3 python -m benchmarks.catalog
+"""
+import atexit
+import math
+import os
+import time
+
+
+def setup_django():
+    """Configure Django and create a fresh test database for the benchmark."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'barber_shop.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    settings.ALLOWED_HOSTS = ['*']
+    # Measure the app itself, not the per-request profiler and its log lines
+    settings.QUERY_PROFILING = False
+    # DEBUG would log every query through the debug cursor
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    atexit.register(connection.creation.destroy_test_db, old_name, verbosity=0)
+
+
+def measure(func, duration=2.0, warmup=10):
+    """Call ``func`` repeatedly for ``duration`` seconds and return calls/sec."""
+    for _ in range(warmup):
+        func()
+
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        func()
+        calls += 1
+    return calls / (time.perf_counter() - started)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[max(1, math.ceil(pct / 100 * len(values))) - 1]
+
+
+def report(title, results):
+    """Print ``{label: calls_per_second}`` with the speedup over the first entry."""
+    print(title)
+    baseline = None
+    for label, rate in results.items():
+        baseline = baseline or rate
+        print(f'  {label:<24} {rate:>10.1f} req/s  ({rate / baseline:.2f}x)')
@@ -0,0 +1,76 @@
+"""Computing a 30-day horizon of virtual availability.
+
+    python -m benchmarks.virtual_availability [--services 50] [--bookings 20000] [--days 30]
+
+Every service is scheduled Monday to Saturday, 09:00-18:00 in 30-minute
+slots, in store and at home. Compares computing the horizon with reading
+the same windows once they are materialized. Also compares the
+sorted-sweep overlap count with a per-slot scan of the day's bookings.
+"""
+import argparse
+
+from .utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--services', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=2.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from datetime import timedelta
+    from cart.availability import booked_counts, generate_windows, virtual_windows
+    from cart.models import AvailabilitySchedule, ServiceAvailability
+    from .factories import START_DATE, seed_bookings, seed_services, seed_users
+
+    user_ids = seed_users(200, staff=50)
+    service_ids = seed_services(args.services)
+    AvailabilitySchedule.objects.bulk_create(
+        AvailabilitySchedule(service_id=service_id, weekday=weekday, opens_at='09:00',
+                             closes_at='18:00', capacity=3, is_home_service=home)
+        for service_id in service_ids for weekday in range(6) for home in (False, True)
+    )
+    seed_bookings(args.bookings, user_ids[50:], user_ids[:50], service_ids)
+
+    date_from = START_DATE
+    date_to = date_from + timedelta(days=args.days - 1)
+    generate_windows(date_from, date_to)
+    windows = len(virtual_windows(date_from, date_to))
+
+    def materialized_all():
+        list(ServiceAvailability.objects.open_windows(date_from=date_from, date_to=date_to))
+
+    def materialized_one():
+        list(ServiceAvailability.objects.open_windows(service_id=service_ids[0], date_from=date_from, date_to=date_to))
+
+    report(f'{args.days}-day horizon, one service', {
+        'materialized query': measure(materialized_one, args.duration, warmup=2),
+        'virtual': measure(lambda: virtual_windows(date_from, date_to, service_id=service_ids[0]),
+                           args.duration, warmup=2),
+    })
+    report(f'{args.days}-day horizon, {args.services} services ({windows} open windows)', {
+        'materialized query': measure(materialized_all, args.duration, warmup=1),
+        'virtual': measure(lambda: virtual_windows(date_from, date_to), args.duration, warmup=1),
+    })
+
+    # One busy day: 500 bookings against 36 slots
+    starts = sorted(range(0, 500 * 30, 30))
+    ends = sorted(start + 45 for start in starts)
+    slots = [(minute, minute + 30) for minute in range(0, 36 * 30, 30)]
+
+    def scan():
+        return [sum(1 for s, e in zip(starts, ends) if s < end and e > start) for start, end in slots]
+
+    assert scan() == booked_counts(starts, ends, slots)
+    report('Overlap counts for one day', {
+        'per-slot scan': measure(scan, args.duration),
+        'sorted sweep': measure(lambda: booked_counts(starts, ends, slots), args.duration),
+    })
+
+
+if __name__ == '__main__':
+    main()
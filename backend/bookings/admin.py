@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Booking
+from django.contrib import admin, messages
+from django.db import transaction
+from cart.wallet import InsufficientCredit
+from .models import Booking, ScheduleDay
+from .reservations import SlotUnavailable, delete_booking, lock_booking, update_booking_status
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
@@ -10,4 +13,31 @@ class BookingAdmin(admin.ModelAdmin):
     date_hierarchy = 'appointment_date'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'service')
\ No newline at end of file
+        return super().get_queryset(request).select_related('user', 'service')
+
+    def save_model(self, request, obj, form, change):
+        # Status changes go through the reservations helpers, as in the API,
+        # so capacity and credit follow them
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+        try:
+            with transaction.atomic():
+                previous_status = lock_booking(obj)
+                super().save_model(request, obj, form, change)
+                update_booking_status(obj, previous_status)
+        except (SlotUnavailable, InsufficientCredit) as exc:
+            self.message_user(request, f'{obj} was not changed: {exc.detail}', messages.ERROR)
+
+    def delete_model(self, request, obj):
+        delete_booking(obj)
+
+    def delete_queryset(self, request, queryset):
+        for booking in queryset:
+            delete_booking(booking)
+
+@admin.register(ScheduleDay)
+class ScheduleDayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'booking_count', 'updated_at')
+    date_hierarchy = 'date'
+    readonly_fields = ('date', 'bookings', 'booking_count', 'updated_at')
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class BookingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'bookings'
\ No newline at end of file
+    name = 'bookings'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from bookings.models import Booking, ScheduleDay
+from bookings.schedule import rebuild_days
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-day staff schedule read model from the bookings table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=parse_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--date-to', type=parse_date, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.all()
+        schedules = ScheduleDay.objects.all()
+        if options['date_from']:
+            bookings = bookings.filter(appointment_date__gte=options['date_from'])
+            schedules = schedules.filter(date__gte=options['date_from'])
+        if options['date_to']:
+            bookings = bookings.filter(appointment_date__lte=options['date_to'])
+            schedules = schedules.filter(date__lte=options['date_to'])
+
+        # Days that only have stale schedule rows get rebuilt to empty
+        dates = set(bookings.values_list('appointment_date', flat=True).distinct())
+        dates |= set(schedules.values_list('date', flat=True))
+        rebuild_days(dates)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the schedule for {len(dates)} days'))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_intervals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='bookings_appt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'appointment_date', 'appointment_time', 'id'], name='bookings_user_appt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['service', 'appointment_date'], name='bookings_service_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['appointment_date', 'appointment_time', 'id'], name='bookings_pending_appt_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+OVERLAP_CONSTRAINT = 'bookings_no_overlap'
+
+# Mirrors the resource rules in bookings.reservations.find_overlap: a staff
+# member can't hold two overlapping bookings, and neither can the shared
+# chair used by unassigned bookings outside an availability window.
+# Databases that got the constraint from the old post_migrate hook keep it,
+# and going back leaves btree_gist installed.
+CREATE_SQL = f'''
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{OVERLAP_CONSTRAINT}') THEN
+        ALTER TABLE bookings_booking ADD CONSTRAINT {OVERLAP_CONSTRAINT}
+        EXCLUDE USING gist (
+            (COALESCE(staff_id, 0)) WITH =,
+            tstzrange(starts_at, ends_at, '[)') WITH &&
+        )
+        WHERE (status <> 'cancelled' AND (staff_id IS NOT NULL OR availability_id IS NULL));
+    END IF;
+END
+$$
+'''
+DROP_SQL = f'ALTER TABLE bookings_booking DROP CONSTRAINT IF EXISTS {OVERLAP_CONSTRAINT}'
+
+
+def run_on_postgresql(sql):
+    # There's no exclusion constraint outside PostgreSQL; find_overlap is the only check there
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_credit_amount'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_SQL), run_on_postgresql(DROP_SQL)),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+OVERLAP_CONSTRAINT = 'bookings_no_overlap'
+
+
+def overlap_constraint_sql(chair_condition):
+    return f'''
+ALTER TABLE bookings_booking DROP CONSTRAINT IF EXISTS {OVERLAP_CONSTRAINT};
+ALTER TABLE bookings_booking ADD CONSTRAINT {OVERLAP_CONSTRAINT}
+EXCLUDE USING gist (
+    (COALESCE(staff_id, 0)) WITH =,
+    tstzrange(starts_at, ends_at, '[)') WITH &&
+)
+WHERE (status <> 'cancelled' AND (staff_id IS NOT NULL OR ({chair_condition})));
+'''
+
+
+# Bookings in a virtual availability slot leave the default chair, as those
+# in a window do; see bookings.reservations.find_overlap.
+CREATE_SQL = overlap_constraint_sql('availability_id IS NULL AND NOT virtual_slot')
+REVERSE_SQL = overlap_constraint_sql('availability_id IS NULL')
+
+
+def run_on_postgresql(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_overlap_constraint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_chair_start_idx',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='virtual_slot',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('availability__isnull', True), ('staff__isnull', True), ('virtual_slot', False), models.Q(('status', 'cancelled'), _negated=True)), fields=['starts_at'], name='bookings_chair_start_idx'),
+        ),
+        migrations.RunPython(run_on_postgresql(CREATE_SQL), run_on_postgresql(REVERSE_SQL)),
+    ]
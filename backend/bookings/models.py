@@ -1,5 +1,7 @@
+from datetime import datetime, timedelta
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from services.models import Service
 
 class Booking(models.Model):
@@ -12,20 +14,101 @@ class Booking(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings')
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    # The availability window this booking holds a place in, if the slot has one
+    availability = models.ForeignKey(
+        'cart.ServiceAvailability', on_delete=models.SET_NULL,
+        related_name='bookings', blank=True, null=True
+    )
+    # The chair/staff member the booking occupies; unassigned bookings share
+    # the shop's default chair unless they hold a place in an availability
+    # window or in a slot of virtual availability.
+    staff = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        related_name='staff_bookings', blank=True, null=True,
+        limit_choices_to={'role__in': ['staff', 'admin']}
+    )
+    # Booked into a slot computed from the schedules (AVAILABILITY_MODE
+    # 'virtual'), whose capacity limits it in place of a window's
+    virtual_slot = models.BooleanField(default=False)
     appointment_date = models.DateField()
     appointment_time = models.TimeField()
+    # Computed from the appointment and Service.duration_minutes on save
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True, null=True)
     is_vip = models.BooleanField(default=False)
     is_home_service = models.BooleanField(default=False)
     use_new_equipment = models.BooleanField(default=False)
     equipment_surcharge = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Paid from the user's credit at checkout; refunded if the booking is cancelled
+    credit_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['appointment_date', 'appointment_time']
-        unique_together = ['appointment_date', 'appointment_time']
+        ordering = ['appointment_date', 'appointment_time', 'id']
+        indexes = [
+            # Keyset pagination (bookings.pagination) for staff and for users
+            models.Index(fields=['starts_at', 'id'], name='bookings_start_id_idx'),
+            models.Index(fields=['user', 'starts_at', 'id'], name='bookings_user_start_idx'),
+            # Overlap checks look up the latest booking starting before a new
+            # booking ends on the same resource; see bookings.reservations.
+            # On PostgreSQL an exclusion constraint backs this up (migrations 0005, 0006).
+            models.Index(
+                fields=['staff', 'starts_at'],
+                condition=~models.Q(status='cancelled'),
+                name='bookings_staff_start_idx',
+            ),
+            models.Index(
+                fields=['starts_at'],
+                condition=(
+                    models.Q(staff__isnull=True, availability__isnull=True, virtual_slot=False)
+                    & ~models.Q(status='cancelled')
+                ),
+                name='bookings_chair_start_idx',
+            ),
+            # Page-number lists in the default ordering, for staff and per user
+            models.Index(fields=['appointment_date', 'appointment_time', 'id'], name='bookings_appt_idx'),
+            models.Index(
+                fields=['user', 'appointment_date', 'appointment_time', 'id'],
+                name='bookings_user_appt_idx',
+            ),
+            # Virtual availability counts live bookings per service over a date range
+            models.Index(
+                fields=['service', 'appointment_date'],
+                condition=~models.Q(status='cancelled'),
+                name='bookings_service_date_idx',
+            ),
+            # The admin's "Pending" filter: bookings awaiting confirmation, in list order
+            models.Index(
+                fields=['appointment_date', 'appointment_time', 'id'],
+                condition=models.Q(status='pending'),
+                name='bookings_pending_appt_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the schedule read model refresh the old day when a booking moves
+        instance._loaded_appointment_date = instance.__dict__.get('appointment_date')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.set_interval()
+        elif {'service', 'appointment_date', 'appointment_time'} & set(update_fields):
+            self.set_interval()
+            kwargs['update_fields'] = {*update_fields, 'starts_at', 'ends_at'}
+        super().save(*args, **kwargs)
+
+    def set_interval(self):
+        appointment_date = self._meta.get_field('appointment_date').to_python(self.appointment_date)
+        appointment_time = self._meta.get_field('appointment_time').to_python(self.appointment_time)
+        self.starts_at = timezone.make_aware(datetime.combine(appointment_date, appointment_time))
+        self.ends_at = self.starts_at + timedelta(minutes=self.service.duration_minutes)
 
     def __str__(self):
         return f"{self.user.full_name} - {self.service.name} on {self.appointment_date}"
@@ -36,4 +119,25 @@ class Booking(models.Model):
 
     @property
     def service_price(self):
-        return self.service.price
\ No newline at end of file
+        return self.service.price
+
+
+class ScheduleDay(models.Model):
+    """
+    Precomputed staff schedule for one day.
+
+    ``bookings`` holds compact rows for the day's active bookings in time
+    order (see bookings.schedule), refreshed whenever a booking on that day
+    changes, or its service or customer is renamed (a background task), so
+    the calendar endpoint reads a week with one indexed query.
+    """
+    date = models.DateField(unique=True)
+    bookings = models.JSONField(default=list)
+    booking_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Schedule for {self.date} ({self.booking_count} bookings)"
@@ -0,0 +1,78 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def get_count_queryset(queryset, view):
+    """
+    The queryset to count for the total: the view's ``get_count_queryset()``
+    when it has one, so a view can page through joined ``.values()`` rows
+    while the total is counted from a plain queryset an index can answer.
+    """
+    get_queryset = getattr(view, 'get_count_queryset', None)
+    return get_queryset() if get_queryset is not None else queryset
+
+
+class CountingPaginator(Paginator):
+    """Django ``Paginator`` that takes its count from ``count_queryset``."""
+
+    def __init__(self, object_list, per_page, count_queryset, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_queryset = count_queryset
+
+    @cached_property
+    def count(self):
+        return self.count_queryset.count()
+
+
+class BookingPageNumberPagination(PageNumberPagination):
+    """DRF's page numbers, counting ``get_count_queryset`` for the total."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_queryset = get_count_queryset(queryset, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountingPaginator(object_list, per_page, self.count_queryset)
+
+
+class BookingCursorPagination(CursorPagination):
+    """
+    Keyset pagination over bookings in appointment order.
+
+    starts_at is the appointment date and time combined, so ordering on
+    (starts_at, id) matches the model's default ordering while giving the
+    cursor a single indexed column to seek on. Every page costs the same as
+    the first. The total count is included unless the client passes
+    ``count=false``.
+    """
+    ordering = ('starts_at', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        # The keyset must match the index, so ?ordering= doesn't apply here
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, 'true').lower() != 'false':
+            self.count = get_count_queryset(queryset, view).count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return response_schema
@@ -0,0 +1,102 @@
+"""
+Flat booking list rows built straight from ``.values()``.
+
+``BookingSerializer`` nests ``UserProfileSerializer`` and resolves every
+field through DRF's per-field machinery, which dominates the cost of large
+list pages. ``booking_rows`` produces the same JSON from one joined
+``.values()`` query: dates, times and decimals are formatted the way the
+serializer and renderer would, and avatar URLs are built once per file.
+"""
+from django.conf import settings
+from accounts.avatars import avatar_url as storage_avatar_url
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'phone', 'gender',
+    'avatar', 'avatar_hash', 'created_at', 'is_superuser', 'is_staff', 'role',
+)
+
+_datetime = serializers.DateTimeField()
+_date = serializers.DateField()
+_time = serializers.TimeField()
+
+
+def datetime_formatter():
+    """
+    ``DateTimeField.to_representation`` with the timezone looked up once.
+
+    DRF resolves the current timezone for every value, which costs more
+    than the formatting itself over a few thousand timestamps.
+    """
+    if api_settings.DATETIME_FORMAT != ISO_8601 or not settings.USE_TZ:
+        return _datetime.to_representation
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return format_datetime
+
+
+def booking_values(queryset):
+    """``queryset`` as dicts with the service and user columns joined in."""
+    return queryset.values(
+        'id', 'staff_id', 'appointment_date', 'appointment_time', 'starts_at', 'ends_at',
+        'status', 'notes', 'created_at', 'updated_at', 'service__name', 'service__price',
+        *(f'user__{field}' for field in USER_FIELDS),
+    )
+
+
+def booking_rows(values, request):
+    """Render rows from ``booking_values`` exactly as ``BookingSerializer`` output."""
+    format_datetime = datetime_formatter()
+    absolute_urls = {}
+
+    def absolute_url(url):
+        if url is None:
+            return None
+        if url not in absolute_urls:
+            absolute_urls[url] = request.build_absolute_uri(url)
+        return absolute_urls[url]
+
+    rows = []
+    for row in values:
+        # No hash gives the original's URL, which is what the avatar field shows
+        avatar = absolute_url(storage_avatar_url(row['user__avatar'], None))
+        small_avatar = absolute_url(storage_avatar_url(row['user__avatar'], row['user__avatar_hash']))
+        price = row['service__price']
+        rows.append({
+            'id': row['id'],
+            'user': {
+                'id': row['user__id'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+                'phone': row['user__phone'],
+                'gender': row['user__gender'],
+                'avatar': avatar,
+                'avatar_url': small_avatar,
+                'role': 'admin' if row['user__is_superuser'] else row['user__role'],
+                'created_at': format_datetime(row['user__created_at']),
+                'is_superuser': row['user__is_superuser'],
+                'is_staff': row['user__is_staff'],
+            },
+            'service_name': row['service__name'],
+            # The JSON renderer writes Decimals as numbers
+            'service_price': float(price) if price is not None else None,
+            'staff': row['staff_id'],
+            'appointment_date': _date.to_representation(row['appointment_date']),
+            'appointment_time': _time.to_representation(row['appointment_time']),
+            'starts_at': format_datetime(row['starts_at']),
+            'ends_at': format_datetime(row['ends_at']),
+            'status': row['status'],
+            'notes': row['notes'],
+            'created_at': format_datetime(row['created_at']),
+            'updated_at': format_datetime(row['updated_at']),
+        })
+    return rows
@@ -0,0 +1,239 @@
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from cart.availability import get_availability_mode, virtual_windows
+from cart.models import CreditLedgerEntry, ServiceAvailability
+from cart.wallet import add_credit, spend_credit
+from services.models import Service
+from .models import Booking
+
+
+class SlotUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This time slot is fully booked.'
+    default_code = 'slot_unavailable'
+
+
+def find_overlap(booking):
+    """
+    Return the id of an active booking on the same resource that overlaps ``booking``.
+
+    Bookings sharing a resource never overlap each other, so sorted by start
+    time only the last one starting before ``booking`` ends can intersect it.
+    That's a single descending index seek rather than a scan of the day.
+    Bookings holding a place in an availability window, or in a slot of
+    virtual availability, without a staff member are limited by that
+    slot's capacity instead.
+    """
+    bookings = Booking.objects.exclude(status='cancelled')
+    if booking.staff_id is not None:
+        bookings = bookings.filter(staff_id=booking.staff_id)
+    elif booking.availability_id is None and not booking.virtual_slot:
+        bookings = bookings.filter(staff__isnull=True, availability__isnull=True)
+    else:
+        return None
+    if booking.pk is not None:
+        bookings = bookings.exclude(pk=booking.pk)
+
+    previous = bookings.filter(starts_at__lt=booking.ends_at).order_by('-starts_at').values(
+        'id', 'ends_at'
+    ).first()
+    if previous is not None and previous['ends_at'] > booking.starts_at:
+        return previous['id']
+    return None
+
+
+def take_place(windows):
+    """
+    Decrement remaining capacity on ``windows`` if there is any left.
+
+    The capacity check and the increment are a single conditional UPDATE, so
+    concurrent bookings only contend on the row of the slot they want.
+    Returns the number of windows updated.
+    """
+    return windows.filter(remaining_slots__gt=0).update(
+        booked_count=F('booked_count') + 1,
+        remaining_slots=F('remaining_slots') - 1,
+        updated_at=timezone.now(),
+    )
+
+
+def release_place(windows):
+    """Give back a place taken by ``take_place``."""
+    return windows.filter(booked_count__gt=0).update(
+        booked_count=F('booked_count') - 1,
+        remaining_slots=Greatest(F('capacity') - F('booked_count') + 1, Value(0)),
+        updated_at=timezone.now(),
+    )
+
+
+def slot_key(booking):
+    field = Booking._meta.get_field
+    return (
+        booking.service_id,
+        booking.is_home_service,
+        field('appointment_date').to_python(booking.appointment_date),
+        field('appointment_time').to_python(booking.appointment_time),
+    )
+
+
+def claim_virtual_slots(bookings, counted=False):
+    """
+    Check ``bookings`` fit slots that virtual availability offers.
+
+    Each booking must start a slot of its service and kind, after the
+    day's exceptions, and the slot must have room for every booking in
+    ``bookings`` that goes into it (already among the slot's bookings when
+    ``counted``). The slots and their counts come from ``virtual_windows``,
+    so a booking is accepted exactly when the list shows room for it. The
+    services' rows are written first, which queues concurrent bookings of
+    a service behind each other. Marks the bookings ``virtual_slot`` and
+    raises SlotUnavailable (409) for a time with no slot or no room.
+    """
+    keys = [slot_key(booking) for booking in bookings]
+    service_ids = {key[0] for key in keys}
+    # A write that changes nothing: it takes the rows' locks (and SQLite's
+    # write lock) before any booking is counted
+    Service.objects.filter(pk__in=service_ids).update(updated_at=F('updated_at'))
+    days = [key[2] for key in keys]
+    windows = {
+        (window.service_id, window.is_home_service, window.date, window.start_time): window
+        for window in virtual_windows(min(days), max(days), service_ids=service_ids, include_full=True)
+    }
+    needed = Counter() if counted else Counter(keys)
+    for booking, key in zip(bookings, keys):
+        window = windows.get(key)
+        if window is None:
+            raise SlotUnavailable('There is no opening at this time.')
+        if window.capacity - window.booked_count < needed[key]:
+            raise SlotUnavailable()
+        booking.virtual_slot = True
+
+
+def reserve_booking(service, appointment_date, appointment_time, is_home_service=False, **fields):
+    """
+    Create a booking, claiming capacity from the matching availability window.
+
+    With virtual availability the slot and its capacity come from the
+    schedules instead (see ``claim_virtual_slots``), and a time they don't
+    offer is refused. The booking must also not overlap another on its
+    chair/staff resource (see ``find_overlap``). A full or overlapping slot
+    raises SlotUnavailable (409) instead of an IntegrityError.
+    """
+    virtual = get_availability_mode() == 'virtual'
+    windows = ServiceAvailability.objects.filter(
+        service=service,
+        date=appointment_date,
+        start_time=appointment_time,
+        is_home_service=is_home_service,
+    )
+    try:
+        with transaction.atomic():
+            window_id = None
+            if not virtual:
+                # Write first: the UPDATE takes the row lock before anything is read.
+                claimed = take_place(windows)
+                window_id = windows.values_list('id', flat=True).first()
+                if window_id is not None and not claimed:
+                    raise SlotUnavailable()
+            booking = Booking(
+                service=service,
+                appointment_date=appointment_date,
+                appointment_time=appointment_time,
+                is_home_service=is_home_service,
+                availability_id=window_id,
+                **fields
+            )
+            booking.set_interval()
+            if virtual:
+                claim_virtual_slots([booking])
+            if find_overlap(booking) is not None:
+                raise SlotUnavailable('This time overlaps another booking.')
+            booking.save(force_insert=True)
+            return booking
+    except IntegrityError:
+        raise SlotUnavailable()
+
+
+def refund_credit(booking):
+    """
+    Refund the credit ``booking`` was paid with, once per charge.
+
+    The reference names the charge refunded: the checkout, then each
+    reinstatement (a spend referenced ``booking:<pk>``). A second refund of
+    the same charge is a no-op (see ``add_credit``).
+    """
+    reference = f'refund:booking:{booking.pk}'
+    entry = add_credit(booking.user_id, booking.credit_amount, reference=reference)
+    if entry is None:
+        # Already refunded once; only a reinstatement's charge is left to refund
+        charges = CreditLedgerEntry.objects.filter(
+            kind=CreditLedgerEntry.SPEND, reference=f'booking:{booking.pk}'
+        ).count()
+        if charges:
+            entry = add_credit(booking.user_id, booking.credit_amount, reference=f'{reference}:{charges}')
+    return entry
+
+
+def lock_booking(booking):
+    """
+    Lock ``booking``'s row and return its status as stored, or None if it
+    has been deleted. Cheapest before ``booking.status`` is changed.
+
+    Status changes and deletes read the status they move from here, inside
+    their transaction, so two concurrent cancellations can't both release
+    the booking's place or refund its credit.
+    """
+    # A write that changes nothing, as in claim_virtual_slots. Usually the
+    # status is still the one loaded, and one conditional write confirms it.
+    if Booking.objects.filter(pk=booking.pk, status=booking.status).update(updated_at=F('updated_at')):
+        return booking.status
+    if not Booking.objects.filter(pk=booking.pk).update(updated_at=F('updated_at')):
+        return None
+    return Booking.objects.filter(pk=booking.pk).values_list('status', flat=True).get()
+
+
+def update_booking_status(booking, previous_status):
+    """
+    Keep window capacity, overlap rules and credit in step with a booking
+    moving in or out of 'cancelled'.
+
+    Credit paid at checkout is refunded on cancellation and charged again
+    if the booking is reinstated (InsufficientCredit if it no longer can be).
+    """
+    if (booking.status == 'cancelled') == (previous_status == 'cancelled'):
+        return
+    windows = ServiceAvailability.objects.filter(pk=booking.availability_id)
+    if booking.status == 'cancelled':
+        if booking.availability_id is not None:
+            release_place(windows)
+        if booking.credit_amount:
+            refund_credit(booking)
+        return
+    if booking.availability_id is not None and not take_place(windows):
+        raise SlotUnavailable()
+    if booking.virtual_slot:
+        # Saved as active already, so it's among the slot's bookings
+        claim_virtual_slots([booking], counted=True)
+    if find_overlap(booking) is not None:
+        raise SlotUnavailable('This time overlaps another booking.')
+    if booking.credit_amount:
+        spend_credit(booking.user_id, booking.credit_amount, reference=f'booking:{booking.pk}')
+
+
+def delete_booking(booking):
+    """Delete a booking and return any capacity and credit it still holds."""
+    with transaction.atomic():
+        current_status = lock_booking(booking)
+        if current_status is None:
+            return
+        if current_status != 'cancelled':
+            if booking.availability_id is not None:
+                release_place(ServiceAvailability.objects.filter(pk=booking.availability_id))
+            if booking.credit_amount:
+                refund_credit(booking)
+        booking.delete()
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import Booking, ScheduleDay
+
+
+def project_booking(row):
+    return {
+        'id': row['id'],
+        'time': row['appointment_time'].isoformat(),
+        'end_time': timezone.localtime(row['ends_at']).time().isoformat(),
+        'service': row['service__name'],
+        'customer': f"{row['user__first_name']} {row['user__last_name']}".strip() or row['user__username'],
+        'phone': row['user__phone'],
+        'staff_id': row['staff_id'],
+        'status': row['status'],
+        'is_vip': row['is_vip'],
+        'is_home_service': row['is_home_service'],
+        'notes': row['notes'],
+    }
+
+
+def rebuild_days(dates):
+    """Recompute the schedule rows for ``dates`` from the bookings table."""
+    for day in sorted(set(dates)):
+        with transaction.atomic():
+            # Insert first so concurrent rebuilds of one day queue on its row
+            ScheduleDay.objects.bulk_create([ScheduleDay(date=day)], ignore_conflicts=True)
+            schedule = ScheduleDay.objects.select_for_update().get(date=day)
+            rows = (
+                Booking.objects.filter(appointment_date=day)
+                .exclude(status='cancelled')
+                .order_by('appointment_time', 'id')
+                .values(
+                    'id', 'appointment_time', 'ends_at', 'staff_id', 'status',
+                    'is_vip', 'is_home_service', 'notes', 'service__name',
+                    'user__first_name', 'user__last_name', 'user__username', 'user__phone',
+                )
+            )
+            schedule.bookings = [project_booking(row) for row in rows]
+            schedule.booking_count = len(schedule.bookings)
+            schedule.save(update_fields=['bookings', 'booking_count', 'updated_at'])
+
+
+def refresh_days(dates):
+    """
+    Rebuild the schedule for ``dates`` once the current transaction commits.
+
+    Waiting for the commit means the rebuild always sees the booking that
+    triggered it, and the row lock in rebuild_days orders rebuilds of a day.
+    """
+    dates = {day for day in dates if day is not None}
+    if dates:
+        transaction.on_commit(lambda: rebuild_days(dates))
+
+
+def get_schedule(date_from, date_to):
+    """Return ``[{'date', 'bookings'}]`` for every day in the range, empty days included."""
+    stored = dict(
+        ScheduleDay.objects.filter(date__range=(date_from, date_to)).values_list('date', 'bookings')
+    )
+    days = []
+    day = date_from
+    while day <= date_to:
+        days.append({'date': day, 'bookings': stored.get(day, [])})
+        day += timedelta(days=1)
+    return days
@@ -1,28 +1,32 @@
 from rest_framework import serializers
 from .models import Booking
+from .reservations import reserve_booking
 from services.models import Service
+from accounts.models import User
 from accounts.serializers import UserProfileSerializer
 
 class BookingCreateSerializer(serializers.ModelSerializer):
     service_id = serializers.IntegerField(write_only=True)
+    staff = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(role__in=['staff', 'admin']),
+        required=False, allow_null=True
+    )
 
     class Meta:
         model = Booking
-        fields = ['service_id', 'appointment_date', 'appointment_time', 'notes']
+        fields = ['service_id', 'staff', 'appointment_date', 'appointment_time', 'is_home_service', 'notes']
 
     def validate_service_id(self, value):
+        # Hand the validated Service to create() so it isn't fetched twice
         try:
-            service = Service.objects.get(id=value, is_active=True)
-            return value
+            return Service.objects.get(id=value, is_active=True)
         except Service.DoesNotExist:
             raise serializers.ValidationError("Invalid service selected")
 
     def create(self, validated_data):
-        service_id = validated_data.pop('service_id')
-        service = Service.objects.get(id=service_id)
-        validated_data['service'] = service
+        validated_data['service'] = validated_data.pop('service_id')
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        return reserve_booking(**validated_data)
 
 class BookingSerializer(serializers.ModelSerializer):
     service_name = serializers.ReadOnlyField()
@@ -32,11 +36,11 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = [
-            'id', 'user', 'service_name', 'service_price', 
-            'appointment_date', 'appointment_time', 'status', 
+            'id', 'user', 'service_name', 'service_price', 'staff',
+            'appointment_date', 'appointment_time', 'starts_at', 'ends_at', 'status', 
             'notes', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'user', 'service_name', 'service_price', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'service_name', 'service_price', 'staff', 'starts_at', 'ends_at', 'created_at', 'updated_at']
 
 class BookingUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from services.models import Service
+from .models import Booking
+from .schedule import refresh_days
+from .tasks import rebuild_schedule_days, send_booking_confirmation
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_schedule(sender, instance, **kwargs):
+    """Keep the per-day schedule read model in step with booking changes."""
+    to_date = Booking._meta.get_field('appointment_date').to_python
+    refresh_days({
+        to_date(instance.appointment_date),
+        getattr(instance, '_loaded_appointment_date', None),
+    })
+    instance._loaded_appointment_date = to_date(instance.appointment_date)
+
+
+@receiver(post_save, sender=Service)
+def refresh_service_schedule(sender, instance, **kwargs):
+    """Schedule rows copy the service name; rebuild the days that show it."""
+    loaded = getattr(instance, '_loaded_name', None)
+    instance._loaded_name = instance.name
+    if loaded is not None and loaded != instance.name:
+        rebuild_schedule_days.enqueue(service_id=instance.pk)
+
+
+@receiver(post_save, sender=User)
+def refresh_customer_schedule(sender, instance, **kwargs):
+    """Schedule rows copy the customer's name and phone; rebuild the days that show them."""
+    loaded = getattr(instance, '_loaded_contact', None)
+    instance._loaded_contact = instance.schedule_contact()
+    if loaded is not None and loaded != instance._loaded_contact:
+        rebuild_schedule_days.enqueue(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Booking)
+def queue_booking_confirmation(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        send_booking_confirmation.enqueue(
+            idempotency_key=f'booking-confirmation:{instance.pk}', booking_ids=[instance.pk]
+        )
@@ -0,0 +1,39 @@
+from django.core.mail import send_mail
+from tasks.queue import task
+from .models import Booking
+from .schedule import rebuild_days
+
+
+@task
+def send_booking_confirmation(booking_ids):
+    """Email the customer one confirmation listing ``booking_ids``."""
+    bookings = list(
+        Booking.objects.filter(pk__in=booking_ids)
+        .exclude(status='cancelled')
+        .select_related('user', 'service')
+        .order_by('starts_at', 'id')
+    )
+    if not bookings or not bookings[0].user.email:
+        return
+    user = bookings[0].user
+    lines = '\n'.join(
+        f'- {booking.service.name}, {booking.appointment_date:%A %d %B %Y} at {booking.appointment_time:%H:%M}'
+        for booking in bookings
+    )
+    send_mail(
+        'Your booking is confirmed' if len(bookings) == 1 else 'Your bookings are confirmed',
+        f'Hi {user.first_name or user.username},\n\nSee you at the Barber Shop:\n{lines}\n',
+        None,
+        [user.email],
+    )
+
+
+@task
+def rebuild_schedule_days(service_id=None, user_id=None):
+    """Rebuild the schedule days with active bookings of a service or a customer that changed."""
+    bookings = Booking.objects.exclude(status='cancelled')
+    if service_id is not None:
+        bookings = bookings.filter(service_id=service_id)
+    if user_id is not None:
+        bookings = bookings.filter(user_id=user_id)
+    rebuild_days(bookings.order_by('appointment_date').values_list('appointment_date', flat=True).distinct())
@@ -0,0 +1,670 @@
+import csv
+import json
+import threading
+import unittest
+from datetime import date, time, timedelta
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from decimal import Decimal
+from cart.models import ServiceAvailability
+from services.models import Service
+from .models import Booking
+from .reservations import (
+    SlotUnavailable, delete_booking, find_overlap, lock_booking, reserve_booking, update_booking_status,
+)
+
+User = get_user_model()
+
+
+class BookingReservationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+        self.window = ServiceAvailability.objects.create(
+            service=self.service,
+            date='2024-01-15',
+            start_time='10:00',
+            end_time='11:00',
+            capacity=2
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def book(self, **data):
+        payload = {
+            'service_id': self.service.id,
+            'appointment_date': '2024-01-15',
+            'appointment_time': '10:00',
+        }
+        payload.update(data)
+        return self.client.post('/api/bookings/create/', payload)
+
+    def test_booking_claims_window_capacity(self):
+        """Test a booking takes a place in its availability window"""
+        response = self.book()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, 1)
+        self.assertEqual(self.window.remaining_slots, 1)
+        self.assertEqual(Booking.objects.get().availability, self.window)
+
+    def test_full_window_returns_409(self):
+        """Test booking a full window is a 409, not an IntegrityError"""
+        self.assertEqual(self.book().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book().status_code, status.HTTP_201_CREATED)
+
+        response = self.book()
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, 2)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_slot_without_window_takes_one_booking(self):
+        """Test slots without a window still reject a second booking with a 409"""
+        self.assertEqual(self.book(appointment_time='14:00').status_code, status.HTTP_201_CREATED)
+
+        response = self.book(appointment_time='14:00')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_cancel_releases_capacity(self):
+        """Test cancelling and deleting bookings give their place back"""
+        self.book()
+        self.book()
+        first, second = Booking.objects.all()
+
+        response = self.client.patch(f'/api/bookings/{first.id}/', {'status': 'cancelled'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.remaining_slots, 1)
+
+        response = self.client.delete(f'/api/bookings/{second.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, 0)
+        self.assertEqual(self.window.remaining_slots, 2)
+
+    def test_admin_changes_release_capacity(self):
+        """Test cancelling and deleting bookings in the admin give their place back"""
+        self.book()
+        self.book()
+        first, second = Booking.objects.all()
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_login(admin)
+
+        response = self.client.post('/admin/bookings/booking/', {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-MIN_NUM_FORMS': '0',
+            'form-MAX_NUM_FORMS': '1000',
+            'form-0-id': first.id,
+            'form-0-status': 'cancelled',
+            '_save': 'Save',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.remaining_slots, 1)
+
+        # Reinstating it once the window has filled again is refused
+        self.book()
+        self.client.post('/admin/bookings/booking/', {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-MIN_NUM_FORMS': '0',
+            'form-MAX_NUM_FORMS': '1000',
+            'form-0-id': first.id,
+            'form-0-status': 'confirmed',
+            '_save': 'Save',
+        })
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'cancelled')
+
+        response = self.client.post('/admin/bookings/booking/', {
+            'action': 'delete_selected',
+            '_selected_action': list(Booking.objects.values_list('id', flat=True)),
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Booking.objects.exists())
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, 0)
+        self.assertEqual(self.window.remaining_slots, 2)
+
+
+class BookingOverlapTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.barbers = [
+            User.objects.create_user(username=f'barber{i}', email=f'barber{i}@example.com',
+                                     password='testpass123', role='staff')
+            for i in range(2)
+        ]
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def book(self, appointment_time, **data):
+        payload = {
+            'service_id': self.service.id,
+            'appointment_date': '2024-01-15',
+            'appointment_time': appointment_time,
+        }
+        payload.update(data)
+        return self.client.post('/api/bookings/create/', payload)
+
+    def test_booking_stores_end_time(self):
+        """Test the end time is derived from the service duration"""
+        self.book('10:00')
+        booking = Booking.objects.get()
+        self.assertEqual(booking.ends_at - booking.starts_at, timedelta(minutes=60))
+
+    def test_overlapping_booking_rejected(self):
+        """Test a booking inside another's duration is a 409, back-to-back is fine"""
+        self.assertEqual(self.book('10:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('10:30').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.book('09:30').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.book('11:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('09:00').status_code, status.HTTP_201_CREATED)
+
+    def test_overlap_is_per_staff_member(self):
+        """Test different staff members can take bookings at the same time"""
+        first, second = self.barbers
+        self.assertEqual(self.book('10:00', staff=first.id).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('10:00', staff=second.id).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('10:15', staff=first.id).status_code, status.HTTP_409_CONFLICT)
+
+    def test_cancelled_booking_frees_time(self):
+        """Test cancelled bookings don't block the time"""
+        self.book('10:00')
+        Booking.objects.update(status='cancelled')
+        self.assertEqual(self.book('10:30').status_code, status.HTTP_201_CREATED)
+
+    def test_overlap_check_is_one_query_on_busy_day(self):
+        """Test the overlap check is a single lookup regardless of bookings that day"""
+        for hour in range(8, 20):
+            reserve_booking(
+                service=self.service,
+                appointment_date=date(2024, 1, 15),
+                appointment_time=time(hour, 0),
+                user=self.user,
+            )
+        candidate = Booking(
+            service=self.service,
+            user=self.user,
+            appointment_date=date(2024, 1, 15),
+            appointment_time=time(13, 30),
+        )
+        candidate.set_interval()
+
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(find_overlap(candidate))
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'The exclusion constraint is PostgreSQL only')
+    def test_database_rejects_overlap_past_the_check(self):
+        """Test the migrated exclusion constraint catches an overlap find_overlap never saw"""
+        self.book('10:00')
+        overlapping = Booking(
+            service=self.service,
+            user=self.user,
+            appointment_date=date(2024, 1, 15),
+            appointment_time=time(10, 30),
+        )
+        overlapping.set_interval()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.bulk_create([overlapping])
+
+
+class BookingContentionTestCase(TransactionTestCase):
+    threads = 12
+    capacity = 5
+
+    def setUp(self):
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+        self.window = ServiceAvailability.objects.create(
+            service=self.service,
+            date=date(2024, 1, 15),
+            start_time=time(10, 0),
+            end_time=time(11, 0),
+            capacity=self.capacity
+        )
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(self.threads)
+        ]
+
+    def test_concurrent_bookings_never_oversell(self):
+        """Stress test: parallel bookings for one slot fill it exactly to capacity"""
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def attempt(user):
+            try:
+                barrier.wait()
+                reserve_booking(
+                    service=self.service,
+                    appointment_date=self.window.date,
+                    appointment_time=self.window.start_time,
+                    user=user,
+                )
+                outcomes.append('booked')
+            except SlotUnavailable:
+                outcomes.append('full')
+            except Exception as exc:
+                outcomes.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=attempt, args=(user,)) for user in self.users]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(map(str, outcomes)), ['booked'] * self.capacity + ['full'] * (self.threads - self.capacity))
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, self.capacity)
+        self.assertEqual(self.window.remaining_slots, 0)
+        self.assertEqual(Booking.objects.filter(availability=self.window).count(), self.capacity)
+
+    def test_concurrent_cancel_and_delete_release_once(self):
+        """Test that a booking cancelled and deleted at once gives back one place"""
+        for user in self.users[:2]:
+            reserve_booking(
+                service=self.service,
+                appointment_date=self.window.date,
+                appointment_time=self.window.start_time,
+                user=user,
+            )
+        booking = Booking.objects.filter(user=self.users[0]).get()
+        barrier = threading.Barrier(3)
+        outcomes = []
+
+        def cancel():
+            stale = Booking.objects.get(pk=booking.pk)
+            barrier.wait()
+            with transaction.atomic():
+                previous_status = lock_booking(stale)
+                if previous_status is None:
+                    return
+                stale.status = 'cancelled'
+                stale.save()
+                update_booking_status(stale, previous_status)
+
+        def delete():
+            stale = Booking.objects.get(pk=booking.pk)
+            barrier.wait()
+            delete_booking(stale)
+
+        def attempt(action):
+            try:
+                action()
+                outcomes.append('done')
+            except Exception as exc:
+                outcomes.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=attempt, args=(action,)) for action in (cancel, cancel, delete)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(outcomes, ['done'] * 3)
+        self.assertFalse(Booking.objects.filter(pk=booking.pk).exists())
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, 1)
+        self.assertEqual(self.window.remaining_slots, self.capacity - 1)
+
+
+class BookingCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='staff',
+            email='staff@example.com',
+            password='testpass123',
+            role='staff'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=30,
+            is_active=True
+        )
+        for day in range(1, 11):
+            for hour in (9, 11, 14):
+                reserve_booking(
+                    service=self.service,
+                    appointment_date=date(2024, 1, day),
+                    appointment_time=time(hour, 0),
+                    user=self.staff,
+                )
+        self.client.force_authenticate(user=self.staff)
+
+    def test_cursor_pages_cover_every_booking_in_order(self):
+        """Test following cursor links visits each booking once, in appointment order"""
+        url = '/api/bookings/?pagination=cursor&page_size=7'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 30)
+            seen.extend(booking['id'] for booking in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, list(Booking.objects.values_list('id', flat=True)))
+
+    def test_cursor_count_opt_out(self):
+        """Test count=false skips the COUNT query and drops count from the response"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/bookings/?pagination=cursor&count=false')
+
+        self.assertNotIn('count', response.data)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_deep_page_costs_the_same(self):
+        """Test a deep cursor page runs the same queries as the first page"""
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get('/api/bookings/?pagination=cursor&page_size=5&count=false')
+        for _ in range(4):
+            response = self.client.get(response.data['next'])
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(response.data['next'])
+
+        self.assertEqual(len(deep.captured_queries), len(first.captured_queries))
+        self.assertFalse(any('OFFSET' in query['sql'] for query in deep.captured_queries))
+
+
+class FlatBookingListTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='staff',
+            email='staff@example.com',
+            password='testpass123',
+            role='staff'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123',
+            first_name='Casey',
+            avatar='avatars/casey.png'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('49.50'),
+            duration_minutes=30,
+            is_active=True
+        )
+        for day in range(1, 6):
+            reserve_booking(
+                service=self.service,
+                appointment_date=date(2024, 1, day),
+                appointment_time=time(10, 30),
+                user=self.customer if day % 2 else self.staff,
+                staff=self.staff,
+                notes=f'Visit {day}',
+            )
+        self.client.force_authenticate(user=self.staff)
+
+    def test_flat_rows_match_serializer(self):
+        """Test the flat projection returns exactly what BookingSerializer renders"""
+        for query in ('', '&pagination=cursor&page_size=2'):
+            expected = self.client.get(f'/api/bookings/?{query}')
+            response = self.client.get(f'/api/bookings/?projection=flat{query}')
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['results'], expected.json()['results'])
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_flat_cursor_pages_cover_every_booking(self):
+        """Test cursor links from the flat projection keep the flat path and visit each booking"""
+        url = '/api/bookings/?projection=flat&pagination=cursor&page_size=2'
+        seen = []
+        while url:
+            self.assertIn('projection=flat', url)
+            response = self.client.get(url)
+            seen.extend(booking['id'] for booking in response.json()['results'])
+            url = response.json()['next']
+
+        self.assertEqual(seen, list(Booking.objects.values_list('id', flat=True)))
+
+    def test_flat_list_is_scoped_to_the_customer(self):
+        """Test a customer's flat list only holds their own bookings"""
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get('/api/bookings/?projection=flat')
+
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual({row['user']['id'] for row in response.json()['results']}, {self.customer.id})
+
+    def test_flat_list_is_one_query_per_page(self):
+        """Test the flat projection reads a page in one query whatever its size"""
+        with self.assertNumQueries(1):
+            self.client.get('/api/bookings/?projection=flat&pagination=cursor&count=false')
+
+    def test_flat_count_skips_joins(self):
+        """Test both paginators count the bookings without the projection's joins"""
+        for query in ('', '&pagination=cursor'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/api/bookings/?projection=flat{query}')
+            self.assertEqual(response.json()['count'], 5)
+            counts = [q['sql'] for q in queries.captured_queries if 'COUNT(' in q['sql']]
+            self.assertEqual(len(counts), 1)
+            self.assertNotIn('JOIN', counts[0])
+
+
+class ScheduleTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='staff',
+            email='staff@example.com',
+            password='testpass123',
+            role='staff'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='testpass123',
+            first_name='Ada',
+            last_name='Lovelace'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=45,
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.staff)
+
+    def book(self, day, hour):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reserve_booking(
+                service=self.service,
+                appointment_date=date(2024, 1, day),
+                appointment_time=time(hour, 0),
+                user=self.customer,
+            )
+
+    def test_schedule_projects_bookings_per_day(self):
+        """Test the schedule returns compact rows per day, empty days included"""
+        self.book(15, 14)
+        self.book(15, 10)
+        self.book(17, 9)
+
+        response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-17')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([len(day['bookings']) for day in response.data], [2, 0, 1])
+        first = response.data[0]['bookings'][0]
+        self.assertEqual(first['time'], '10:00:00')
+        self.assertEqual(first['end_time'], '10:45:00')
+        self.assertEqual(first['customer'], 'Ada Lovelace')
+        self.assertEqual(first['service'], 'Test Service')
+
+    def test_schedule_updates_on_cancel_and_delete(self):
+        """Test cancelling or deleting a booking drops it from its day"""
+        first = self.book(15, 10)
+        second = self.book(15, 12)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.status = 'cancelled'
+            first.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+
+        response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-15')
+        self.assertEqual(response.data[0]['bookings'], [])
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_schedule_times_are_local(self):
+        """Test a booking's end time is projected in the shop's time zone, like its start"""
+        self.book(15, 10)
+
+        response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-15')
+        row = response.data[0]['bookings'][0]
+        self.assertEqual((row['time'], row['end_time']), ('10:00:00', '10:45:00'))
+
+    @override_settings(TASKS_EAGER=True)
+    def test_schedule_follows_service_and_customer_changes(self):
+        """Test renaming a service or a customer rebuilds the days that show them"""
+        self.book(15, 10)
+        service = Service.objects.get(pk=self.service.pk)
+        customer = User.objects.get(pk=self.customer.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            service.name = 'Skin Fade'
+            service.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.first_name = 'Grace'
+            customer.last_name = 'Hopper'
+            customer.save()
+
+        response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-15')
+        row = response.data[0]['bookings'][0]
+        self.assertEqual((row['service'], row['customer']), ('Skin Fade', 'Grace Hopper'))
+
+    def test_week_view_is_one_query(self):
+        """Test a week of schedule is read with a single query"""
+        for day in range(15, 22):
+            self.book(day, 10)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-21')
+        self.assertEqual(len(response.data), 7)
+
+    def test_schedule_is_staff_only(self):
+        """Test customers can't read the schedule"""
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get('/api/bookings/schedule/?date_from=2024-01-15&date_to=2024-01-21')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookingExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.customer = User.objects.create_user(
+            username='customer', email='customer@example.com', password='testpass123'
+        )
+        self.service = Service.objects.create(
+            name='=Cut', description='Test description', price=Decimal('49.50'), duration_minutes=30
+        )
+        for day, booking_status in zip(range(1, 5), ['pending', 'confirmed', 'cancelled', 'confirmed']):
+            Booking.objects.create(
+                user=self.customer, service=self.service, appointment_date=date(2024, 1, day),
+                appointment_time=time(10, 30), status=booking_status,
+            )
+        self.client.force_authenticate(user=self.admin)
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/bookings/export/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export(self):
+        """Test the default export is a CSV attachment with one row per booking in appointment order"""
+        response = self.client.get('/api/bookings/export/')
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings.csv"')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual([row['appointment_date'] for row in rows], ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'])
+        self.assertEqual(rows[0]['user_email'], 'customer@example.com')
+        self.assertEqual(rows[0]['appointment_time'], '10:30:00')
+        self.assertEqual(rows[0]['service_price'], '49.50')
+        self.assertEqual(rows[0]['staff_id'], '')
+        # Cells a spreadsheet would run as a formula are quoted
+        self.assertEqual(rows[0]['service'], "'=Cut")
+
+    def test_ndjson_export(self):
+        """Test ?format=ndjson streams one JSON object per booking"""
+        records = [json.loads(line) for line in self.export('?format=ndjson').splitlines()]
+
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]['service'], '=Cut')
+        self.assertEqual(records[0]['service_price'], 49.5)
+        self.assertTrue(records[0]['created_at'].endswith('Z'))
+
+    def test_filters_by_date_range_and_status(self):
+        """Test date_from/date_to bound the appointment date and status takes a list"""
+        records = [
+            json.loads(line)
+            for line in self.export('?format=ndjson&date_from=2024-01-02&date_to=2024-01-04&status=pending,confirmed').splitlines()
+        ]
+
+        self.assertEqual([record['appointment_date'] for record in records], ['2024-01-02', '2024-01-04'])
+
+    def test_invalid_filters_are_json_errors(self):
+        """Test bad filters are rejected as JSON before anything streams"""
+        for query in ('?status=lost', '?date_from=yesterday', '?date_from=2024-01-04&date_to=2024-01-01'):
+            response = self.client.get(f'/api/bookings/export/{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_export_is_admin_only(self):
+        """Test staff and customers can't export"""
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='testpass123', role='staff')
+        for user in (staff, self.customer):
+            self.client.force_authenticate(user=user)
+            response = self.client.get('/api/bookings/export/')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(response.json(), {'error': 'Only admins can export data'})
+
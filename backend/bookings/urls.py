@@ -4,5 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.BookingListView.as_view(), name='booking-list'),
     path('create/', views.BookingCreateView.as_view(), name='booking-create'),
+    path('export/', views.BookingExportView.as_view(), name='booking-export'),
+    path('schedule/', views.ScheduleView.as_view(), name='booking-schedule'),
     path('<int:pk>/', views.BookingDetailView.as_view(), name='booking-detail'),
 ]
\ No newline at end of file
@@ -1,32 +1,139 @@
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from django.utils.dateparse import parse_date
 from django.db.models import Q
+from django.db import IntegrityError, transaction
+from barber_shop.exports import ExportView
 from .models import Booking
+from .pagination import BookingCursorPagination, BookingPageNumberPagination
+from .projections import booking_rows, booking_values
+from .reservations import SlotUnavailable, delete_booking, lock_booking, update_booking_status
+from .schedule import get_schedule
 from .serializers import BookingCreateSerializer, BookingSerializer, BookingUpdateSerializer
 
 class BookingCreateView(generics.CreateAPIView):
     serializer_class = BookingCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 9
 
 class BookingListView(generics.ListAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = BookingPageNumberPagination
+    query_budget = 2
+
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or following a cursor link) switches from page
+        # numbers to keyset pagination, which doesn't slow down on deep pages.
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = BookingCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    @property
+    def flat(self):
+        # ?projection=flat serves the same rows from .values() instead of
+        # BookingSerializer, which is much cheaper on large pages.
+        return self.request.query_params.get('projection') == 'flat'
 
     def get_queryset(self):
         user = self.request.user
         if user.role in ['staff', 'admin']:
             return Booking.objects.all().select_related('user', 'service')
-        return Booking.objects.filter(user=user).select_related('service')
+        return Booking.objects.filter(user=user).select_related('user', 'service')
+
+    def get_count_queryset(self):
+        # Django keeps the flat projection's service and user joins in
+        # COUNT(*), which then has to read every booking row; the joins never
+        # change the count, and without them it can come from an index.
+        return self.filter_queryset(self.get_queryset()).select_related(None)
+
+    def list(self, request, *args, **kwargs):
+        if not self.flat:
+            return super().list(request, *args, **kwargs)
+        values = booking_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(booking_rows(page, request))
+        return Response(booking_rows(values, request))
+
+class ScheduleView(generics.GenericAPIView):
+    """Compact per-day schedule for staff, read from the ScheduleDay read model."""
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 1
+    max_days = 62
+
+    def get_date_param(self, name):
+        value = self.request.query_params.get(name)
+        try:
+            parsed = parse_date(value) if value else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Enter a valid date (YYYY-MM-DD).'})
+        return parsed
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role not in ['staff', 'admin'] and not request.user.is_superuser:
+            return Response(
+                {'error': 'Only staff can view the schedule'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        date_from = self.get_date_param('date_from')
+        date_to = self.get_date_param('date_to')
+        if date_to < date_from or (date_to - date_from).days >= self.max_days:
+            raise ValidationError({'date_to': f'Choose a range of 1 to {self.max_days} days.'})
+
+        days = get_schedule(date_from, date_to)
+        staff_id = request.query_params.get('staff_id')
+        if staff_id:
+            for day in days:
+                day['bookings'] = [row for row in day['bookings'] if str(row['staff_id']) == staff_id]
+        return Response(days)
+
+class BookingExportView(ExportView):
+    """Every booking in appointment order, as CSV or NDJSON, for admins."""
+    queryset = Booking.objects.order_by('appointment_date', 'appointment_time', 'id')
+    columns = (
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('user_email', 'user__email'),
+        ('service', 'service__name'),
+        ('service_price', 'service__price'),
+        ('staff_id', 'staff_id'),
+        ('appointment_date', 'appointment_date'),
+        ('appointment_time', 'appointment_time'),
+        ('status', 'status'),
+        ('equipment_surcharge', 'equipment_surcharge'),
+        ('credit_amount', 'credit_amount'),
+        ('created_at', 'created_at'),
+    )
+    date_field = 'appointment_date'
+    status_field = 'status'
+    filename = 'bookings'
 
 class BookingDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 10
 
     def get_queryset(self):
         user = self.request.user
         if user.role in ['staff', 'admin']:
             return Booking.objects.all().select_related('user', 'service')
-        return Booking.objects.filter(user=user).select_related('service')
+        return Booking.objects.filter(user=user).select_related('user', 'service')
+
+    def get_object(self):
+        # update() checks ownership before UpdateModelMixin loads it again
+        if not hasattr(self, '_booking'):
+            self._booking = super().get_object()
+        return self._booking
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -59,4 +166,18 @@ class BookingDetailView(generics.RetrieveUpdateDestroyAPIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        return super().update(request, *args, **kwargs)
\ No newline at end of file
+        return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic():
+                previous_status = lock_booking(serializer.instance)
+                if previous_status is None:
+                    raise NotFound()
+                booking = serializer.save()
+                update_booking_status(booking, previous_status)
+        except IntegrityError:
+            raise SlotUnavailable()
+
+    def perform_destroy(self, instance):
+        delete_booking(instance)
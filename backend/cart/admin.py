@@ -1,5 +1,12 @@
-from django.contrib import admin
-from .models import Cart, CartItem, CreditTopUp, ServiceAvailability, Equipment
+from datetime import timedelta
+from django.contrib import admin, messages
+from django.utils import timezone
+from .availability import generate_windows, get_horizon_days
+from .models import (
+    AvailabilityException, AvailabilitySchedule, Cart, CartItem, CreditBalance, CreditLedgerEntry, CreditTopUp,
+    PaymentEvent, ServiceAvailability, Equipment,
+)
+from .wallet import complete_topup
 
 
 @admin.register(Cart)
@@ -7,27 +14,106 @@ class CartAdmin(admin.ModelAdmin):
     list_display = ['user', 'items_count', 'total_amount', 'created_at']
     readonly_fields = ['total_amount', 'items_count']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').with_totals()
+
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'service', 'quantity', 'use_new_equipment', 'total_price']
     list_filter = ['use_new_equipment', 'created_at']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('cart__user').with_totals()
+
 
 @admin.register(CreditTopUp)
 class CreditTopUpAdmin(admin.ModelAdmin):
     list_display = ['user', 'amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
-    readonly_fields = ['payment_intent_id']
+    # Completing credits the top-up, so status only changes through the action
+    readonly_fields = ['status', 'payment_intent_id']
+    search_fields = ['payment_intent_id', 'user__email']
+    actions = ['complete_topups']
+
+    @admin.action(description='Complete the selected pending top-ups and credit them')
+    def complete_topups(self, request, queryset):
+        completed = sum(complete_topup(topup) for topup in queryset.filter(status='pending'))
+        self.message_user(request, f'Credited {completed} top-ups.', messages.SUCCESS)
+
+
+class WalletAdmin(admin.ModelAdmin):
+    """Read-only: credit only changes through cart.wallet, which writes both tables together."""
+    list_select_related = ['user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CreditBalance)
+class CreditBalanceAdmin(WalletAdmin):
+    list_display = ['user', 'balance', 'updated_at']
+    search_fields = ['user__email']
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'type', 'payment_intent_id', 'amount', 'received_at', 'processed_at']
+    list_filter = ['type', 'received_at']
+    search_fields = ['event_id', 'payment_intent_id']
+    readonly_fields = ['event_id', 'type', 'payment_intent_id', 'amount', 'payload', 'received_at', 'processed_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CreditLedgerEntry)
+class CreditLedgerEntryAdmin(WalletAdmin):
+    list_display = ['user', 'kind', 'amount', 'reference', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['user__email', 'reference']
 
 
 @admin.register(ServiceAvailability)
 class ServiceAvailabilityAdmin(admin.ModelAdmin):
-    list_display = ['service', 'date', 'start_time', 'end_time', 'capacity', 'booked_count', 'is_home_service']
+    list_display = ['service', 'date', 'start_time', 'end_time', 'capacity', 'booked_count', 'remaining_slots', 'is_home_service']
     list_filter = ['is_home_service', 'date', 'service']
     ordering = ['date', 'start_time']
 
 
+@admin.register(AvailabilitySchedule)
+class AvailabilityScheduleAdmin(admin.ModelAdmin):
+    list_display = ['service', 'weekday', 'opens_at', 'closes_at', 'capacity', 'is_home_service', 'is_active']
+    list_filter = ['weekday', 'is_home_service', 'is_active', 'service']
+    list_select_related = ['service']
+    actions = ['generate_availability']
+
+    @admin.action(description='Generate availability windows for the selected schedules')
+    def generate_availability(self, request, queryset):
+        date_from = timezone.localdate()
+        date_to = date_from + timedelta(days=get_horizon_days() - 1)
+        created = generate_windows(date_from, date_to, queryset.filter(is_active=True))
+        self.message_user(
+            request,
+            f'Created {created} availability windows from {date_from} to {date_to}.',
+            messages.SUCCESS,
+        )
+
+
+@admin.register(AvailabilityException)
+class AvailabilityExceptionAdmin(admin.ModelAdmin):
+    list_display = ['date', 'service', 'kind', 'starts_at', 'ends_at', 'capacity', 'is_home_service', 'note']
+    list_filter = ['kind', 'date', 'service']
+    list_select_related = ['service']
+    date_hierarchy = 'date'
+
+
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
     list_display = ['name', 'surcharge', 'is_new', 'created_at']
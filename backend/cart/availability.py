@@ -0,0 +1,234 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from collections import defaultdict
+from django.conf import settings
+from django.utils import timezone
+from .models import AvailabilityException, AvailabilitySchedule, ServiceAvailability
+
+AVAILABILITY_MODES = ('materialized', 'virtual')
+# Longest range one availability request may cover, in either mode
+MAX_AVAILABILITY_DAYS = 92
+
+
+def get_horizon_days():
+    return getattr(settings, 'AVAILABILITY_HORIZON_DAYS', 30)
+
+
+def build_windows(schedules, date_from, date_to, existing=frozenset()):
+    """
+    Yield unsaved ServiceAvailability rows for every schedule slot in the range.
+
+    Slots whose (service_id, date, start_time, is_home_service) key is in
+    ``existing`` are skipped.
+    """
+    by_weekday = defaultdict(list)
+    for schedule in schedules:
+        by_weekday[schedule.weekday].append((schedule, schedule.slot_times()))
+
+    day = date_from
+    while day <= date_to:
+        for schedule, slots in by_weekday[day.weekday()]:
+            if not schedule.applies_on(day):
+                continue
+            for start_time, end_time in slots:
+                if (schedule.service_id, day, start_time, schedule.is_home_service) in existing:
+                    continue
+                yield ServiceAvailability(
+                    service_id=schedule.service_id,
+                    date=day,
+                    start_time=start_time,
+                    end_time=end_time,
+                    capacity=schedule.capacity,
+                    booked_count=0,
+                    # bulk_create skips save(), which normally sets this
+                    remaining_slots=schedule.capacity,
+                    is_home_service=schedule.is_home_service,
+                )
+        day += timedelta(days=1)
+
+
+def generate_windows(date_from, date_to, schedules=None, batch_size=2000):
+    """
+    Materialize availability windows from recurring schedules.
+
+    Windows that already exist are read up front and skipped, so
+    re-running over a range only fills gaps and never resets booked counts.
+    Rows go in with bulk_create(ignore_conflicts=True), and the unique
+    (service, date, start_time, is_home_service) constraint covers windows
+    created concurrently. Returns how many windows were created.
+    """
+    if schedules is None:
+        schedules = AvailabilitySchedule.objects.filter(is_active=True, service__is_active=True)
+    schedules = list(schedules.select_related('service'))
+    if not schedules:
+        return 0
+
+    in_range = ServiceAvailability.objects.in_range(date_from, date_to).filter(
+        service_id__in={schedule.service_id for schedule in schedules}
+    )
+    existing = set(in_range.values_list('service_id', 'date', 'start_time', 'is_home_service'))
+    ServiceAvailability.objects.bulk_create(
+        build_windows(schedules, date_from, date_to, existing),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    return in_range.count() - len(existing)
+
+
+def get_availability_mode():
+    return getattr(settings, 'AVAILABILITY_MODE', 'materialized')
+
+
+def booked_counts(starts, ends, slots):
+    """
+    Count bookings overlapping each ``(start, end)`` slot.
+
+    ``starts`` and ``ends`` hold the sorted start and end times of the day's
+    bookings. A booking overlaps [start, end) when it starts before ``end``
+    and does not end by ``start``. Every booking that ends by ``start`` also
+    starts before ``end``, so the count is one bisection into each array.
+    """
+    return [bisect_left(starts, end) - bisect_right(ends, start) for start, end in slots]
+
+
+def local_naive(value):
+    """Wall-clock time of an aware datetime, for comparing with a date and time of day."""
+    if timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def day_slots(schedule, slot_times, exceptions):
+    """``slot_times`` as (start_time, end_time, capacity) after the day's exceptions."""
+    closed = []
+    capacity = []
+    for exception in exceptions:
+        if not exception.applies_to(schedule.service_id, schedule.is_home_service):
+            continue
+        if exception.kind == 'closed':
+            if exception.starts_at is None:
+                return []
+            closed.append(exception)
+        elif exception.kind == 'capacity':
+            capacity.append(exception)
+
+    slots = []
+    for start_time, end_time in slot_times:
+        if any(exception.overlaps(start_time, end_time) for exception in closed):
+            continue
+        slot_capacity = schedule.capacity
+        for exception in capacity:
+            if exception.overlaps(start_time, end_time):
+                slot_capacity = exception.capacity
+        slots.append((start_time, end_time, slot_capacity))
+    return slots
+
+
+def virtual_windows(date_from, date_to, service_id=None, is_home_service=None, service_ids=None,
+                    include_full=False):
+    """
+    Open windows computed from the schedules, without materialized rows.
+
+    The weekly schedules and the stored exceptions give each day's slots.
+    The day's bookings for the same service and kind, sorted by start and
+    end, give the booked count for every slot through booked_counts().
+    Returns unsaved ServiceAvailability objects with remaining capacity
+    (every slot with ``include_full``), ordered like the materialized
+    query, after three queries.
+    """
+    from bookings.models import Booking
+
+    schedules = AvailabilitySchedule.objects.filter(
+        is_active=True, service__is_active=True
+    ).select_related('service')
+    exceptions = AvailabilityException.objects.filter(date__range=(date_from, date_to)).select_related('service')
+    if service_id:
+        service_ids = [service_id]
+    if service_ids is not None:
+        schedules = schedules.filter(service_id__in=service_ids)
+        exceptions = exceptions.for_services(service_ids)
+    if is_home_service is not None:
+        schedules = schedules.filter(is_home_service=is_home_service)
+
+    schedules_by_weekday = defaultdict(list)
+    for schedule in schedules:
+        schedules_by_weekday[schedule.weekday].append((schedule, schedule.slot_times()))
+
+    exceptions_by_date = defaultdict(list)
+    extra_schedules = defaultdict(list)
+    for exception in exceptions:
+        exceptions_by_date[exception.date].append(exception)
+        if exception.kind != 'open' or not exception.service.is_active:
+            continue
+        # A one-day schedule for the extra hours, for each kind it opens
+        kinds = (False, True) if exception.is_home_service is None else (exception.is_home_service,)
+        for home in kinds:
+            if is_home_service is not None and home != is_home_service:
+                continue
+            schedule = AvailabilitySchedule(
+                service=exception.service,
+                weekday=exception.date.weekday(),
+                opens_at=exception.starts_at,
+                closes_at=exception.ends_at,
+                capacity=exception.capacity or 1,
+                is_home_service=home,
+            )
+            extra_schedules[exception.date].append((schedule, schedule.slot_times()))
+
+    service_ids = {
+        schedule.service_id
+        for group in [*schedules_by_weekday.values(), *extra_schedules.values()]
+        for schedule, _ in group
+    }
+    if not service_ids:
+        return []
+
+    intervals = defaultdict(lambda: ([], []))
+    bookings = (
+        Booking.objects
+        .filter(service_id__in=service_ids, appointment_date__range=(date_from, date_to))
+        .exclude(status='cancelled')
+        .values_list('service_id', 'is_home_service', 'appointment_date', 'starts_at', 'ends_at')
+    )
+    for booking_service_id, home, appointment_date, starts_at, ends_at in bookings:
+        starts, ends = intervals[booking_service_id, home, appointment_date]
+        # Compared with wall-clock slot bounds, so no per-slot make_aware
+        starts.append(local_naive(starts_at))
+        ends.append(local_naive(ends_at))
+    for starts, ends in intervals.values():
+        starts.sort()
+        ends.sort()
+
+    windows = []
+    day = date_from
+    while day <= date_to:
+        day_exceptions = exceptions_by_date[day]
+        for schedule, slot_times in schedules_by_weekday[day.weekday()] + extra_schedules[day]:
+            if not schedule.applies_on(day):
+                continue
+            slots = day_slots(schedule, slot_times, day_exceptions)
+            if not slots:
+                continue
+            starts, ends = intervals.get((schedule.service_id, schedule.is_home_service, day), ((), ()))
+            bounds = [
+                (datetime.combine(day, start_time), datetime.combine(day, end_time))
+                for start_time, end_time, _ in slots
+            ]
+            for (start_time, end_time, capacity), booked in zip(slots, booked_counts(starts, ends, bounds)):
+                remaining = capacity - booked
+                if remaining <= 0 and not include_full:
+                    continue
+                windows.append(ServiceAvailability(
+                    service=schedule.service,
+                    date=day,
+                    start_time=start_time,
+                    end_time=end_time,
+                    capacity=capacity,
+                    booked_count=booked,
+                    remaining_slots=max(remaining, 0),
+                    is_home_service=schedule.is_home_service,
+                ))
+        day += timedelta(days=1)
+
+    windows.sort(key=lambda window: (window.date, window.start_time, window.service_id))
+    return windows
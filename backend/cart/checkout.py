@@ -0,0 +1,145 @@
+from collections import Counter
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from bookings.models import Booking
+from bookings.reservations import SlotUnavailable, claim_virtual_slots
+from bookings.schedule import refresh_days
+from bookings.tasks import send_booking_confirmation
+from .availability import get_availability_mode
+from .models import Cart, CartItem, ServiceAvailability
+from .wallet import spend_credit
+
+
+class CheckoutConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The cart changed during checkout. Review it and try again.'
+    default_code = 'checkout_conflict'
+
+
+def claim_places(needed):
+    """Claim ``needed[pk]`` places in each window with one conditional UPDATE, or raise SlotUnavailable."""
+    places = Case(
+        *[When(pk=pk, then=Value(count)) for pk, count in needed.items()],
+        output_field=PositiveIntegerField(),
+    )
+    claimed = ServiceAvailability.objects.filter(
+        reduce(or_, [Q(pk=pk, remaining_slots__gte=count) for pk, count in needed.items()])
+    ).update(
+        booked_count=F('booked_count') + places,
+        remaining_slots=F('remaining_slots') - places,
+        updated_at=timezone.now(),
+    )
+    if claimed != len(needed):
+        # Rolls back the places claimed in the windows that did fit
+        raise SlotUnavailable('One or more of the chosen slots is fully booked.')
+
+
+def checkout_cart(user, slots, notes=None, use_credit=False):
+    """
+    Turn the user's cart into bookings in the chosen availability windows.
+
+    ``slots`` maps every cart item id to an availability window id. Each
+    unit of an item's quantity becomes one booking in its window. Capacity
+    for all windows is claimed with one conditional UPDATE, bookings are
+    bulk-inserted and the cart is emptied, all in one transaction, so the
+    query count doesn't grow with the size of the cart. With virtual
+    availability there are no window rows: ``slots`` maps each item to a
+    ``(date, start_time, is_home_service)`` slot instead, checked against
+    the schedules by ``claim_virtual_slots``. With ``use_credit``
+    the cart total is paid from the user's credit in the same transaction,
+    as one ledger entry; InsufficientCredit rolls the checkout back.
+
+    Checkouts of one cart run one at a time: the first statement writes
+    the cart row, which holds back a second checkout (a double submit)
+    until the first commits, and it then finds the cart empty. The items
+    are deleted before anything is claimed or spent, and CheckoutConflict
+    rolls back a checkout that didn't delete every item it read, so a cart
+    is never booked or charged twice.
+    """
+    with transaction.atomic():
+        # Write first: on SQLite a transaction that reads before writing
+        # can't wait for another writer, so this also queues checkouts there
+        Cart.objects.filter(user=user).update(updated_at=timezone.now())
+        items = list(
+            CartItem.objects.filter(cart__user=user).select_related('service').select_for_update(of=('self',))
+        )
+        if not items:
+            raise serializers.ValidationError({'error': 'Cart is empty'})
+        if set(slots) != {item.id for item in items}:
+            raise serializers.ValidationError({'slots': 'Choose a slot for every cart item.'})
+
+        virtual = get_availability_mode() == 'virtual'
+        if virtual:
+            if not all(isinstance(slot, tuple) for slot in slots.values()):
+                raise serializers.ValidationError(
+                    {'slots': 'Availability is computed from the schedules; choose each slot by date and start_time.'}
+                )
+            windows = {
+                item.id: ServiceAvailability(
+                    date=slots[item.id][0], start_time=slots[item.id][1], is_home_service=slots[item.id][2]
+                )
+                for item in items
+            }
+        else:
+            if any(isinstance(slot, tuple) for slot in slots.values()):
+                raise serializers.ValidationError({'slots': 'Choose an availability window for every cart item.'})
+            windows = ServiceAvailability.objects.in_bulk(set(slots.values()))
+            for item in items:
+                window = windows.get(slots[item.id])
+                if window is None or window.service_id != item.service_id:
+                    raise serializers.ValidationError({'slots': f'Invalid slot for cart item {item.id}.'})
+
+        deleted, _ = CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+        if deleted != len(items):
+            raise CheckoutConflict()
+
+        needed = Counter()
+        if not virtual:
+            for item in items:
+                needed[slots[item.id]] += item.quantity
+
+        bookings = []
+        for item in items:
+            window = windows[item.id if virtual else slots[item.id]]
+            for _ in range(item.quantity):
+                booking = Booking(
+                    user=user,
+                    service=item.service,
+                    availability=None if virtual else window,
+                    appointment_date=window.date,
+                    appointment_time=window.start_time,
+                    is_home_service=window.is_home_service,
+                    use_new_equipment=item.use_new_equipment,
+                    equipment_surcharge=item.equipment_surcharge if item.use_new_equipment else 0,
+                    notes=notes,
+                )
+                if use_credit:
+                    booking.credit_amount = booking.service.price + booking.equipment_surcharge
+                # bulk_create skips save(), which normally fills these in
+                booking.set_interval()
+                bookings.append(booking)
+
+        if virtual:
+            claim_virtual_slots(bookings)
+        else:
+            claim_places(needed)
+
+        Booking.objects.bulk_create(bookings)
+        total = sum(booking.credit_amount for booking in bookings)
+        # Charged only by the checkout that deleted the cart items above
+        if total:
+            spend_credit(user.pk, total, reference=f'checkout:{bookings[0].pk}')
+        # bulk_create sends no post_save, so refresh the schedule and queue
+        # one confirmation for the whole checkout explicitly
+        refresh_days({booking.appointment_date for booking in bookings})
+        send_booking_confirmation.enqueue(
+            idempotency_key=f'booking-confirmation:{bookings[0].pk}',
+            booking_ids=[booking.pk for booking in bookings],
+        )
+
+    return bookings
@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from cart.availability import generate_windows, get_horizon_days
+from cart.models import AvailabilitySchedule
+
+
+class Command(BaseCommand):
+    help = 'Create availability windows from the recurring schedules over a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=parse_date, help='First day to generate (YYYY-MM-DD, default today)')
+        parser.add_argument('--date-to', type=parse_date, help='Last day to generate (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, help='Days to generate from --date-from (default AVAILABILITY_HORIZON_DAYS)')
+        parser.add_argument('--service', type=int, action='append', dest='services', help='Limit to a service id (repeatable)')
+
+    def handle(self, *args, **options):
+        date_from = options['date_from'] or timezone.localdate()
+        date_to = options['date_to'] or date_from + timedelta(days=(options['days'] or get_horizon_days()) - 1)
+        if date_to < date_from:
+            raise CommandError('--date-to must not be before --date-from')
+
+        schedules = AvailabilitySchedule.objects.filter(is_active=True, service__is_active=True)
+        if options['services']:
+            schedules = schedules.filter(service_id__in=options['services'])
+
+        started = time.perf_counter()
+        created = generate_windows(date_from, date_to, schedules)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} availability windows from {date_from} to {date_to} '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from cart.wallet import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Check every credit balance against the sum of its ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Balances compared per query')
+        parser.add_argument('--fix', action='store_true', help='Reset mismatched balances to their ledger sum')
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for user_id, balance, ledger in reconcile_balances(options['batch_size'], fix=options['fix']):
+            mismatches += 1
+            self.stdout.write(f'user {user_id}: balance {balance}, ledger {ledger}')
+
+        if mismatches and not options['fix']:
+            # Non-zero exit so a cron job reports it
+            raise CommandError(f'{mismatches} credit balances disagree with the ledger')
+        verb = 'Fixed' if options['fix'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {mismatches} mismatched credit balances'))
@@ -0,0 +1,76 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def fill_remaining_slots(apps, schema_editor):
+    ServiceAvailability = apps.get_model('cart', 'ServiceAvailability')
+    ServiceAvailability.objects.filter(booked_count__gte=F('capacity')).update(remaining_slots=0)
+    ServiceAvailability.objects.filter(booked_count__lt=F('capacity')).update(
+        remaining_slots=F('capacity') - F('booked_count')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceavailability',
+            name='remaining_slots',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(fill_remaining_slots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='serviceavailability',
+            index=models.Index(condition=models.Q(('remaining_slots__gt', 0)), fields=['service', 'is_home_service', 'date', 'start_time'], name='cart_avail_open_service_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceavailability',
+            index=models.Index(condition=models.Q(('remaining_slots__gt', 0)), fields=['date', 'start_time'], name='cart_avail_open_date_idx'),
+        ),
+        migrations.CreateModel(
+            name='AvailabilitySchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('opens_at', models.TimeField()),
+                ('closes_at', models.TimeField()),
+                ('capacity', models.PositiveIntegerField(default=1)),
+                ('is_home_service', models.BooleanField(default=False)),
+                ('valid_from', models.DateField(blank=True, null=True)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_schedules', to='services.service')),
+            ],
+            options={
+                'ordering': ['service', 'weekday', 'opens_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilityException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kind', models.CharField(choices=[('closed', 'Closed'), ('capacity', 'Custom capacity'), ('open', 'Extra opening')], max_length=10)),
+                ('starts_at', models.TimeField(blank=True, null=True)),
+                ('ends_at', models.TimeField(blank=True, null=True)),
+                ('capacity', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_home_service', models.BooleanField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='availability_exceptions', to='services.service')),
+            ],
+            options={
+                'ordering': ['date', 'starts_at'],
+                'indexes': [models.Index(fields=['date'], name='cart_avail_exception_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_availability_schedules'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availabilityschedule',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['service', 'weekday'], name='cart_schedule_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credittopup',
+            index=models.Index(fields=['user', '-created_at'], name='cart_topup_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(condition=models.Q(('is_new', True)), fields=['name', 'id'], name='cart_equipment_new_name_idx'),
+        ),
+    ]
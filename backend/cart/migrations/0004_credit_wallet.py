@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:49
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0003_user_avatar_hash'),
+        ('cart', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditBalance',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_balance', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CreditLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('top_up', 'Top-up'), ('spend', 'Spend'), ('refund', 'Refund')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reference', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('topup', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='cart.credittopup')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'credit ledger entries',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='creditbalance',
+            constraint=models.CheckConstraint(check=models.Q(('balance__gte', 0)), name='cart_credit_balance_non_negative'),
+        ),
+        migrations.AddIndex(
+            model_name='creditledgerentry',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='cart_ledger_user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='creditledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'top_up')), fields=('topup',), name='cart_ledger_topup_once'),
+        ),
+    ]
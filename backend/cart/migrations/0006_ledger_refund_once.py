@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_payment_events'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='creditledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'refund'), ('reference__startswith', 'refund:')), fields=('reference',), name='cart_ledger_refund_once'),
+        ),
+    ]
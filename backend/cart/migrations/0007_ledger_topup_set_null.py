@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0006_ledger_refund_once'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='creditledgerentry',
+            name='topup',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='cart.credittopup'),
+        ),
+    ]
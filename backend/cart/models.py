@@ -1,25 +1,121 @@
-from django.db import models
+from functools import reduce
+from operator import or_
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from datetime import time
 from services.models import Service
 from decimal import Decimal
 
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def line_total(prefix=''):
+    """Database expression for a cart item's price x quantity plus equipment surcharge."""
+    quantity = F(f'{prefix}quantity')
+    return ExpressionWrapper(
+        F(f'{prefix}service__price') * quantity + Case(
+            When(**{f'{prefix}use_new_equipment': True}, then=F(f'{prefix}equipment_surcharge') * quantity),
+            default=Value(Decimal('0.00')),
+            output_field=MONEY,
+        ),
+        output_field=MONEY,
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(
+            annotated_total=Coalesce(Sum(line_total('items__')), Value(Decimal('0.00')), output_field=MONEY),
+            annotated_count=Count('items'),
+        )
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.select_related('service').annotate(line_total=line_total())
+
 
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"Cart for {self.user.full_name}"
 
     @property
     def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
+        if hasattr(self, 'annotated_total'):
+            return self.annotated_total
+        return self.items.aggregate(
+            total=Coalesce(Sum(line_total()), Value(Decimal('0.00')), output_field=MONEY)
+        )['total']
 
     @property
     def items_count(self):
+        if hasattr(self, 'annotated_count'):
+            return self.annotated_count
         return self.items.count()
 
+    def add_items(self, items):
+        """
+        Add quantities of services to the cart in one transaction.
+
+        ``items`` are dicts with ``service_id``, ``quantity`` and optionally
+        ``use_new_equipment`` and ``equipment_surcharge``. Missing rows are
+        inserted in one statement, then every quantity is incremented with a
+        single UPDATE, so concurrent adds never overwrite each other.
+        """
+        merged = {}
+        for item in items:
+            key = (item['service_id'], bool(item.get('use_new_equipment', False)))
+            if key in merged:
+                merged[key]['quantity'] += int(item['quantity'])
+            else:
+                merged[key] = {
+                    'quantity': int(item['quantity']),
+                    'equipment_surcharge': item.get('equipment_surcharge') or Decimal('0.00'),
+                }
+        if not merged:
+            return
+
+        with transaction.atomic():
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart=self,
+                        service_id=service_id,
+                        use_new_equipment=use_new_equipment,
+                        quantity=0,
+                        equipment_surcharge=values['equipment_surcharge'],
+                    )
+                    for (service_id, use_new_equipment), values in merged.items()
+                ],
+                ignore_conflicts=True,
+            )
+            lookups = [
+                Q(service_id=service_id, use_new_equipment=use_new_equipment)
+                for service_id, use_new_equipment in merged
+            ]
+            increments = Case(
+                *[
+                    When(lookup, then=Value(values['quantity']))
+                    for lookup, values in zip(lookups, merged.values())
+                ],
+                default=Value(0),
+                output_field=models.PositiveIntegerField(),
+            )
+            self.items.filter(reduce(or_, lookups)).update(
+                quantity=F('quantity') + increments,
+                updated_at=timezone.now(),
+            )
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -30,6 +126,8 @@ class CartItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ['cart', 'service', 'use_new_equipment']
 
@@ -38,6 +136,8 @@ class CartItem(models.Model):
 
     @property
     def total_price(self):
+        if hasattr(self, 'line_total'):
+            return self.line_total
         base_price = self.service.price * self.quantity
         equipment_cost = self.equipment_surcharge * self.quantity if self.use_new_equipment else Decimal('0.00')
         return base_price + equipment_cost
@@ -54,17 +154,139 @@ class CreditTopUp(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='credit_topups')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    payment_intent_id = models.CharField(max_length=255, blank=True, null=True)  # For payment provider integration
+    # Assigned on creation and handed to the payment provider, whose webhook
+    # events name it (cart.settlement)
+    payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', '-created_at'], name='cart_topup_user_created_idx')]
+        constraints = [
+            models.UniqueConstraint(fields=['payment_intent_id'], name='cart_topup_payment_intent_unique'),
+        ]
 
     def __str__(self):
         return f"Credit top-up of ${self.amount} for {self.user.full_name}"
 
 
+class PaymentEvent(models.Model):
+    """A webhook event from the payment provider, stored once per provider event id."""
+    SUCCEEDED = 'payment_intent.succeeded'
+    # An attempt failed; the customer can still retry on the same intent
+    FAILED = 'payment_intent.payment_failed'
+    # The intent was abandoned and can't be paid any more
+    CANCELED = 'payment_intent.canceled'
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payment_intent_id = models.CharField(max_length=255, blank=True, default='')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-received_at', '-id']
+        indexes = [
+            # Settlement only ever scans the unprocessed backlog
+            models.Index(fields=['id'], condition=Q(processed_at__isnull=True), name='cart_payment_event_todo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
+
+class CreditBalance(models.Model):
+    """A user's credit: the sum of their ledger entries, kept in step by cart.wallet."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='credit_balance'
+    )
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=Q(balance__gte=0), name='cart_credit_balance_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"${self.balance} credit for user {self.user_id}"
+
+
+class CreditLedgerEntry(models.Model):
+    """One change to a user's credit. Entries are never updated or deleted."""
+    TOP_UP = 'top_up'
+    SPEND = 'spend'
+    REFUND = 'refund'
+    KIND_CHOICES = [
+        (TOP_UP, 'Top-up'),
+        (SPEND, 'Spend'),
+        (REFUND, 'Refund'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='credit_ledger')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Signed: spends are negative
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Kept with its amount and reference if the top-up (or its user) is deleted
+    topup = models.ForeignKey(
+        CreditTopUp, on_delete=models.SET_NULL, related_name='ledger_entries', blank=True, null=True
+    )
+    reference = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = 'credit ledger entries'
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='cart_ledger_user_created_idx')]
+        constraints = [
+            # A top-up is credited once, however many times completion is reported
+            models.UniqueConstraint(
+                fields=['topup'], condition=Q(kind='top_up'), name='cart_ledger_topup_once'
+            ),
+            # A charge is refunded once, however many times its booking is cancelled
+            models.UniqueConstraint(
+                fields=['reference'], condition=Q(kind='refund', reference__startswith='refund:'),
+                name='cart_ledger_refund_once',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of ${self.amount} for user {self.user_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Credit ledger entries are append-only.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Credit ledger entries are append-only.')
+
+
+class ServiceAvailabilityQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(remaining_slots__gt=0)
+
+    def in_range(self, date_from=None, date_to=None):
+        queryset = self
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+        return queryset
+
+    def open_windows(self, service_id=None, date_from=None, date_to=None, is_home_service=None):
+        """Open windows in a date range, fetched with their service in one query."""
+        queryset = self.open().in_range(date_from, date_to)
+        if service_id:
+            queryset = queryset.filter(service_id=service_id)
+        if is_home_service is not None:
+            queryset = queryset.filter(is_home_service=is_home_service)
+        return queryset.select_related('service').order_by('date', 'start_time')
+
+
 class ServiceAvailability(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='availability_windows')
     date = models.DateField()
@@ -72,25 +294,180 @@ class ServiceAvailability(models.Model):
     end_time = models.TimeField()
     capacity = models.PositiveIntegerField(default=1)
     booked_count = models.PositiveIntegerField(default=0)
+    # Stored copy of capacity - booked_count so "is open" is an indexed column
+    # rather than a Python property; kept in sync by save() and by F() updates.
+    remaining_slots = models.PositiveIntegerField(default=1, editable=False)
     is_home_service = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ServiceAvailabilityQuerySet.as_manager()
+
     class Meta:
         unique_together = ['service', 'date', 'start_time', 'is_home_service']
         ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(
+                fields=['service', 'is_home_service', 'date', 'start_time'],
+                condition=models.Q(remaining_slots__gt=0),
+                name='cart_avail_open_service_idx',
+            ),
+            models.Index(
+                fields=['date', 'start_time'],
+                condition=models.Q(remaining_slots__gt=0),
+                name='cart_avail_open_date_idx',
+            ),
+        ]
 
     def __str__(self):
         service_type = "Home Service" if self.is_home_service else "In-Store"
         return f"{self.service.name} - {service_type} on {self.date} {self.start_time}-{self.end_time}"
 
+    def save(self, *args, **kwargs):
+        self.remaining_slots = max(0, self.capacity - self.booked_count)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'capacity', 'booked_count'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'remaining_slots'}
+        super().save(*args, **kwargs)
+
     @property
     def is_available(self):
         return self.booked_count < self.capacity
 
-    @property
-    def remaining_slots(self):
-        return max(0, self.capacity - self.booked_count)
+
+class AvailabilitySchedule(models.Model):
+    """
+    Weekly opening hours for a service, materialized into ServiceAvailability.
+
+    Each row covers one weekday. Windows run back to back from ``opens_at``
+    and are ``service.duration_minutes`` long. A window that would run past
+    ``closes_at`` is left out.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='availability_schedules')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    opens_at = models.TimeField()
+    closes_at = models.TimeField()
+    capacity = models.PositiveIntegerField(default=1)
+    is_home_service = models.BooleanField(default=False)
+    valid_from = models.DateField(blank=True, null=True)
+    valid_until = models.DateField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['service', 'weekday', 'opens_at']
+        indexes = [
+            models.Index(fields=['service', 'weekday'], condition=models.Q(is_active=True), name='cart_schedule_active_idx'),
+        ]
+
+    def __str__(self):
+        service_type = "Home Service" if self.is_home_service else "In-Store"
+        return f"{self.service.name} - {service_type} {self.get_weekday_display()} {self.opens_at}-{self.closes_at}"
+
+    def clean(self):
+        if self.opens_at and self.closes_at and self.closes_at <= self.opens_at:
+            raise ValidationError({'closes_at': 'Closing time must be after opening time.'})
+        if self.valid_from and self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError({'valid_until': 'End date must not be before the start date.'})
+
+    def applies_on(self, day):
+        return (
+            day.weekday() == self.weekday
+            and (self.valid_from is None or day >= self.valid_from)
+            and (self.valid_until is None or day <= self.valid_until)
+        )
+
+    def slot_times(self):
+        """(start, end) times of each window in a day, sized to the service duration."""
+        length = self.service.duration_minutes
+        if length <= 0:
+            return []
+        opens_at = self._meta.get_field('opens_at').to_python(self.opens_at)
+        closes_at = self._meta.get_field('closes_at').to_python(self.closes_at)
+        opens = opens_at.hour * 60 + opens_at.minute
+        closes = closes_at.hour * 60 + closes_at.minute
+        return [
+            (time(start // 60, start % 60), time((start + length) // 60, (start + length) % 60))
+            for start in range(opens, closes - length + 1, length)
+        ]
+
+
+class AvailabilityExceptionQuerySet(models.QuerySet):
+    def for_services(self, service_ids):
+        """Exceptions for any of ``service_ids``, plus those covering every service."""
+        return self.filter(Q(service__isnull=True) | Q(service_id__in=service_ids))
+
+
+class AvailabilityException(models.Model):
+    """
+    A one-off change to the weekly schedules, used by virtual availability.
+
+    ``closed`` removes the slots overlapping the time range, or the whole day
+    if no times are given. ``capacity`` sets the capacity of those slots.
+    ``open`` adds extra hours for one service on that date. A blank service
+    or ``is_home_service`` applies to every service or both kinds.
+    """
+    KIND_CHOICES = [
+        ('closed', 'Closed'),
+        ('capacity', 'Custom capacity'),
+        ('open', 'Extra opening'),
+    ]
+
+    service = models.ForeignKey(
+        Service, on_delete=models.CASCADE, related_name='availability_exceptions',
+        blank=True, null=True
+    )
+    date = models.DateField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    starts_at = models.TimeField(blank=True, null=True)
+    ends_at = models.TimeField(blank=True, null=True)
+    capacity = models.PositiveIntegerField(blank=True, null=True)
+    is_home_service = models.BooleanField(blank=True, null=True)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AvailabilityExceptionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['date', 'starts_at']
+        indexes = [models.Index(fields=['date'], name='cart_avail_exception_date_idx')]
+
+    def __str__(self):
+        target = self.service.name if self.service_id else 'All services'
+        return f"{target} - {self.get_kind_display()} on {self.date}"
+
+    def clean(self):
+        if (self.starts_at is None) != (self.ends_at is None):
+            raise ValidationError('Give both a start and an end time, or neither for the whole day.')
+        if self.starts_at is not None and self.ends_at <= self.starts_at:
+            raise ValidationError({'ends_at': 'End time must be after start time.'})
+        if self.kind == 'capacity' and self.capacity is None:
+            raise ValidationError({'capacity': 'Custom capacity needs a capacity.'})
+        if self.kind == 'open' and (self.service_id is None or self.starts_at is None):
+            raise ValidationError('An extra opening needs a service and a time range.')
+
+    def applies_to(self, service_id, is_home_service):
+        return (
+            (self.service_id is None or self.service_id == service_id)
+            and (self.is_home_service is None or self.is_home_service == is_home_service)
+        )
+
+    def overlaps(self, start_time, end_time):
+        if self.starts_at is None:
+            return True
+        return start_time < self.ends_at and self.starts_at < end_time
 
 
 class Equipment(models.Model):
@@ -102,5 +479,10 @@ class Equipment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], condition=models.Q(is_new=True), name='cart_equipment_new_name_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} (+${self.surcharge})"
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Payment provider webhooks: signatures, and a local stand-in for the provider.
+
+Webhook bodies are signed the way most providers do it: an HMAC-SHA256 of
+``"<timestamp>.<body>"`` with the shared ``PAYMENT_WEBHOOK_SECRET``, sent as
+``Payment-Signature: t=<timestamp>,v1=<hex digest>``. A timestamp older than
+``PAYMENT_WEBHOOK_TOLERANCE`` seconds is rejected, so a captured request
+can't be replayed later.
+"""
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models import PaymentEvent
+
+SIGNATURE_HEADER = 'HTTP_PAYMENT_SIGNATURE'
+
+
+def new_payment_intent_id():
+    return f'pi_{secrets.token_hex(12)}'
+
+
+def sign(body, secret, timestamp=None):
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def verify_signature(body, header, secret, tolerance):
+    parts = dict(part.split('=', 1) for part in header.split(',') if '=' in part)
+    try:
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    expected = sign(body, secret, timestamp).split('v1=', 1)[1]
+    return hmac.compare_digest(expected, parts.get('v1', ''))
+
+
+class FakePaymentProvider:
+    """
+    Local stand-in for the payment provider, for tests, benchmarks and development.
+
+    It reports payments the way the real provider does: as signed webhook
+    events naming the top-up's ``payment_intent_id``.
+    """
+
+    def __init__(self, secret=None):
+        self.secret = secret or settings.PAYMENT_WEBHOOK_SECRET
+
+    def event(self, topup, event_type=PaymentEvent.SUCCEEDED, amount=None, event_id=None):
+        return {
+            'id': event_id or f'evt_{secrets.token_hex(12)}',
+            'type': event_type,
+            'data': {
+                'payment_intent_id': topup.payment_intent_id,
+                'amount': str(topup.amount if amount is None else amount),
+            },
+        }
+
+    def request(self, events):
+        """Body and signature header of a webhook delivering ``events`` (one event or a list)."""
+        body = json.dumps(events).encode()
+        return body, {SIGNATURE_HEADER: sign(body, self.secret)}
+
+    def deliver(self, client, events):
+        """POST ``events`` to the webhook through a Django test client."""
+        body, headers = self.request(events)
+        return client.post(reverse('payment-webhook'), body, content_type='application/json', **headers)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Cart, CartItem, CreditTopUp, ServiceAvailability, Equipment
+from .models import Cart, CartItem, CreditLedgerEntry, CreditTopUp, ServiceAvailability, Equipment
 from services.serializers import ServiceSerializer
 
 
@@ -14,6 +14,43 @@ class CartItemSerializer(serializers.ModelSerializer):
                  'equipment_surcharge', 'total_price', 'created_at']
 
 
+class CartItemOperationSerializer(serializers.Serializer):
+    service_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    use_new_equipment = serializers.BooleanField(default=False)
+    equipment_surcharge = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+
+class CartBulkAddSerializer(serializers.Serializer):
+    items = CartItemOperationSerializer(many=True, allow_empty=False)
+
+
+class CheckoutSlotSerializer(serializers.Serializer):
+    """An availability window by id, or with virtual availability a slot by date and start time."""
+    cart_item_id = serializers.IntegerField()
+    availability_id = serializers.IntegerField(required=False)
+    date = serializers.DateField(required=False)
+    start_time = serializers.TimeField(required=False)
+    is_home_service = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if 'availability_id' not in attrs and not ('date' in attrs and 'start_time' in attrs):
+            raise serializers.ValidationError('Give an availability_id, or a date and start_time.')
+        return attrs
+
+
+class CheckoutSerializer(serializers.Serializer):
+    slots = CheckoutSlotSerializer(many=True, allow_empty=False)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    use_credit = serializers.BooleanField(default=False)
+
+    def validate_slots(self, value):
+        item_ids = [slot['cart_item_id'] for slot in value]
+        if len(set(item_ids)) != len(item_ids):
+            raise serializers.ValidationError('Choose one slot per cart item.')
+        return value
+
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_amount = serializers.ReadOnlyField()
@@ -27,8 +64,32 @@ class CartSerializer(serializers.ModelSerializer):
 class CreditTopUpSerializer(serializers.ModelSerializer):
     class Meta:
         model = CreditTopUp
-        fields = ['id', 'amount', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['status', 'created_at', 'updated_at']
+        fields = ['id', 'amount', 'status', 'payment_intent_id', 'created_at', 'updated_at']
+        read_only_fields = ['status', 'payment_intent_id', 'created_at', 'updated_at']
+
+
+class PaymentEventDataSerializer(serializers.Serializer):
+    payment_intent_id = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+
+class PaymentEventSerializer(serializers.Serializer):
+    """A payment provider webhook event; unknown types are stored and ignored."""
+    id = serializers.CharField(max_length=255)
+    type = serializers.CharField(max_length=100)
+    data = PaymentEventDataSerializer(required=False, default=dict)
+
+    def to_internal_value(self, data):
+        validated = super().to_internal_value(data)
+        validated['payload'] = data
+        return validated
+
+
+class CreditLedgerEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CreditLedgerEntry
+        fields = ['id', 'kind', 'amount', 'topup', 'reference', 'created_at']
+        read_only_fields = fields
 
 
 class ServiceAvailabilitySerializer(serializers.ModelSerializer):
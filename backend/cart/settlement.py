@@ -0,0 +1,114 @@
+"""
+Top-up settlement from payment provider events.
+
+The webhook only stores each event, deduplicated by the provider's event
+id, and queues ``settle_payments``; the provider gets its 200 at once and
+redeliveries are no-ops. ``settle_events`` then applies the backlog in
+batches, each in one transaction with a fixed number of queries whatever
+its size. Workers lock their batch with ``SKIP LOCKED``, so several can
+settle side by side.
+
+A succeeded event credits any top-up that isn't completed yet, so a
+repeated or late event for a completed top-up changes nothing. A failed
+payment attempt leaves the top-up pending, because the customer can retry
+on the same intent; only a canceled intent fails it, and a success that
+still arrives afterwards completes it.
+"""
+import hashlib
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CreditTopUp, PaymentEvent
+from .wallet import complete_topups
+
+logger = logging.getLogger(__name__)
+
+
+def record_events(events):
+    """Store validated events, skipping ids already stored; returns the ids."""
+    PaymentEvent.objects.bulk_create(
+        [
+            PaymentEvent(
+                event_id=event['id'],
+                type=event['type'],
+                payment_intent_id=event['data'].get('payment_intent_id', ''),
+                amount=event['data'].get('amount'),
+                payload=event['payload'],
+            )
+            for event in events
+        ],
+        ignore_conflicts=True,
+    )
+    return [event['id'] for event in events]
+
+
+def settlement_key(event_ids):
+    """
+    Idempotency key for the settle run a delivery of ``event_ids`` queues.
+
+    It covers every id in the delivery, so only an exact redelivery is
+    deduplicated; any delivery carrying a new event queues a run.
+    """
+    digest = hashlib.sha256('\n'.join(sorted(event_ids)).encode()).hexdigest()
+    return f'settle-payments:{digest}'
+
+
+def settle_batch(batch_size):
+    """Apply up to ``batch_size`` unprocessed events; returns their outcome counts, or None when there are none."""
+    outcome = {'completed': 0, 'failed': 0, 'ignored': 0}
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects.filter(processed_at__isnull=True)
+            .order_by('id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not events:
+            return None
+
+        intents = {event.payment_intent_id for event in events if event.payment_intent_id}
+        open_topups = {
+            topup.payment_intent_id: topup
+            for topup in CreditTopUp.objects.filter(payment_intent_id__in=intents)
+            .exclude(status='completed')
+            .select_for_update()
+        }
+        settled = {}
+        for event in events:
+            topup = open_topups.get(event.payment_intent_id)
+            if topup is None:
+                continue
+            if event.type == PaymentEvent.SUCCEEDED:
+                if event.amount != topup.amount:
+                    logger.warning(
+                        'Payment event %s is for %s, top-up %s is for %s; leaving it open',
+                        event.event_id, event.amount, topup.pk, topup.amount,
+                    )
+                    continue
+                # Wins over a cancellation: the customer has paid
+                settled[event.payment_intent_id] = (topup, PaymentEvent.SUCCEEDED)
+            elif event.type == PaymentEvent.CANCELED and topup.status == 'pending':
+                settled.setdefault(event.payment_intent_id, (topup, PaymentEvent.CANCELED))
+
+        completed = [topup for topup, event_type in settled.values() if event_type == PaymentEvent.SUCCEEDED]
+        failed = [topup for topup, event_type in settled.values() if event_type == PaymentEvent.CANCELED]
+        complete_topups(completed)
+        if failed:
+            CreditTopUp.objects.filter(pk__in=[topup.pk for topup in failed]).update(
+                status='failed', updated_at=timezone.now(),
+            )
+        PaymentEvent.objects.filter(pk__in=[event.pk for event in events]).update(processed_at=timezone.now())
+
+    outcome['completed'], outcome['failed'] = len(completed), len(failed)
+    outcome['ignored'] = len(events) - len(completed) - len(failed)
+    return outcome
+
+
+def settle_events(batch_size=500):
+    """Settle every unprocessed event, a batch per transaction; returns the outcome counts."""
+    totals = {'completed': 0, 'failed': 0, 'ignored': 0}
+    while (outcome := settle_batch(batch_size)) is not None:
+        for key, count in outcome.items():
+            totals[key] += count
+    return totals
@@ -0,0 +1,8 @@
+from django.conf import settings
+from tasks.queue import task
+from .settlement import settle_events
+
+
+@task
+def settle_payments():
+    settle_events(settings.PAYMENT_SETTLEMENT_BATCH_SIZE)
@@ -1,9 +1,35 @@
-from django.test import TestCase
+import csv
+import gc
+import json
+import os
+import threading
+import unittest
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from decimal import Decimal
-from .models import Cart, CartItem, CreditTopUp, ServiceAvailability, Equipment
+from rest_framework.exceptions import ValidationError
+from .availability import generate_windows
+from .checkout import checkout_cart
+from .models import (
+    AvailabilityException, AvailabilitySchedule, Cart, CartItem, CreditBalance, CreditLedgerEntry, CreditTopUp,
+    PaymentEvent, ServiceAvailability, Equipment,
+)
+from .payments import FakePaymentProvider
+from .settlement import settle_events
+from .wallet import InsufficientCredit, add_credit, complete_topup, get_balance, reconcile_balances, spend_credit
+from bookings.models import Booking
+from bookings.reservations import update_booking_status
+from tasks.models import Task
+from tasks.queue import run_pending
 from services.models import Service
 
 User = get_user_model()
@@ -21,7 +47,7 @@ class CartTestCase(TestCase):
             name='Test Service',
             description='Test description',
             price=Decimal('50.00'),
-            duration=60,
+            duration_minutes=60,
             is_active=True
         )
 
@@ -74,6 +100,306 @@ class CartTestCase(TestCase):
         cart_response = self.client.get('/api/cart/')
         self.assertEqual(cart_response.data['items_count'], 0)
 
+    def test_bulk_add_to_cart(self):
+        """Test adding several services in one request returns the updated cart"""
+        other = Service.objects.create(
+            name='Other Service',
+            description='Test description',
+            price=Decimal('20.00'),
+            duration_minutes=30
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client.post('/api/cart/add/', {'service_id': self.service.id, 'quantity': 1})
+
+        response = self.client.post('/api/cart/bulk-add/', {'items': [
+            {'service_id': self.service.id, 'quantity': 2},
+            {'service_id': other.id, 'quantity': 1},
+            {'service_id': other.id, 'quantity': 1, 'use_new_equipment': True},
+            {'service_id': other.id, 'quantity': 3},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['items_count'], 3)
+        quantities = {
+            (item['service']['id'], item['use_new_equipment']): item['quantity']
+            for item in response.data['items']
+        }
+        self.assertEqual(quantities, {
+            (self.service.id, False): 3,
+            (other.id, False): 4,
+            (other.id, True): 1,
+        })
+        self.assertEqual(float(response.data['total_amount']), 250.0)  # 50*3 + 20*4 + 20*1
+
+    def test_bulk_add_rejects_unknown_services(self):
+        """Test one unknown service rejects the whole batch"""
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post('/api/cart/bulk-add/', {'items': [
+            {'service_id': self.service.id, 'quantity': 1},
+            {'service_id': 9999, 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['service_ids'], [9999])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_cart_totals_include_surcharge(self):
+        """Test database-side totals add the equipment surcharge per unit"""
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, service=self.service, quantity=2)
+        CartItem.objects.create(cart=cart, service=self.service, quantity=3,
+                                use_new_equipment=True, equipment_surcharge=Decimal('5.00'))
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.data['items_count'], 2)
+        self.assertEqual(float(response.data['total_amount']), 265.0)  # 50*2 + (50+5)*3
+        self.assertEqual([float(item['total_price']) for item in response.data['items']], [100.0, 165.0])
+
+    def test_cart_query_count_is_constant(self):
+        """Test the cart GET runs a fixed number of queries regardless of item count"""
+        cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+        for count in (1, 10):
+            CartItem.objects.filter(cart=cart).delete()
+            for i in range(count):
+                service = Service.objects.create(
+                    name=f'Service {count}-{i}',
+                    description='Test description',
+                    price=Decimal('10.00'),
+                    duration_minutes=30
+                )
+                CartItem.objects.create(cart=cart, service=service)
+
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/cart/')
+            self.assertEqual(response.data['items_count'], count)
+            self.assertEqual(float(response.data['total_amount']), 10.0 * count)
+
+
+class CheckoutTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def add_item(self, index, quantity=1, capacity=3, **item):
+        service = Service.objects.create(
+            name=f'Service {index}',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=30
+        )
+        window = ServiceAvailability.objects.create(
+            service=service,
+            date='2024-01-15',
+            start_time=f'{9 + index:02d}:00',
+            end_time=f'{9 + index:02d}:30',
+            capacity=capacity
+        )
+        cart_item = CartItem.objects.create(cart=self.cart, service=service, quantity=quantity, **item)
+        return cart_item, window
+
+    def checkout(self, pairs, **extra):
+        return self.client.post('/api/cart/checkout/', {'slots': [
+            {'cart_item_id': item.id, 'availability_id': window.id} for item, window in pairs
+        ], **extra}, format='json')
+
+    def test_checkout_books_cart(self):
+        """Test checkout turns cart items into bookings and empties the cart"""
+        pairs = [
+            self.add_item(0, quantity=2),
+            self.add_item(1, use_new_equipment=True, equipment_surcharge=Decimal('5.00')),
+        ]
+
+        response = self.checkout(pairs)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['bookings']), 3)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        window = pairs[0][1]
+        window.refresh_from_db()
+        self.assertEqual((window.booked_count, window.remaining_slots), (2, 1))
+        equipment_booking = Booking.objects.get(service=pairs[1][0].service)
+        self.assertTrue(equipment_booking.use_new_equipment)
+        self.assertEqual(equipment_booking.equipment_surcharge, Decimal('5.00'))
+        self.assertEqual(equipment_booking.availability, pairs[1][1])
+
+    def test_checkout_full_slot_changes_nothing(self):
+        """Test one full window rolls back the whole checkout with a 409"""
+        pairs = [self.add_item(0), self.add_item(1, quantity=2, capacity=1)]
+
+        response = self.checkout(pairs)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+        self.assertEqual(ServiceAvailability.objects.filter(booked_count__gt=0).count(), 0)
+
+    def test_checkout_requires_slot_for_every_item(self):
+        """Test checkout rejects carts with unassigned items"""
+        pairs = [self.add_item(0), self.add_item(1)]
+
+        response = self.checkout(pairs[:1])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_rejects_duplicate_items(self):
+        """Test a cart item sent with two slots is rejected rather than one silently winning"""
+        item, window = self.add_item(0)
+        _, other_window = self.add_item(1)
+        CartItem.objects.exclude(pk=item.pk).delete()
+
+        response = self.checkout([(item, window), (item, other_window)])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('slots', response.data)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_checkout_query_count_is_constant(self):
+        """Test checkout runs the same number of queries whatever the cart size"""
+        pairs = [self.add_item(0)]
+        with CaptureQueriesContext(connection) as small:
+            self.checkout(pairs)
+
+        pairs = [self.add_item(index, quantity=2) for index in range(1, 7)]
+        with CaptureQueriesContext(connection) as large:
+            response = self.checkout(pairs)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['bookings']), 12)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_checkout_with_credit_pays_in_one_entry(self):
+        """Test paying with credit debits the cart total once, or books nothing when short"""
+        add_credit(self.user.pk, Decimal('120.00'))
+        pairs = [
+            self.add_item(0, quantity=2),
+            self.add_item(1, use_new_equipment=True, equipment_surcharge=Decimal('5.00')),
+        ]
+
+        response = self.checkout(pairs, use_credit=True)
+        self.assertEqual(response.status_code, status.HTTP_402_PAYMENT_REQUIRED)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(ServiceAvailability.objects.filter(booked_count__gt=0).count(), 0)
+
+        add_credit(self.user.pk, Decimal('50.00'))
+        response = self.checkout(pairs, use_credit=True)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(get_balance(self.user.pk), Decimal('15.00'))
+        spend = CreditLedgerEntry.objects.get(kind=CreditLedgerEntry.SPEND)
+        self.assertEqual(spend.amount, Decimal('-155.00'))
+        self.assertEqual(
+            sorted(Booking.objects.values_list('credit_amount', flat=True)),
+            [Decimal('50.00'), Decimal('50.00'), Decimal('55.00')],
+        )
+
+    def test_cancelling_refunds_credit(self):
+        """Test cancelling a booking paid with credit refunds its share"""
+        add_credit(self.user.pk, Decimal('100.00'))
+        self.checkout([self.add_item(0, quantity=2)], use_credit=True)
+        booking = Booking.objects.first()
+
+        response = self.client.patch(f'/api/bookings/{booking.id}/', {'status': 'cancelled'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_balance(self.user.pk), Decimal('50.00'))
+        refund = CreditLedgerEntry.objects.get(reference=f'refund:booking:{booking.id}')
+        self.assertEqual((refund.kind, refund.amount), (CreditLedgerEntry.REFUND, Decimal('50.00')))
+
+    def test_cancelling_twice_refunds_once(self):
+        """Test two cancellations that both saw the booking active refund it once per charge"""
+        add_credit(self.user.pk, Decimal('100.00'))
+        self.checkout([self.add_item(0, quantity=2)], use_credit=True)
+        booking = Booking.objects.first()
+        booking.status = 'cancelled'
+
+        update_booking_status(booking, 'pending')
+        update_booking_status(booking, 'pending')
+
+        self.assertEqual(get_balance(self.user.pk), Decimal('50.00'))
+        self.assertEqual(CreditLedgerEntry.objects.filter(reference__startswith='refund:').count(), 1)
+
+        # Reinstated, it is charged again, and that charge can be refunded too
+        booking.status = 'pending'
+        update_booking_status(booking, 'cancelled')
+        self.assertEqual(get_balance(self.user.pk), Decimal('0.00'))
+        booking.status = 'cancelled'
+        update_booking_status(booking, 'pending')
+        update_booking_status(booking, 'pending')
+
+        self.assertEqual(get_balance(self.user.pk), Decimal('50.00'))
+        self.assertEqual(
+            sorted(CreditLedgerEntry.objects.filter(reference__startswith='refund:').values_list('reference', flat=True)),
+            [f'refund:booking:{booking.id}', f'refund:booking:{booking.id}:1'],
+        )
+
+
+class CheckoutContentionTestCase(TransactionTestCase):
+    threads = 4
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        service = Service.objects.create(
+            name='Test Service', description='Test', price=Decimal('50.00'), duration_minutes=30
+        )
+        self.window = ServiceAvailability.objects.create(
+            service=service, date='2024-01-15', start_time='10:00', end_time='10:30', capacity=10
+        )
+        self.item = CartItem.objects.create(cart=Cart.objects.create(user=self.user), service=service, quantity=2)
+
+    def checkout_in_parallel(self, use_credit=False):
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def attempt():
+            try:
+                barrier.wait()
+                checkout_cart(self.user, {self.item.id: self.window.id}, use_credit=use_credit)
+                outcomes.append('booked')
+            except ValidationError:
+                outcomes.append('empty')
+            except Exception as exc:
+                outcomes.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=attempt) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return outcomes
+
+    def test_double_submit_books_once(self):
+        """Stress test: parallel checkouts of one cart book it exactly once"""
+        outcomes = self.checkout_in_parallel()
+
+        self.assertEqual(sorted(map(str, outcomes)), ['booked'] + ['empty'] * (self.threads - 1))
+        self.assertEqual(Booking.objects.count(), 2)
+        self.window.refresh_from_db()
+        self.assertEqual(self.window.booked_count, 2)
+
+    def test_double_submit_with_credit_charges_once(self):
+        """Stress test: parallel checkouts paid with credit spend from the wallet exactly once"""
+        # Enough for every attempt, so only the checkout itself can stop a second charge
+        add_credit(self.user.pk, Decimal('500.00'))
+
+        outcomes = self.checkout_in_parallel(use_credit=True)
+
+        self.assertEqual(sorted(map(str, outcomes)), ['booked'] + ['empty'] * (self.threads - 1))
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(CreditLedgerEntry.objects.filter(kind=CreditLedgerEntry.SPEND).count(), 1)
+        self.assertEqual(get_balance(self.user.pk), Decimal('400.00'))
+        self.assertEqual(list(reconcile_balances()), [])
+
 
 class ServiceAvailabilityTestCase(TestCase):
     def setUp(self):
@@ -82,7 +408,7 @@ class ServiceAvailabilityTestCase(TestCase):
             name='Test Service',
             description='Test description',
             price=Decimal('50.00'),
-            duration=60,
+            duration_minutes=60,
             is_active=True
         )
 
@@ -97,7 +423,7 @@ class ServiceAvailabilityTestCase(TestCase):
             is_home_service=False
         )
         
-        response = self.client.get('/api/service-availability/')
+        response = self.client.get('/api/service-availability/?date=2024-01-15')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
         self.assertTrue(response.data[0]['is_available'])
@@ -114,11 +440,388 @@ class ServiceAvailabilityTestCase(TestCase):
             is_home_service=True
         )
         
-        response = self.client.get('/api/service-availability/?is_home_service=true')
+        response = self.client.get('/api/service-availability/?date=2024-01-15&is_home_service=true')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
         self.assertTrue(response.data[0]['is_home_service'])
 
+    def test_fully_booked_windows_hidden(self):
+        """Test windows with no remaining capacity are filtered in the database"""
+        full = ServiceAvailability.objects.create(
+            service=self.service,
+            date='2024-01-15',
+            start_time='10:00',
+            end_time='11:00',
+            capacity=1,
+            booked_count=1
+        )
+        self.assertEqual(full.remaining_slots, 0)
+
+        response = self.client.get('/api/service-availability/?date=2024-01-15')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 0)
+
+    def test_service_availability_date_range(self):
+        """Test open windows for a date range come back in one query"""
+        for day in range(10, 20):
+            ServiceAvailability.objects.create(
+                service=self.service,
+                date=f'2024-01-{day}',
+                start_time='10:00',
+                end_time='11:00'
+            )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'/api/service-availability/?service_id={self.service.id}'
+                '&date_from=2024-01-12&date_to=2024-01-14'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [window['date'] for window in response.data],
+            ['2024-01-12', '2024-01-13', '2024-01-14']
+        )
+
+    def test_service_availability_invalid_date(self):
+        """Test malformed dates are rejected with a 400"""
+        response = self.client.get('/api/service-availability/?date_from=tomorrow')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(AVAILABILITY_HORIZON_DAYS=7)
+    def test_unbounded_request_covers_the_horizon(self):
+        """Test a request without dates lists the horizon from today, and long ranges are refused"""
+        today = timezone.localdate()
+        for offset in (-1, 0, 6, 7):
+            ServiceAvailability.objects.create(
+                service=self.service,
+                date=today + timedelta(days=offset),
+                start_time='10:00',
+                end_time='11:00'
+            )
+
+        response = self.client.get('/api/service-availability/')
+        self.assertEqual(
+            [window['date'] for window in response.data],
+            [str(today), str(today + timedelta(days=6))]
+        )
+        response = self.client.get('/api/service-availability/?date_from=2024-01-01&date_to=2024-12-31')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_service_availability_invalid_service_id(self):
+        """Test a non-integer service_id is a 400 rather than a server error"""
+        response = self.client.get('/api/service-availability/?service_id=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('service_id', response.data)
+
+
+    async def test_async_availability_matches_sync(self):
+        """Test the async availability endpoint returns what the sync view does"""
+        await ServiceAvailability.objects.acreate(
+            service=self.service,
+            date='2024-01-15',
+            start_time='10:00',
+            end_time='11:00',
+            capacity=2
+        )
+
+        url = '?service_id=%d&date=2024-01-15' % self.service.id
+        expected = (await self.async_client.get('/api/service-availability/' + url)).json()
+        response = await self.async_client.get('/api/service-availability/async/' + url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(response.json()[0]['service']['name'], 'Test Service')
+
+    async def test_async_availability_invalid_date(self):
+        """Test the async endpoint rejects malformed dates with a 400"""
+        response = await self.async_client.get('/api/service-availability/async/?date_from=tomorrow')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('date_from', response.json())
+
+        response = await self.async_client.get('/api/service-availability/async/?service_id=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_async_equipment_list(self):
+        """Test the async equipment endpoint pages equipment with its services"""
+        equipment = await Equipment.objects.acreate(name='Clippers', surcharge=Decimal('5.00'))
+        await equipment.services.aset([self.service])
+
+        response = await self.async_client.get('/api/equipment/async/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['results'][0]['services'][0]['name'], 'Test Service')
+
+
+class AvailabilityScheduleTestCase(TestCase):
+    def setUp(self):
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+        # 2024-01-15 is a Monday
+        self.schedule = AvailabilitySchedule.objects.create(
+            service=self.service,
+            weekday=0,
+            opens_at='09:00',
+            closes_at='12:30',
+            capacity=2
+        )
+
+    def test_slots_follow_service_duration(self):
+        """Test windows are service-length and stop before closing time"""
+        self.assertEqual(self.schedule.slot_times(), [
+            (time(9, 0), time(10, 0)),
+            (time(10, 0), time(11, 0)),
+            (time(11, 0), time(12, 0)),
+        ])
+
+    def test_generate_windows_on_schedule_days(self):
+        """Test windows are created on matching weekdays with full capacity"""
+        created = generate_windows(date(2024, 1, 15), date(2024, 1, 28))
+
+        self.assertEqual(created, 6)
+        windows = ServiceAvailability.objects.all()
+        self.assertEqual({window.date for window in windows}, {date(2024, 1, 15), date(2024, 1, 22)})
+        self.assertTrue(all(window.remaining_slots == 2 for window in windows))
+
+    def test_generate_windows_keeps_existing(self):
+        """Test regenerating fills gaps without touching booked windows"""
+        generate_windows(date(2024, 1, 15), date(2024, 1, 15))
+        window = ServiceAvailability.objects.get(start_time='09:00')
+        window.booked_count = 2
+        window.save()
+
+        created = generate_windows(date(2024, 1, 15), date(2024, 1, 22))
+
+        self.assertEqual(created, 3)
+        window.refresh_from_db()
+        self.assertEqual(window.remaining_slots, 0)
+
+    def test_generate_availability_command(self):
+        """Test the management command generates over the requested range"""
+        out = StringIO()
+        call_command('generate_availability', '--date-from', '2024-01-15', '--days', '7', stdout=out)
+
+        self.assertIn('Created 3 availability windows', out.getvalue())
+        self.assertEqual(ServiceAvailability.objects.count(), 3)
+
+    def test_generate_availability_admin_action(self):
+        """Test the admin action generates windows for the selected schedules"""
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.force_login(admin)
+
+        response = self.client.post('/admin/cart/availabilityschedule/', {
+            'action': 'generate_availability',
+            '_selected_action': [self.schedule.id],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(ServiceAvailability.objects.count(), 0)
+
+
+class VirtualAvailabilityTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+        # Mondays 09:00-12:00, so 2024-01-15 has 09:00, 10:00 and 11:00
+        AvailabilitySchedule.objects.create(
+            service=self.service,
+            weekday=0,
+            opens_at='09:00',
+            closes_at='12:00',
+            capacity=2
+        )
+
+    def get_virtual(self, query='date=2024-01-15'):
+        return self.client.get(f'/api/service-availability/?mode=virtual&{query}')
+
+    def book(self, appointment_time):
+        return Booking.objects.create(
+            user=self.user,
+            service=self.service,
+            appointment_date='2024-01-15',
+            appointment_time=appointment_time,
+            status='confirmed'
+        )
+
+    def test_virtual_matches_materialized(self):
+        """Test both modes return the same windows in the same shape"""
+        generate_windows(date(2024, 1, 15), date(2024, 1, 15))
+
+        materialized = self.client.get('/api/service-availability/?date=2024-01-15').data
+        virtual = self.get_virtual().data
+
+        self.assertEqual(len(virtual), 3)
+        for row in materialized + virtual:
+            row.pop('id')
+            row.pop('created_at')
+        self.assertEqual(virtual, materialized)
+
+    def test_bookings_use_up_capacity(self):
+        """Test overlapping bookings reduce a slot and fill it at capacity"""
+        self.book('10:00')
+        self.book('11:00')
+        self.book('11:00')
+
+        response = self.get_virtual()
+
+        slots = {row['start_time']: row for row in response.data}
+        self.assertEqual(sorted(slots), ['09:00:00', '10:00:00'])
+        self.assertEqual(slots['10:00:00']['booked_count'], 1)
+        self.assertEqual(slots['10:00:00']['remaining_slots'], 1)
+
+    def test_exceptions_close_and_resize_slots(self):
+        """Test closures remove slots and capacity overrides resize them"""
+        AvailabilityException.objects.create(date='2024-01-15', kind='closed', starts_at='09:00', ends_at='10:00')
+        AvailabilityException.objects.create(
+            service=self.service, date='2024-01-15', kind='capacity',
+            starts_at='11:00', ends_at='12:00', capacity=5
+        )
+
+        response = self.get_virtual()
+
+        self.assertEqual(
+            [(row['start_time'], row['capacity']) for row in response.data],
+            [('10:00:00', 2), ('11:00:00', 5)]
+        )
+
+    def test_extra_opening(self):
+        """Test an extra opening adds slots on a day without a schedule"""
+        AvailabilityException.objects.create(
+            service=self.service, date='2024-01-16', kind='open',
+            starts_at='14:00', ends_at='15:00', capacity=1
+        )
+
+        response = self.get_virtual('date=2024-01-16')
+
+        self.assertEqual(
+            [(row['start_time'], row['is_home_service']) for row in response.data],
+            [('14:00:00', False), ('14:00:00', True)]
+        )
+
+    def test_extra_opening_for_one_kind(self):
+        """Test an extra opening with a kind only opens that kind, and a blank one opens both"""
+        AvailabilityException.objects.create(
+            service=self.service, date='2024-01-16', kind='open',
+            starts_at='14:00', ends_at='15:00', is_home_service=True
+        )
+        AvailabilityException.objects.create(
+            service=self.service, date='2024-01-16', kind='open',
+            starts_at='16:00', ends_at='17:00'
+        )
+
+        response = self.get_virtual('date=2024-01-16&is_home_service=true')
+        self.assertEqual([row['start_time'] for row in response.data], ['14:00:00', '16:00:00'])
+        response = self.get_virtual('date=2024-01-16&is_home_service=false')
+        self.assertEqual([row['start_time'] for row in response.data], ['16:00:00'])
+
+    @override_settings(AVAILABILITY_MODE='virtual')
+    def test_virtual_booking_fills_slot_capacity(self):
+        """Test a virtual slot takes as many bookings as the list shows room for, then 409s"""
+        self.client.force_authenticate(user=self.user)
+        payload = {'service_id': self.service.id, 'appointment_date': '2024-01-15', 'appointment_time': '10:00'}
+
+        self.assertEqual(self.client.post('/api/bookings/create/', payload).status_code, status.HTTP_201_CREATED)
+        slots = {row['start_time']: row for row in self.get_virtual().data}
+        self.assertEqual(slots['10:00:00']['remaining_slots'], 1)
+        self.assertEqual(self.client.post('/api/bookings/create/', payload).status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('10:00:00', [row['start_time'] for row in self.get_virtual().data])
+        self.assertEqual(self.client.post('/api/bookings/create/', payload).status_code, status.HTTP_409_CONFLICT)
+
+        # A cancelled place can be booked again, but not reinstated on top of it
+        first = Booking.objects.filter(appointment_time='10:00').first()
+        self.client.patch(f'/api/bookings/{first.id}/', {'status': 'cancelled'})
+        self.assertEqual(self.client.post('/api/bookings/create/', payload).status_code, status.HTTP_201_CREATED)
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', role='staff'
+        ))
+        response = self.client.patch(f'/api/bookings/{first.id}/', {'status': 'confirmed'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @override_settings(AVAILABILITY_MODE='virtual')
+    def test_virtual_booking_is_per_service(self):
+        """Test a booking of one service leaves another service's slot at the same time untouched"""
+        other = Service.objects.create(name='Other Service', price=Decimal('20.00'), duration_minutes=60)
+        AvailabilitySchedule.objects.create(service=other, weekday=0, opens_at='09:00', closes_at='12:00', capacity=2)
+        self.client.force_authenticate(user=self.user)
+
+        for service in (self.service, other, other):
+            response = self.client.post('/api/bookings/create/', {
+                'service_id': service.id, 'appointment_date': '2024-01-15', 'appointment_time': '09:00'
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        slots = {(row['service']['id'], row['start_time']): row for row in self.get_virtual().data}
+        self.assertEqual(slots[self.service.id, '09:00:00']['remaining_slots'], 1)
+        self.assertNotIn((other.id, '09:00:00'), slots)
+
+    @override_settings(AVAILABILITY_MODE='virtual')
+    def test_virtual_booking_outside_schedule_rejected(self):
+        """Test times no schedule or opening offers are refused in virtual mode"""
+        self.client.force_authenticate(user=self.user)
+        for appointment_date, appointment_time in (('2024-01-15', '03:00'), ('2024-01-15', '09:30'), ('2024-01-16', '10:00')):
+            response = self.client.post('/api/bookings/create/', {
+                'service_id': self.service.id, 'appointment_date': appointment_date, 'appointment_time': appointment_time
+            })
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        AvailabilityException.objects.create(date='2024-01-15', kind='closed')
+        response = self.client.post('/api/bookings/create/', {
+            'service_id': self.service.id, 'appointment_date': '2024-01-15', 'appointment_time': '10:00'
+        })
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Booking.objects.exists())
+
+    @override_settings(AVAILABILITY_MODE='virtual')
+    def test_virtual_checkout_books_slots_by_time(self):
+        """Test checkout takes virtual slots by date and start time, up to their capacity"""
+        self.client.force_authenticate(user=self.user)
+        cart = Cart.objects.create(user=self.user)
+        item = CartItem.objects.create(cart=cart, service=self.service, quantity=3)
+        slot = {'cart_item_id': item.id, 'date': '2024-01-15', 'start_time': '09:00'}
+
+        response = self.client.post('/api/cart/checkout/', {'slots': [slot]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post('/api/cart/checkout/', {'slots': [{**slot, 'availability_id': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        item.quantity = 2
+        item.save()
+        response = self.client.post('/api/cart/checkout/', {'slots': [slot]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.filter(virtual_slot=True, availability=None).count(), 2)
+        self.assertNotIn('09:00:00', [row['start_time'] for row in self.get_virtual().data])
+
+    def test_virtual_horizon_query_count(self):
+        """Test a month of virtual availability costs a fixed number of queries"""
+        self.book('10:00')
+
+        with self.assertNumQueries(3):
+            response = self.get_virtual('date_from=2024-01-01&date_to=2024-01-30')
+        self.assertEqual(len(response.data), 15)
+
+    def test_virtual_range_is_bounded(self):
+        """Test overly long virtual ranges and unknown modes are rejected"""
+        response = self.get_virtual('date_from=2024-01-01&date_to=2024-12-31')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/service-availability/?mode=lazy')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 class CreditTopUpTestCase(TestCase):
     def setUp(self):
@@ -148,5 +851,413 @@ class CreditTopUpTestCase(TestCase):
         
         response = self.client.get('/api/credit-topups/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(float(response.data[0]['amount']), 50.0)
\ No newline at end of file
+        # The list is paginated like every other list endpoint
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(float(response.data['results'][0]['amount']), 50.0)
+
+
+
+@override_settings(PAYMENT_WEBHOOK_SECRET='test-secret')
+class PaymentSettlementTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.provider = FakePaymentProvider()
+
+    def create_topup(self, amount='25.00', user=None):
+        self.client.force_authenticate(user=user or self.user)
+        response = self.client.post('/api/credit-topups/', {'amount': amount})
+        self.client.force_authenticate(user=None)
+        return CreditTopUp.objects.get(pk=response.data['id'])
+
+    def test_topup_creation_is_one_insert(self):
+        """Test creating a top-up runs a single INSERT and returns its payment intent"""
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/credit-topups/', {'amount': '25.00'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['payment_intent_id'].startswith('pi_'))
+        self.assertEqual([query['sql'].split()[0] for query in queries.captured_queries], ['INSERT'])
+
+    def test_webhook_settles_topup_in_the_background(self):
+        """Test a succeeded event is stored by the webhook and credited by the worker"""
+        topup = self.create_topup()
+
+        response = self.provider.deliver(self.client, self.provider.event(topup))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(CreditTopUp.objects.get(pk=topup.pk).status, 'pending')
+        run_pending('test')
+        self.assertEqual(CreditTopUp.objects.get(pk=topup.pk).status, 'completed')
+        self.assertEqual(get_balance(self.user.pk), Decimal('25.00'))
+        self.assertIsNotNone(PaymentEvent.objects.get().processed_at)
+
+    def test_redelivered_events_apply_once(self):
+        """Test the same event twice, and a second success event, credit the top-up once"""
+        topup = self.create_topup()
+        event = self.provider.event(topup)
+
+        self.provider.deliver(self.client, event)
+        self.provider.deliver(self.client, event)
+        self.provider.deliver(self.client, self.provider.event(topup))
+        settle_events()
+        self.provider.deliver(self.client, event)
+        settle_events()
+
+        self.assertEqual(PaymentEvent.objects.count(), 2)
+        self.assertEqual(CreditLedgerEntry.objects.filter(topup=topup).count(), 1)
+        self.assertEqual(get_balance(self.user.pk), Decimal('25.00'))
+
+    def test_delivery_with_new_events_queues_settlement(self):
+        """Test a delivery that starts with a seen event but carries new ones still gets them settled"""
+        first, second = self.create_topup(), self.create_topup('10.00')
+        seen = self.provider.event(first)
+
+        self.provider.deliver(self.client, seen)
+        self.provider.deliver(self.client, seen)
+        self.assertEqual(Task.objects.count(), 1)
+        self.provider.deliver(self.client, [seen, self.provider.event(second)])
+        self.assertEqual(Task.objects.count(), 2)
+
+        while run_pending('test'):
+            pass
+        self.assertEqual(get_balance(self.user.pk), Decimal('35.00'))
+
+    def test_failed_canceled_and_mismatched_events(self):
+        """Test a failed attempt and a wrong amount leave top-ups pending and a cancellation fails one"""
+        failing, canceled, short = self.create_topup(), self.create_topup(), self.create_topup('40.00')
+
+        self.provider.deliver(self.client, [
+            self.provider.event(failing, PaymentEvent.FAILED),
+            self.provider.event(canceled, PaymentEvent.CANCELED),
+            self.provider.event(short, amount='4.00'),
+        ])
+        with self.assertLogs('cart.settlement', 'WARNING'):
+            outcome = settle_events()
+
+        self.assertEqual(outcome, {'completed': 0, 'failed': 1, 'ignored': 2})
+        self.assertEqual(CreditTopUp.objects.get(pk=failing.pk).status, 'pending')
+        self.assertEqual(CreditTopUp.objects.get(pk=canceled.pk).status, 'failed')
+        self.assertEqual(CreditTopUp.objects.get(pk=short.pk).status, 'pending')
+        self.assertEqual(get_balance(self.user.pk), Decimal('0.00'))
+
+    def test_success_after_failure_credits_topup(self):
+        """Test a payment retried after a failed attempt, or succeeding after a cancel, is credited"""
+        retried, canceled = self.create_topup(), self.create_topup('10.00')
+
+        self.provider.deliver(self.client, [
+            self.provider.event(retried, PaymentEvent.FAILED),
+            self.provider.event(canceled, PaymentEvent.CANCELED),
+        ])
+        settle_events()
+        self.provider.deliver(self.client, [self.provider.event(retried), self.provider.event(canceled)])
+        outcome = settle_events()
+
+        self.assertEqual(outcome, {'completed': 2, 'failed': 0, 'ignored': 0})
+        self.assertEqual(
+            set(CreditTopUp.objects.filter(pk__in=[retried.pk, canceled.pk]).values_list('status', flat=True)),
+            {'completed'},
+        )
+        self.assertEqual(get_balance(self.user.pk), Decimal('35.00'))
+
+    def test_rejects_bad_signatures(self):
+        """Test unsigned, tampered or stale webhooks store nothing"""
+        topup = self.create_topup()
+        body, headers = self.provider.request(self.provider.event(topup))
+        stale = FakePaymentProvider()
+        with mock.patch('cart.payments.time.time', return_value=0):
+            _, stale_headers = stale.request(self.provider.event(topup))
+
+        for payload, extra in [
+            (body, {}),
+            (body.replace(b'25.00', b'99.00'), headers),
+            (body, stale_headers),
+            (body, FakePaymentProvider('wrong-secret').request(self.provider.event(topup))[1]),
+        ]:
+            response = self.client.post('/api/payments/webhook/', payload, content_type='application/json', **extra)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_settlement_queries_do_not_grow_with_batch(self):
+        """Test settling a batch costs the same queries for 2 events as for 20, across users"""
+        users = [self.user] + [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(4)
+        ]
+
+        def settle(count):
+            topups = [self.create_topup(user=users[i % len(users)]) for i in range(count)]
+            self.provider.deliver(self.client, [self.provider.event(topup) for topup in topups])
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(settle_events()['completed'], count)
+            return len(queries.captured_queries)
+
+        self.assertEqual(settle(2), settle(20))
+        self.assertEqual(CreditBalance.objects.get(user=self.user).balance, Decimal('25.00') * 5)
+        self.assertEqual(list(reconcile_balances()), [])
+
+class CreditWalletTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_balance_follows_ledger(self):
+        """Test top-ups, spends and refunds each add an entry and move the balance"""
+        self.assertEqual(get_balance(self.user.pk), Decimal('0.00'))
+        topup = CreditTopUp.objects.create(user=self.user, amount=Decimal('40.00'))
+
+        self.assertTrue(complete_topup(topup))
+        spend_credit(self.user.pk, Decimal('25.00'), reference='test')
+        add_credit(self.user.pk, Decimal('5.00'))
+
+        self.assertEqual(get_balance(self.user.pk), Decimal('20.00'))
+        self.assertEqual(
+            list(CreditLedgerEntry.objects.order_by('id').values_list('kind', 'amount')),
+            [('top_up', Decimal('40.00')), ('spend', Decimal('-25.00')), ('refund', Decimal('5.00'))],
+        )
+        with self.assertRaises(InsufficientCredit):
+            spend_credit(self.user.pk, Decimal('20.01'))
+        self.assertEqual(get_balance(self.user.pk), Decimal('20.00'))
+
+    def test_topup_is_credited_once(self):
+        """Test completing a top-up twice credits it once"""
+        topup = CreditTopUp.objects.create(user=self.user, amount=Decimal('40.00'))
+
+        self.assertTrue(complete_topup(topup))
+        self.assertFalse(complete_topup(CreditTopUp.objects.get(pk=topup.pk)))
+
+        self.assertEqual(get_balance(self.user.pk), Decimal('40.00'))
+        self.assertEqual(CreditTopUp.objects.get(pk=topup.pk).status, 'completed')
+
+    def test_admin_completes_topups_through_action(self):
+        """Test the admin can't edit a top-up's status, and its action completes and credits it"""
+        topup = CreditTopUp.objects.create(user=self.user, amount=Decimal('40.00'))
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='adminpass123')
+        self.client.force_login(admin)
+
+        response = self.client.post(f'/admin/cart/credittopup/{topup.id}/change/', {
+            'user': self.user.id, 'amount': '40.00', 'status': 'completed',
+        })
+        self.assertEqual(response.status_code, 302)
+        topup.refresh_from_db()
+        self.assertEqual(topup.status, 'pending')
+        self.assertEqual(get_balance(self.user.pk), Decimal('0.00'))
+
+        response = self.client.post('/admin/cart/credittopup/', {
+            'action': 'complete_topups',
+            '_selected_action': [topup.id],
+        })
+        self.assertEqual(response.status_code, 302)
+        topup.refresh_from_db()
+        self.assertEqual(topup.status, 'completed')
+        self.assertEqual(get_balance(self.user.pk), Decimal('40.00'))
+
+    def test_deleting_credited_topup(self):
+        """Test a credited top-up, or its user, can be deleted and the ledger keeps its entry"""
+        topup = CreditTopUp.objects.create(user=self.user, amount=Decimal('40.00'))
+        complete_topup(topup)
+        reference = f'topup:{topup.pk}'
+
+        topup.delete()
+        entry = CreditLedgerEntry.objects.get()
+        self.assertEqual((entry.topup, entry.amount, entry.reference), (None, Decimal('40.00'), reference))
+
+        complete_topup(CreditTopUp.objects.create(user=self.user, amount=Decimal('10.00')))
+        self.user.delete()
+        self.assertFalse(CreditTopUp.objects.exists())
+        self.assertFalse(CreditLedgerEntry.objects.exists())
+
+    def test_ledger_entries_are_append_only(self):
+        """Test saving or deleting an existing ledger entry is refused"""
+        entry = add_credit(self.user.pk, Decimal('10.00'))
+
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_balance_endpoints(self):
+        """Test the balance is one query and the ledger lists the user's entries"""
+        add_credit(self.user.pk, Decimal('10.00'), reference='welcome')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/credit/')
+        self.assertEqual(response.json(), {'balance': 10.0})
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        response = self.client.get('/api/credit/ledger/')
+        self.assertEqual([entry['reference'] for entry in response.data['results']], ['welcome'])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        """Test reconciliation finds balances that disagree with the ledger, in batches"""
+        others = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(4)
+        ]
+        for user in [self.user, *others]:
+            add_credit(user.pk, Decimal('10.00'))
+        CreditBalance.objects.filter(user=others[2]).update(balance=Decimal('99.00'))
+        CreditBalance.objects.filter(user=others[3]).delete()
+
+        self.assertEqual(
+            list(reconcile_balances(batch_size=2)),
+            [(others[2].pk, Decimal('99.00'), Decimal('10.00')), (others[3].pk, None, Decimal('10.00'))],
+        )
+        with self.assertRaises(CommandError):
+            call_command('reconcile_credit', stdout=StringIO())
+
+        call_command('reconcile_credit', '--fix', stdout=StringIO())
+        self.assertEqual(list(reconcile_balances()), [])
+        self.assertEqual(get_balance(others[3].pk), Decimal('10.00'))
+
+
+class CreditSpendContentionTestCase(TransactionTestCase):
+    threads = 12
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        add_credit(self.user.pk, Decimal('50.00'))
+
+    def test_parallel_spends_lose_no_updates(self):
+        """Stress test: parallel spends and top-ups on one balance all land, without overdrawing"""
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def attempt(index):
+            try:
+                barrier.wait()
+                if index % 3 == 0:
+                    add_credit(self.user.pk, Decimal('1.00'))
+                    outcomes.append('credited')
+                else:
+                    spend_credit(self.user.pk, Decimal('7.00'))
+                    outcomes.append('spent')
+            except InsufficientCredit:
+                outcomes.append('short')
+            except Exception as exc:
+                outcomes.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=attempt, args=(index,)) for index in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # 50 + 4 x 1 covers 7 of the 8 spends, whatever the order
+        self.assertEqual(sorted(map(str, outcomes)), ['credited'] * 4 + ['short'] + ['spent'] * 7)
+        self.assertEqual(get_balance(self.user.pk), Decimal('5.00'))
+        self.assertEqual(list(reconcile_balances()), [])
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', is_superuser=True
+        )
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.admin)
+
+    def export(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return list(csv.DictReader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+
+    def test_topup_export_filters_by_day_and_status(self):
+        """Test top-ups are exported for whole days in the current timezone, filtered by status"""
+        for day, topup_status in ((1, 'completed'), (2, 'completed'), (2, 'pending'), (3, 'completed')):
+            topup = CreditTopUp.objects.create(user=self.user, amount=Decimal('10.00'), status=topup_status)
+            CreditTopUp.objects.filter(pk=topup.pk).update(
+                created_at=timezone.make_aware(datetime(2024, 1, day, 23, 30))
+            )
+
+        rows = self.export('/api/credit-topups/export/?date_from=2024-01-02&date_to=2024-01-03&status=completed')
+
+        self.assertEqual([(row['amount'], row['status']) for row in rows], [('10.00', 'completed')] * 2)
+        self.assertEqual(rows[0]['user_email'], 'test@example.com')
+
+    def test_cart_export_has_line_totals(self):
+        """Test cart contents are exported with each line's total"""
+        service = Service.objects.create(name='Cut', description='Test', price=Decimal('20.00'), duration_minutes=30)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(
+            cart=cart, service=service, quantity=2, use_new_equipment=True, equipment_surcharge=Decimal('5.00')
+        )
+
+        response = self.client.get('/api/cart/export/?format=ndjson')
+        [record] = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="cart-items.ndjson"')
+        self.assertEqual((record['user_id'], record['quantity'], record['line_total']), (self.user.id, 2, 50.0))
+
+    def test_cart_export_has_no_status(self):
+        """Test filtering cart contents by status is rejected"""
+        response = self.client.get('/api/cart/export/?status=pending')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.json())
+
+
+def resident_memory():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+@unittest.skipUnless(os.path.exists('/proc/self/statm'), 'Reads resident memory from /proc')
+class ExportMemoryTestCase(TestCase):
+    rows = 1_000_000
+    # Holding the export in memory would take several hundred MB
+    rss_ceiling = 32 * 1024 * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        users = User.objects.bulk_create(
+            User(username=f'payer{i}', email=f'payer{i}@example.com') for i in range(50)
+        )
+        statuses = ['completed', 'completed', 'pending', 'failed']
+        CreditTopUp.objects.bulk_create(
+            CreditTopUp(user=users[i % len(users)], amount=Decimal(10 + i % 90), status=statuses[i % len(statuses)])
+            for i in range(cls.rows // 64)
+        )
+        # Doubling in SQL six times is far quicker than building a million model instances
+        table = CreditTopUp._meta.db_table
+        columns = ', '.join(
+            connection.ops.quote_name(CreditTopUp._meta.get_field(name).column)
+            for name in ('user', 'amount', 'status', 'created_at', 'updated_at')
+        )
+        with connection.cursor() as cursor:
+            for _ in range(6):
+                cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}')
+
+    def test_export_memory_is_flat(self):
+        """Stress test: exporting a million top-ups keeps resident memory under a fixed ceiling"""
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        gc.collect()
+        baseline = peak = resident_memory()
+        lines = 0
+
+        response = self.client.get('/api/credit-topups/export/')
+        for n, chunk in enumerate(response.streaming_content):
+            lines += chunk.count(b'\n')
+            if n % 20 == 0:
+                peak = max(peak, resident_memory())
+        response.close()
+
+        self.assertEqual(lines, self.rows + 1)
+        self.assertLess(peak - baseline, self.rss_ceiling)
@@ -4,10 +4,19 @@ from . import views
 urlpatterns = [
     path('cart/', views.CartDetailView.as_view(), name='cart-detail'),
     path('cart/add/', views.add_to_cart, name='add-to-cart'),
+    path('cart/bulk-add/', views.bulk_add_to_cart, name='bulk-add-to-cart'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove-from-cart'),
     path('cart/clear/', views.clear_cart, name='clear-cart'),
+    path('cart/export/', views.CartItemExportView.as_view(), name='cart-export'),
+    path('cart/checkout/', views.checkout, name='cart-checkout'),
     path('credit-topups/', views.CreditTopUpListCreateView.as_view(), name='credit-topups'),
+    path('credit-topups/export/', views.CreditTopUpExportView.as_view(), name='credit-topups-export'),
+    path('credit/', views.credit_balance, name='credit-balance'),
+    path('credit/ledger/', views.CreditLedgerListView.as_view(), name='credit-ledger'),
+    path('payments/webhook/', views.payment_webhook, name='payment-webhook'),
     path('service-availability/', views.ServiceAvailabilityListView.as_view(), name='service-availability'),
+    path('service-availability/async/', views.service_availability_list, name='service-availability-async'),
     path('service-availability/create/', views.ServiceAvailabilityCreateView.as_view(), name='create-service-availability'),
     path('equipment/', views.EquipmentListView.as_view(), name='equipment-list'),
+    path('equipment/async/', views.equipment_list, name='equipment-list-async'),
 ]
\ No newline at end of file
@@ -1,58 +1,135 @@
+from datetime import timedelta
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
-from .models import Cart, CartItem, CreditTopUp, ServiceAvailability, Equipment
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .availability import (
+    AVAILABILITY_MODES, MAX_AVAILABILITY_DAYS, get_availability_mode, get_horizon_days, virtual_windows
+)
+from .checkout import checkout_cart
+from .payments import SIGNATURE_HEADER, new_payment_intent_id, verify_signature
+from .settlement import record_events, settlement_key
+from .tasks import settle_payments
+from .wallet import get_balance
+from .models import Cart, CartItem, CreditLedgerEntry, CreditTopUp, ServiceAvailability, Equipment, line_total
 from .serializers import (
-    CartSerializer, CartItemSerializer, CreditTopUpSerializer, 
+    CartSerializer, CartItemSerializer, CartItemOperationSerializer, CartBulkAddSerializer,
+    CheckoutSerializer, CreditLedgerEntrySerializer, CreditTopUpSerializer, PaymentEventSerializer,
     ServiceAvailabilitySerializer, EquipmentSerializer
 )
+from barber_shop.exports import ExportView
+from barber_shop.async_utils import coalesce, paginated_response, request_key, require_safe_async
+from barber_shop.profiling import query_budget
+from bookings.serializers import BookingSerializer
 from services.models import Service
 
 
+def get_cart_with_totals(user):
+    """
+    Fetch the user's cart with aggregated totals and its items prefetched.
+
+    Totals are aggregated in the cart query and items come with their
+    service, so rendering costs two queries however full the cart is.
+    """
+    carts = Cart.objects.with_totals().prefetch_related(
+        Prefetch('items', queryset=CartItem.objects.with_totals().order_by('id'))
+    )
+    try:
+        return carts.get(user=user)
+    except Cart.DoesNotExist:
+        Cart.objects.get_or_create(user=user)
+        return carts.get(user=user)
+
+
 class CartDetailView(generics.RetrieveAPIView):
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 7
 
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
-        return cart
+        return get_cart_with_totals(self.request.user)
 
 
+@query_budget(10)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def add_to_cart(request):
     """Add item to cart or update quantity if exists"""
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    
-    service_id = request.data.get('service_id')
-    quantity = request.data.get('quantity', 1)
-    use_new_equipment = request.data.get('use_new_equipment', False)
-    equipment_surcharge = request.data.get('equipment_surcharge', 0)
-    
-    try:
-        service = Service.objects.get(id=service_id, is_active=True)
-    except Service.DoesNotExist:
+    serializer = CartItemOperationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    item = serializer.validated_data
+
+    if not Service.objects.filter(id=item['service_id'], is_active=True).exists():
         return Response({'error': 'Service not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    cart_item, created = CartItem.objects.get_or_create(
+
+    cart, created = Cart.objects.get_or_create(user=request.user)
+    cart.add_items([item])
+
+    cart_item = CartItem.objects.with_totals().get(
         cart=cart,
-        service=service,
-        use_new_equipment=use_new_equipment,
-        defaults={
-            'quantity': quantity,
-            'equipment_surcharge': equipment_surcharge
-        }
+        service_id=item['service_id'],
+        use_new_equipment=item['use_new_equipment']
     )
-    
-    if not created:
-        cart_item.quantity += int(quantity)
-        cart_item.save()
-    
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@query_budget(8)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_add_to_cart(request):
+    """Add several services to the cart at once and return the updated cart"""
+    serializer = CartBulkAddSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    items = serializer.validated_data['items']
+
+    service_ids = {item['service_id'] for item in items}
+    services = Service.objects.filter(is_active=True).in_bulk(service_ids)
+    missing = sorted(service_ids - services.keys())
+    if missing:
+        return Response(
+            {'error': 'Service not found', 'service_ids': missing},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    cart, created = Cart.objects.get_or_create(user=request.user)
+    cart.add_items(items)
+
+    return Response(CartSerializer(get_cart_with_totals(request.user)).data, status=status.HTTP_200_OK)
+
+
+@query_budget(14)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def checkout(request):
+    """Book every cart item into its chosen availability window and clear the cart"""
+    serializer = CheckoutSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    slots = {
+        slot['cart_item_id']: slot.get('availability_id') or (slot['date'], slot['start_time'], slot['is_home_service'])
+        for slot in serializer.validated_data['slots']
+    }
+
+    # request.user only carries the token claims; the booking payload nests the full profile
+    user = get_user_model().objects.get(pk=request.user.pk)
+    bookings = checkout_cart(
+        user, slots,
+        notes=serializer.validated_data.get('notes'),
+        use_credit=serializer.validated_data['use_credit'],
+    )
+    data = BookingSerializer(bookings, many=True, context={'request': request}).data
+    return Response({'bookings': data}, status=status.HTTP_201_CREATED)
+
+
+@query_budget(2)
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def remove_from_cart(request, item_id):
@@ -62,6 +139,7 @@ def remove_from_cart(request, item_id):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@query_budget(5)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def clear_cart(request):
@@ -71,46 +149,226 @@ def clear_cart(request):
     return Response({'message': 'Cart cleared successfully'}, status=status.HTTP_200_OK)
 
 
+class CartItemExportView(ExportView):
+    """Every cart's contents with line totals, as CSV or NDJSON, for admins."""
+    queryset = CartItem.objects.annotate(line_total=line_total()).order_by('id')
+    columns = (
+        ('id', 'id'),
+        ('cart_id', 'cart_id'),
+        ('user_id', 'cart__user_id'),
+        ('user_email', 'cart__user__email'),
+        ('service', 'service__name'),
+        ('service_price', 'service__price'),
+        ('quantity', 'quantity'),
+        ('use_new_equipment', 'use_new_equipment'),
+        ('equipment_surcharge', 'equipment_surcharge'),
+        ('line_total', 'line_total'),
+        ('created_at', 'created_at'),
+    )
+    date_field = 'created_at'
+    filename = 'cart-items'
+
+
 class CreditTopUpListCreateView(generics.ListCreateAPIView):
     serializer_class = CreditTopUpSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 2
 
     def get_queryset(self):
         return CreditTopUp.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # One INSERT: the provider is paid client-side against this intent id
+        # and settles through payment_webhook
+        serializer.save(user=self.request.user, payment_intent_id=new_payment_intent_id())
+
+
+class CreditTopUpExportView(ExportView):
+    """Every credit top-up, the shop's revenue, as CSV or NDJSON, for admins."""
+    queryset = CreditTopUp.objects.order_by('id')
+    columns = (
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('user_email', 'user__email'),
+        ('amount', 'amount'),
+        ('status', 'status'),
+        ('payment_intent_id', 'payment_intent_id'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+    date_field = 'created_at'
+    status_field = 'status'
+    filename = 'credit-topups'
+
+
+@query_budget(2)
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def payment_webhook(request):
+    """Store signed payment provider events (one or a list) and queue their settlement"""
+    secret = settings.PAYMENT_WEBHOOK_SECRET
+    signature = request.META.get(SIGNATURE_HEADER, '')
+    if not secret or not verify_signature(request.body, signature, secret, settings.PAYMENT_WEBHOOK_TOLERANCE):
+        return Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
+
+    events = request.data if isinstance(request.data, list) else [request.data]
+    serializer = PaymentEventSerializer(data=events, many=True, allow_empty=False)
+    serializer.is_valid(raise_exception=True)
+    received = record_events(serializer.validated_data)
+    # An exact redelivery queues nothing new
+    settle_payments.enqueue(idempotency_key=settlement_key(received))
+    return Response({'received': len(received)}, status=status.HTTP_200_OK)
+
+
+@query_budget(1)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def credit_balance(request):
+    """The user's credit balance, read from its materialized row"""
+    return Response({'balance': get_balance(request.user.pk)})
+
+
+class CreditLedgerListView(generics.ListAPIView):
+    serializer_class = CreditLedgerEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 2
+
+    def get_queryset(self):
+        return CreditLedgerEntry.objects.filter(user=self.request.user)
+
+
+def get_date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Enter a valid date (YYYY-MM-DD).'})
+    return parsed
+
+
+def get_availability_filters(params):
+    """
+    Filters for an availability request. The range defaults to
+    AVAILABILITY_HORIZON_DAYS from today and may not exceed
+    MAX_AVAILABILITY_DAYS, so no request reads every window there is.
+    """
+    is_home_service = params.get('is_home_service')
+    if is_home_service is not None:
+        is_home_service = is_home_service.lower() == 'true'
+    service_id = params.get('service_id') or None
+    if service_id is not None:
+        try:
+            service_id = int(service_id)
+        except ValueError:
+            raise ValidationError({'service_id': 'A valid integer is required.'})
+    date = get_date_param(params, 'date')
+    date_from = date or get_date_param(params, 'date_from') or timezone.localdate()
+    date_to = date or get_date_param(params, 'date_to') or date_from + timedelta(days=get_horizon_days() - 1)
+    if date_to < date_from:
+        raise ValidationError({'date_to': 'End date must not be before the start date.'})
+    if (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+        raise ValidationError({'date_to': f'Availability covers at most {MAX_AVAILABILITY_DAYS} days.'})
+    return {
+        'service_id': service_id,
+        'date_from': date_from,
+        'date_to': date_to,
+        'is_home_service': is_home_service,
+    }
+
+
+def get_request_mode(params):
+    mode = params.get('mode') or get_availability_mode()
+    if mode not in AVAILABILITY_MODES:
+        raise ValidationError({'mode': f"Choose one of: {', '.join(AVAILABILITY_MODES)}."})
+    return mode
+
+
+def get_open_windows(params):
+    """Open availability windows for the query string of an availability request."""
+    return ServiceAvailability.objects.open_windows(**get_availability_filters(params))
+
+
+def get_virtual_windows(params):
+    """Open windows computed from the schedules for an availability request."""
+    filters = get_availability_filters(params)
+    return virtual_windows(
+        filters['date_from'], filters['date_to'],
+        service_id=filters['service_id'],
+        is_home_service=filters['is_home_service'],
+    )
 
 
 class ServiceAvailabilityListView(generics.ListAPIView):
+    """
+    Open windows, either read from ServiceAvailability rows ('materialized')
+    or computed from the recurring schedules ('virtual'). AVAILABILITY_MODE
+    picks the default and ``?mode=`` overrides it; the response is the same.
+    """
     serializer_class = ServiceAvailabilitySerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
+    # Windows are read in one go for a range get_availability_filters bounds
+    pagination_class = None
 
     def get_queryset(self):
-        queryset = ServiceAvailability.objects.filter(is_available=True)
-        service_id = self.request.query_params.get('service_id')
-        date = self.request.query_params.get('date')
-        is_home_service = self.request.query_params.get('is_home_service')
-        
-        if service_id:
-            queryset = queryset.filter(service_id=service_id)
-        if date:
-            queryset = queryset.filter(date=date)
-        if is_home_service is not None:
-            queryset = queryset.filter(is_home_service=is_home_service.lower() == 'true')
-        
-        return queryset
+        return get_open_windows(self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        if get_request_mode(request.query_params) == 'virtual':
+            windows = get_virtual_windows(request.query_params)
+            return Response(self.get_serializer(windows, many=True).data)
+        return super().list(request, *args, **kwargs)
+
+
+@require_safe_async
+async def service_availability_list(request):
+    """Async ServiceAvailabilityListView for ASGI; identical concurrent reads share a query."""
+    try:
+        virtual = get_request_mode(request.GET) == 'virtual'
+        windows = None if virtual else get_open_windows(request.GET)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+
+    async def fetch():
+        if virtual:
+            return ServiceAvailabilitySerializer(
+                await sync_to_async(get_virtual_windows)(request.GET), many=True
+            ).data
+        return ServiceAvailabilitySerializer([window async for window in windows], many=True).data
+
+    try:
+        data = await coalesce(request_key(request), fetch)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    return JsonResponse(data, safe=False)
 
 
 class ServiceAvailabilityCreateView(generics.CreateAPIView):
     serializer_class = ServiceAvailabilitySerializer
     permission_classes = [permissions.IsAuthenticated]  # Add admin check in production
+    query_budget = 2
 
     def perform_create(self, serializer):
         serializer.save()
 
 
 class EquipmentListView(generics.ListAPIView):
-    queryset = Equipment.objects.filter(is_new=True)
+    queryset = Equipment.objects.filter(is_new=True).prefetch_related('services').order_by('name', 'id')
     serializer_class = EquipmentSerializer
-    permission_classes = [permissions.AllowAny]
\ No newline at end of file
+    permission_classes = [permissions.AllowAny]
+    query_budget = 3
+
+
+@require_safe_async
+async def equipment_list(request):
+    """Async EquipmentListView for ASGI; identical concurrent reads share a query."""
+    async def fetch():
+        equipment = EquipmentListView.queryset.all()
+        return EquipmentSerializer([item async for item in equipment], many=True).data
+
+    return paginated_response(request, await coalesce(request.path, fetch))
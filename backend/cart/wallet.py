@@ -0,0 +1,201 @@
+"""
+Credit wallet.
+
+Every change to a user's credit is appended to ``CreditLedgerEntry`` and
+applied to their ``CreditBalance`` row with an ``F()`` update in the same
+transaction, so reading a balance is one primary-key lookup however long
+the history. A spend is a single conditional UPDATE (``balance >= amount``):
+concurrent spends queue on the balance row lock and each sees the balance
+the previous one left, so none is lost and none overdraws.
+``reconcile_balances`` checks the balances against the ledger.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import CreditBalance, CreditLedgerEntry, CreditTopUp
+
+ZERO = Decimal('0.00')
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+class InsufficientCredit(APIException):
+    status_code = status.HTTP_402_PAYMENT_REQUIRED
+    default_detail = 'Not enough credit.'
+    default_code = 'insufficient_credit'
+
+
+def get_balance(user_id):
+    balance = CreditBalance.objects.filter(user_id=user_id).values_list('balance', flat=True).first()
+    return ZERO if balance is None else balance
+
+
+def check_amount(amount):
+    if amount <= 0:
+        raise ValueError(f'Credit amounts must be positive, got {amount}')
+
+
+def add_credit(user_id, amount, kind=CreditLedgerEntry.REFUND, reference='', topup=None):
+    """
+    Credit ``amount`` to the user and record it; returns the ledger entry.
+
+    A refund whose ``refund:`` reference is already in the ledger credits
+    nothing and returns None.
+    """
+    check_amount(amount)
+    try:
+        with transaction.atomic():
+            # Record first: a repeated refund fails cart_ledger_refund_once
+            # before the balance changes
+            entry = CreditLedgerEntry.objects.create(
+                user_id=user_id, kind=kind, amount=amount, reference=reference, topup=topup,
+            )
+            balances = CreditBalance.objects.filter(user_id=user_id)
+            if not balances.update(balance=F('balance') + amount, updated_at=timezone.now()):
+                # First credit: create the row, racing anyone else doing the same
+                CreditBalance.objects.bulk_create([CreditBalance(user_id=user_id)], ignore_conflicts=True)
+                balances.update(balance=F('balance') + amount, updated_at=timezone.now())
+            return entry
+    except IntegrityError:
+        if kind == CreditLedgerEntry.REFUND and reference.startswith('refund:') and (
+            CreditLedgerEntry.objects.filter(kind=kind, reference=reference).exists()
+        ):
+            return None
+        raise
+
+
+def spend_credit(user_id, amount, reference=''):
+    """Debit ``amount`` from the user, or raise InsufficientCredit; returns the ledger entry."""
+    check_amount(amount)
+    with transaction.atomic():
+        # Write first: the UPDATE takes the row lock before the check is made
+        spent = CreditBalance.objects.filter(user_id=user_id, balance__gte=amount).update(
+            balance=F('balance') - amount, updated_at=timezone.now(),
+        )
+        if not spent:
+            raise InsufficientCredit()
+        return CreditLedgerEntry.objects.create(
+            user_id=user_id, kind=CreditLedgerEntry.SPEND, amount=-amount, reference=reference,
+        )
+
+
+def complete_topup(topup):
+    """
+    Mark a pending top-up completed and credit it.
+
+    Returns False, crediting nothing, if the top-up was no longer pending.
+    """
+    with transaction.atomic():
+        completed = CreditTopUp.objects.filter(pk=topup.pk, status='pending').update(
+            status='completed', updated_at=timezone.now(),
+        )
+        if not completed:
+            return False
+        add_credit(
+            topup.user_id, topup.amount, kind=CreditLedgerEntry.TOP_UP,
+            reference=f'topup:{topup.pk}', topup=topup,
+        )
+    topup.status = 'completed'
+    return True
+
+
+def complete_topups(topups):
+    """
+    Complete and credit many pending top-ups in a fixed number of queries.
+
+    The caller must hold ``topups`` locked (``select_for_update``) and know
+    none is completed yet, inside its own transaction. Each user's balance gets
+    one increment, applied to every balance in a single UPDATE.
+    """
+    if not topups:
+        return
+    now = timezone.now()
+    totals = defaultdict(Decimal)
+    for topup in topups:
+        totals[topup.user_id] += topup.amount
+
+    with transaction.atomic():
+        CreditTopUp.objects.filter(pk__in=[topup.pk for topup in topups]).update(
+            status='completed', updated_at=now,
+        )
+        CreditLedgerEntry.objects.bulk_create([
+            CreditLedgerEntry(
+                user_id=topup.user_id, kind=CreditLedgerEntry.TOP_UP, amount=topup.amount,
+                reference=f'topup:{topup.pk}', topup=topup,
+            )
+            for topup in topups
+        ])
+        CreditBalance.objects.bulk_create([CreditBalance(user_id=user_id) for user_id in totals], ignore_conflicts=True)
+        balances = CreditBalance.objects.filter(user_id__in=list(totals))
+        # Lock in key order, so two settlements sharing users can't deadlock
+        list(balances.order_by('user_id').select_for_update().values_list('user_id', flat=True))
+        balances.update(
+            balance=F('balance') + Case(
+                *[When(user_id=user_id, then=Value(total)) for user_id, total in totals.items()],
+                output_field=MONEY,
+            ),
+            updated_at=now,
+        )
+    for topup in topups:
+        topup.status = 'completed'
+
+
+def ledger_total(user_ref):
+    totals = (
+        CreditLedgerEntry.objects.filter(user_id=user_ref)
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=MONEY), Value(ZERO), output_field=MONEY)
+
+
+def reconcile_balances(batch_size=1000, fix=False):
+    """
+    Yield ``(user_id, balance, ledger_total)`` for every balance that disagrees with its ledger.
+
+    Balances are read in primary-key batches of ``batch_size``, each compared
+    with its ledger sum in one query (so both sides come from one snapshot)
+    and memory stays flat however many users there are. Users with ledger
+    entries but no balance row are reported with a balance of None. With
+    ``fix`` each mismatch is reset to its ledger sum, recomputed in the
+    UPDATE itself.
+    """
+    last = None
+    while True:
+        batch = CreditBalance.objects.order_by('user_id').annotate(ledger=ledger_total(OuterRef('user_id')))
+        if last is not None:
+            batch = batch.filter(user_id__gt=last)
+        rows = list(batch.values_list('user_id', 'balance', 'ledger')[:batch_size])
+        if not rows:
+            break
+        last = rows[-1][0]
+        for user_id, balance, ledger in rows:
+            if balance != ledger:
+                if fix:
+                    CreditBalance.objects.filter(user_id=user_id).update(
+                        balance=ledger_total(user_id), updated_at=timezone.now(),
+                    )
+                yield user_id, balance, ledger
+
+    orphans = (
+        CreditLedgerEntry.objects.exclude(user_id__in=CreditBalance.objects.values('user_id'))
+        .order_by('user_id')
+        .values('user_id')
+        .annotate(total=Sum('amount'))
+        .values_list('user_id', 'total')
+    )
+    for user_id, total in orphans.iterator(chunk_size=batch_size):
+        if fix:
+            CreditBalance.objects.bulk_create([CreditBalance(user_id=user_id)], ignore_conflicts=True)
+            CreditBalance.objects.filter(user_id=user_id).update(
+                balance=ledger_total(user_id), updated_at=timezone.now(),
+            )
+        yield user_id, None, total
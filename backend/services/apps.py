@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'services'
\ No newline at end of file
+    name = 'services'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,98 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+
+from barber_shop.async_utils import coalesce
+from .models import Service
+from .serializers import ServiceSerializer
+
+CATALOG_VERSION_KEY = 'services:catalog:version'
+CATALOG_CHANGED_AT_KEY = 'services:catalog:changed_at'
+CATALOG_ENTRY_KEY = 'services:catalog:v{version}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'SERVICE_CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_catalog_version():
+    cache = get_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # add() is a no-op if another worker initialised the key first
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog by moving readers to a new version key."""
+    cache = get_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, timeout=None)
+    cache.set(CATALOG_CHANGED_AT_KEY, timezone.now(), timeout=None)
+
+
+def catalog_entry(services, last_modified, changed_at):
+    data = [dict(row) for row in ServiceSerializer(services, many=True).data]
+
+    # Deactivated and deleted services change the catalog too, so
+    # Last-Modified covers every row plus the last explicit invalidation.
+    candidates = [value for value in (last_modified, changed_at) if value is not None]
+    last_modified = max(candidates) if candidates else timezone.now()
+
+    digest = hashlib.md5(
+        json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return {
+        'data': data,
+        'etag': f'"{digest}"',
+        'last_modified': last_modified,
+    }
+
+
+def build_catalog():
+    return catalog_entry(
+        Service.objects.filter(is_active=True).order_by('name'),
+        Service.objects.aggregate(latest=Max('updated_at'))['latest'],
+        get_cache().get(CATALOG_CHANGED_AT_KEY),
+    )
+
+
+async def abuild_catalog():
+    services = [service async for service in Service.objects.filter(is_active=True).order_by('name')]
+    aggregate = await Service.objects.aaggregate(latest=Max('updated_at'))
+    changed_at = await get_cache().aget(CATALOG_CHANGED_AT_KEY)
+    return catalog_entry(services, aggregate['latest'], changed_at)
+
+
+def get_catalog():
+    """Return the serialized active catalog, building it on a cache miss."""
+    cache = get_cache()
+    key = CATALOG_ENTRY_KEY.format(version=get_catalog_version())
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_catalog()
+        cache.set(key, entry, timeout=getattr(settings, 'SERVICE_CATALOG_CACHE_TIMEOUT', 3600))
+    return entry
+
+
+async def aget_catalog():
+    """Async get_catalog(); concurrent misses share one build."""
+    cache = get_cache()
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_catalog_version)()
+    key = CATALOG_ENTRY_KEY.format(version=version)
+    entry = await cache.aget(key)
+    if entry is None:
+        entry = await coalesce(key, abuild_catalog)
+        await cache.aset(key, entry, timeout=getattr(settings, 'SERVICE_CATALOG_CACHE_TIMEOUT', 3600))
+    return entry
@@ -9,9 +9,24 @@ class Service(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # The public catalog lists active services by name
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='services_active_name_idx'),
+            # Max(updated_at) stamps the catalog's Last-Modified
+            models.Index(fields=['updated_at'], name='services_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets bookings.signals spot a rename the staff schedule shows
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
     @property
     def duration_display(self):
         hours = self.duration_minutes // 60
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Service
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_catalog(sender, instance, **kwargs):
+    # Bump after commit so a concurrent reader can't cache the pre-save rows
+    # under the new version.
+    transaction.on_commit(bump_catalog_version)
@@ -0,0 +1,161 @@
+import asyncio
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from decimal import Decimal
+from barber_shop.async_utils import coalesce
+from .cache import get_cache, get_catalog_version
+from .models import Service
+
+User = get_user_model()
+
+
+class ServiceCatalogCacheTestCase(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test description',
+            price=Decimal('50.00'),
+            duration_minutes=60,
+            is_active=True
+        )
+
+    def test_catalog_sends_validators(self):
+        """Test the catalog response carries ETag and Last-Modified"""
+        response = self.client.get('/api/services/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response.data['results'][0]['name'], 'Test Service')
+
+    def test_catalog_revalidates_with_304(self):
+        """Test a matching If-None-Match gets a 304 without querying services"""
+        etag = self.client.get('/api/services/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_catalog_served_from_cache(self):
+        """Test repeated requests don't hit the database"""
+        self.client.get('/api/services/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/services/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_save_invalidates_catalog(self):
+        """Test saving a service bumps the version and changes the ETag"""
+        first = self.client.get('/api/services/')
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.price = Decimal('60.00')
+            self.service.save()
+
+        self.assertEqual(get_catalog_version(), version + 1)
+        response = self.client.get('/api/services/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['price'], '60.00')
+
+    def test_delete_invalidates_catalog(self):
+        """Test deleting a service drops it from the cached catalog"""
+        self.client.get('/api/services/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.delete()
+
+        response = self.client.get('/api/services/')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_admin_list_editable_invalidates_catalog(self):
+        """Test price/is_active edits from the admin changelist invalidate the catalog"""
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123'
+        )
+        self.client.force_login(admin)
+        self.client.get('/api/services/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/services/service/', {
+                'form-TOTAL_FORMS': '1',
+                'form-INITIAL_FORMS': '1',
+                'form-MIN_NUM_FORMS': '0',
+                'form-MAX_NUM_FORMS': '1000',
+                'form-0-id': self.service.id,
+                'form-0-price': '75.00',
+                '_save': 'Save',
+            })
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+        response = self.client.get('/api/services/')
+        self.assertEqual(response.data['count'], 0)
+
+    async def test_async_catalog_matches_sync(self):
+        """Test the async catalog returns the sync payload and validators"""
+        expected = await self.async_client.get('/api/services/')
+        response = await self.async_client.get('/api/services/async/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    async def test_async_catalog_revalidates_with_304(self):
+        """Test the async catalog answers a matching If-None-Match with a 304"""
+        etag = (await self.async_client.get('/api/services/async/'))['ETag']
+
+        response = await self.async_client.get('/api/services/async/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_async_catalog_is_read_only(self):
+        """Test the async catalog refuses writes"""
+        response = await self.async_client.post('/api/services/async/')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class CoalesceTestCase(SimpleTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        """Test identical concurrent reads run the underlying call once"""
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return ['row']
+
+        waiters = [asyncio.ensure_future(coalesce('key', fetch)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), [['row']] * 5)
+        self.assertEqual(len(calls), 1)
+
+    async def test_finished_calls_are_not_reused(self):
+        """Test a call that already finished isn't served to later readers"""
+        results = iter(['first', 'second'])
+
+        async def fetch():
+            return next(results)
+
+        self.assertEqual(await coalesce('key', fetch), 'first')
+        await asyncio.sleep(0)
+        self.assertEqual(await coalesce('key', fetch), 'second')
+
+    async def test_errors_reach_every_caller(self):
+        """Test a failed call raises in every waiting caller"""
+        async def fetch():
+            await asyncio.sleep(0)
+            raise ValueError('boom')
+
+        results = await asyncio.gather(
+            coalesce('key', fetch), coalesce('key', fetch), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
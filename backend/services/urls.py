@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('', views.ServiceListView.as_view(), name='service-list'),
-]
\ No newline at end of file
+    path('async/', views.service_list, name='service-list-async'),
+]
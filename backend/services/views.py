@@ -1,10 +1,51 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework import generics, permissions
+from rest_framework.response import Response
+from barber_shop.async_utils import paginated_response, require_safe_async
+from .cache import aget_catalog, get_catalog
 from .models import Service
 from .serializers import ServiceSerializer
 
+
+def catalog_not_modified(request, catalog):
+    last_modified = int(catalog['last_modified'].timestamp())
+    return get_conditional_response(request, etag=catalog['etag'], last_modified=last_modified)
+
+
+def add_catalog_headers(response, catalog):
+    response['ETag'] = catalog['etag']
+    response['Last-Modified'] = http_date(int(catalog['last_modified'].timestamp()))
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
 class ServiceListView(generics.ListAPIView):
     serializer_class = ServiceSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        return Service.objects.filter(is_active=True).order_by('name')
\ No newline at end of file
+        return Service.objects.filter(is_active=True).order_by('name')
+
+    def list(self, request, *args, **kwargs):
+        catalog = get_catalog()
+
+        response = catalog_not_modified(request, catalog)
+        if response is None:
+            page = self.paginate_queryset(catalog['data'])
+            if page is not None:
+                response = self.get_paginated_response(page)
+            else:
+                response = Response(catalog['data'])
+        return add_catalog_headers(response, catalog)
+
+
+@require_safe_async
+async def service_list(request):
+    """Async ServiceListView for ASGI; same payload and validators."""
+    catalog = await aget_catalog()
+
+    response = catalog_not_modified(request, catalog)
+    if response is None:
+        response = paginated_response(request, catalog['data'])
+    return add_catalog_headers(response, catalog)
@@ -0,0 +1,19 @@
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at', 'created_at']
+    list_filter = ['status', 'name']
+    search_fields = ['idempotency_key']
+    readonly_fields = ['locked_by', 'locked_at', 'finished_at', 'created_at', 'last_error']
+    actions = ['retry_tasks']
+
+    @admin.action(description='Retry selected failed tasks now')
+    def retry_tasks(self, request, queryset):
+        retried = queryset.filter(status=Task.FAILED).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'Queued {retried} tasks to run again.', messages.SUCCESS)
@@ -0,0 +1,64 @@
+import logging
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from django.db import connections
+from tasks.queue import requeue_expired, run_pending, worker_name
+
+logger = logging.getLogger('tasks.queue')
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Worker threads, each claiming its own batches')
+        parser.add_argument('--batch', type=int, default=10, help='Tasks claimed per query')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        if options['once']:
+            # In the calling thread, so it shares the caller's connection
+            ran = self.work(f'{worker_name()}:0', options)
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} tasks'))
+            return
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: self.stop.set())
+        threads = [
+            threading.Thread(target=self.work_in_thread, args=(f'{worker_name()}:{i}', options), daemon=True)
+            for i in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Running tasks on {len(threads)} threads")
+        # Running tasks finish their batch before the threads exit
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+    def work(self, worker_id, options):
+        ran = 0
+        while not self.stop.is_set():
+            try:
+                requeue_expired()
+                count = run_pending(worker_id, options['batch'])
+            except Exception:
+                # Most likely the database went away; reconnect on the next round
+                logger.exception('Worker %s could not claim tasks', worker_id)
+                connections.close_all()
+                count = 0
+            ran += count
+            if not count:
+                if options['once']:
+                    break
+                self.stop.wait(options['poll'])
+        return ran
+
+    def work_in_thread(self, worker_id, options):
+        try:
+            self.work(worker_id, options)
+        finally:
+            connections.close_all()
@@ -0,0 +1,164 @@
+"""
+Database-backed background tasks.
+
+``@task`` registers a function and gives it ``.enqueue(**kwargs)``, which
+inserts a ``Task`` row in the caller's transaction: workers see the task
+once the request commits, and a rollback discards it with everything else.
+``python manage.py run_tasks`` claims due rows in batches (``SKIP LOCKED``
+on PostgreSQL, so workers never wait on each other), runs them and retries
+failures with exponential backoff.
+
+Delivery is at least once: a worker that dies mid-task loses its lease
+after ``TASKS_LEASE_SECONDS`` and the task runs again elsewhere, so task
+functions must be safe to repeat. Keyword arguments must be JSON-serializable.
+"""
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, max_attempts, retry_delay):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<task {self.name}>'
+
+    def enqueue(self, idempotency_key=None, delay=None, **kwargs):
+        """
+        Queue a run with ``kwargs``, ``delay`` seconds from now at the earliest.
+
+        Nothing new is inserted for an ``idempotency_key`` that already has
+        a row, whatever its status. With ``TASKS_EAGER`` the task runs in
+        this process once the transaction commits.
+        """
+        if settings.TASKS_EAGER:
+            transaction.on_commit(lambda: self.run_eagerly(kwargs))
+            return None
+
+        task = Task(
+            name=self.name,
+            kwargs=kwargs,
+            idempotency_key=idempotency_key,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay or 0),
+        )
+        if idempotency_key is None:
+            task.save(force_insert=True)
+        else:
+            # One INSERT either way: a duplicate key is skipped by the database
+            Task.objects.bulk_create([task], ignore_conflicts=True)
+        return task
+
+    def run_eagerly(self, kwargs):
+        try:
+            self.func(**kwargs)
+        except Exception:
+            logger.exception('Task %s failed', self.name)
+
+
+def task(func=None, *, max_attempts=5, retry_delay=30):
+    """
+    Register ``func`` as a background task.
+
+    A failed run is retried ``retry_delay`` seconds later, doubling each
+    time, until it has been attempted ``max_attempts`` times.
+    """
+    def register(func):
+        wrapped = TaskFunction(func, max_attempts, retry_delay)
+        registry[wrapped.name] = wrapped
+        return wrapped
+    return register(func) if func is not None else register
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker_id, limit):
+    """Mark up to ``limit`` due tasks as running under a new lease and return them."""
+    now = timezone.now()
+    token = f'{worker_id}:{uuid.uuid4().hex[:12]}'[-100:]
+    due = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    with transaction.atomic():
+        # A single UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED LIMIT n):
+        # rows another worker is claiming are skipped rather than waited on.
+        claimed = Task.objects.filter(
+            pk__in=due.select_for_update(skip_locked=True).values('pk')[:limit],
+            status=Task.QUEUED,
+        ).update(status=Task.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1)
+    if not claimed:
+        return []
+    return list(Task.objects.filter(status=Task.RUNNING, locked_by=token))
+
+
+def requeue_expired():
+    """Hand tasks whose worker's lease ran out to the next worker, or fail them when out of attempts."""
+    now = timezone.now()
+    expired = Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=settings.TASKS_LEASE_SECONDS)
+    )
+    requeued = expired.filter(attempts__lt=F('max_attempts')).update(
+        status=Task.QUEUED, locked_by='', locked_at=None, run_at=now,
+    )
+    failed = expired.update(
+        status=Task.FAILED, locked_by='', locked_at=None, finished_at=now,
+        last_error='The worker running this task stopped before it finished.',
+    )
+    return requeued + failed
+
+
+def execute(task):
+    """Run a claimed task and record the outcome; True if it succeeded."""
+    func = registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f'No task is registered as {task.name!r}')
+        func.func(**task.kwargs)
+    except Exception:
+        logger.exception('Task %s (%s) failed on attempt %s', task.name, task.pk, task.attempts)
+        now = timezone.now()
+        if func is not None and task.attempts < task.max_attempts:
+            delay = func.retry_delay * 2 ** (task.attempts - 1)
+            outcome = {'status': Task.QUEUED, 'run_at': now + timedelta(seconds=delay)}
+        else:
+            outcome = {'status': Task.FAILED, 'finished_at': now}
+        # Matching the lease leaves a task that was already handed on alone
+        Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+            locked_by='', locked_at=None, last_error=traceback.format_exc(), **outcome
+        )
+        return False
+
+    Task.objects.filter(pk=task.pk, locked_by=task.locked_by).update(
+        status=Task.DONE, locked_by='', locked_at=None, finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_pending(worker_id=None, limit=10):
+    """Claim and run one batch of due tasks; returns how many were run."""
+    tasks = claim(worker_id or worker_name(), limit)
+    for claimed in tasks:
+        execute(claimed)
+    return len(tasks)
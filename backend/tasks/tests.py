@@ -0,0 +1,192 @@
+import io
+import threading
+from datetime import date, time, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from cart.models import ServiceAvailability
+from services.models import Service
+from .models import Task
+from .queue import claim, execute, requeue_expired, run_pending, task
+
+User = get_user_model()
+
+calls = []
+
+
+@task
+def record(n):
+    calls.append(n)
+
+
+@task(max_attempts=2, retry_delay=10)
+def explode():
+    raise RuntimeError('boom')
+
+
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_inserts_queued_row(self):
+        """Test enqueueing stores the task name and arguments for a worker"""
+        record.enqueue(n=1)
+
+        queued = Task.objects.get()
+        self.assertEqual((queued.name, queued.kwargs, queued.status), ('tasks.tests.record', {'n': 1}, Task.QUEUED))
+        self.assertEqual(calls, [])
+
+    def test_idempotency_key_deduplicates(self):
+        """Test a second enqueue with the same key adds nothing"""
+        record.enqueue(idempotency_key='once', n=1)
+        record.enqueue(idempotency_key='once', n=2)
+
+        self.assertEqual(list(Task.objects.values_list('kwargs', flat=True)), [{'n': 1}])
+
+    def test_run_pending_runs_due_tasks_only(self):
+        """Test due tasks run and finish while delayed ones wait"""
+        record.enqueue(n=1)
+        record.enqueue(n=2)
+        record.enqueue(delay=60, n=3)
+
+        self.assertEqual(run_pending('test'), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+        self.assertEqual(Task.objects.get(status=Task.QUEUED).kwargs, {'n': 3})
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        """Test a failing task is retried later and marked failed after its last attempt"""
+        explode.enqueue()
+        before = timezone.now()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            run_pending('test')
+
+        failing = Task.objects.get()
+        self.assertEqual((failing.status, failing.attempts), (Task.QUEUED, 1))
+        self.assertGreaterEqual(failing.run_at, before + timedelta(seconds=10))
+        self.assertIn('RuntimeError: boom', failing.last_error)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            run_pending('test')
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.FAILED, 2))
+        self.assertIsNotNone(failing.finished_at)
+
+    def test_expired_lease_is_handed_on(self):
+        """Test a task whose worker stopped is claimed again, and the old lease can't finish it"""
+        record.enqueue(n=1)
+        [lost] = claim('lost-worker', 10)
+        self.assertEqual(claim('other', 10), [])
+
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_expired(), 1)
+        [reclaimed] = claim('other', 10)
+        self.assertEqual(reclaimed.attempts, 2)
+
+        execute(lost)
+        self.assertEqual(Task.objects.get().status, Task.RUNNING)
+        execute(reclaimed)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_run_tasks_command_once(self):
+        """Test the worker command drains due tasks and exits with --once"""
+        for n in range(3):
+            record.enqueue(n=n)
+        out = io.StringIO()
+
+        call_command('run_tasks', '--once', '--batch', '2', stdout=out)
+
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertIn('Ran 3 tasks', out.getvalue())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_runs_after_commit(self):
+        """Test eager mode runs the task after commit without a queue row"""
+        with self.captureOnCommitCallbacks(execute=True):
+            record.enqueue(n=1)
+            self.assertEqual(calls, [])
+
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+
+class SideEffectTaskTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_register_queues_welcome_email(self):
+        """Test registering sends no mail in the request and the worker sends it"""
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'An0ther-pass!',
+            'password_confirm': 'An0ther-pass!',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(run_pending('test'), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+
+    def test_booking_queues_confirmation(self):
+        """Test a booking's confirmation email is sent by the worker"""
+        user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        service = Service.objects.create(
+            name='Test Service', description='Test', price=Decimal('50.00'), duration_minutes=60
+        )
+        ServiceAvailability.objects.create(
+            service=service, date=date(2024, 1, 15), start_time=time(10), end_time=time(11), capacity=2
+        )
+        self.client.force_authenticate(user=user)
+
+        response = self.client.post('/api/bookings/create/', {
+            'service_id': service.id, 'appointment_date': '2024-01-15', 'appointment_time': '10:00',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(mail.outbox, [])
+        run_pending('test')
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.assertIn('Test Service, Monday 15 January 2024 at 10:00', mail.outbox[0].body)
+
+
+class ConcurrentWorkerTestCase(TransactionTestCase):
+    threads = 4
+    tasks = 40
+
+    def setUp(self):
+        calls.clear()
+
+    def test_each_task_runs_once(self):
+        """Stress test: workers claiming in parallel run every task exactly once"""
+        for n in range(self.tasks):
+            record.enqueue(n=n)
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def work(worker_id):
+            try:
+                barrier.wait()
+                while run_pending(worker_id, 3):
+                    pass
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, args=(f'worker{i}',)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(calls), list(range(self.tasks)))
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), self.tasks)